@@ -0,0 +1,100 @@
+# array_codec.py
+"""
+Wire format for NumPy arrays in tool arguments and results.
+
+An encoded array is a dict
+
+    {'ndarray': <base64 of the little-endian buffer>, 'dtype': '<f4', 'shape': [1000]}
+
+with 'compression': 'zlib' when the buffer was deflated first. Clients
+that have not negotiated it (see async_server) get plain lists. With the
+'handle' format arrays stay in the server's array_store and the client
+gets {'handle': 'arr_...', 'dtype': '<f8', 'shape': [1000]} instead.
+"""
+import zlib
+import base64
+
+import numpy as np
+
+import array_store
+
+# 'raw' leaves the arrays as they are, for results that are packed later
+# by another process (see async_server)
+FORMATS = ['list', 'base64', 'handle', 'raw']
+DTYPES = ['float32', 'float64']
+
+def options(array_format = None):
+    """
+    Normalise an array_format argument: None or 'list' for JSON lists,
+    'base64' for the binary encoding, 'handle' for array_store references,
+    or a dict with 'format', 'dtype' ('float32' or 'float64') and
+    'compress' (bool).
+    """
+    if not array_format:
+        array_format = {}
+    elif isinstance(array_format, str):
+        array_format = {'format': array_format}
+    opts = {'format': 'list', 'dtype': 'float32', 'compress': False}
+    opts.update(array_format)
+    if opts['format'] not in FORMATS:
+        raise ValueError('Unsupported array format: %s' % opts['format'])
+    if opts['dtype'] not in DTYPES:
+        raise ValueError('Unsupported array dtype: %s' % opts['dtype'])
+    return opts
+
+def encode(arr, dtype = 'float32', compress = False):
+    arr = np.asarray(arr)
+    # Floats go out at the requested precision; other dtypes keep theirs
+    dtype = np.dtype(dtype) if arr.dtype.kind in 'fc' else arr.dtype
+    arr = np.ascontiguousarray(arr, dtype = dtype.newbyteorder('<'))
+    data = arr.tobytes()
+    obj = {'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+    if compress:
+        data = zlib.compress(data, 6)
+        obj['compression'] = 'zlib'
+    obj['ndarray'] = base64.b64encode(data).decode('ascii')
+    return obj
+
+def is_encoded(obj):
+    return isinstance(obj, dict) and 'ndarray' in obj
+
+def reference(arr):
+    arr = np.asarray(arr)
+    return {'handle': array_store.put(arr), 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+
+def decode(obj, dtype = None):
+    """
+    Array from an encoded dict, an array_store handle, a (nested) list or an
+    array; read-only when decoded from bytes or looked up by handle.
+    """
+    if array_store.is_handle(obj):
+        arr = array_store.get(obj)
+        return arr if dtype is None else arr.astype(dtype, copy = False)
+    if not is_encoded(obj):
+        return np.asarray(obj, dtype = dtype)
+    data = base64.b64decode(obj['ndarray'])
+    if obj.get('compression') == 'zlib':
+        data = zlib.decompress(data)
+    elif obj.get('compression'):
+        raise ValueError('Unsupported compression: %s' % obj['compression'])
+    arr = np.frombuffer(data, dtype = np.dtype(obj['dtype'])).reshape(obj['shape'])
+    return arr if dtype is None else arr.astype(dtype, copy = False)
+
+def pack(result, array_format = None):
+    """Replace the arrays in a result dict by lists, encoded arrays or handles, per array_format."""
+    opts = options(array_format)
+    packed = {}
+    for key, value in result.items():
+        if isinstance(value, np.ndarray):
+            if opts['format'] == 'list':
+                value = value.tolist()
+            elif opts['format'] == 'base64':
+                value = encode(value, opts['dtype'], opts['compress'])
+            elif opts['format'] == 'handle':
+                value = reference(value)
+        packed[key] = value
+    return packed
+
+def resolve(args):
+    """Copy of an arguments dict with top-level handle references (see reference) replaced by their arrays."""
+    return {key: array_store.get(value) if array_store.is_handle(value) else value for key, value in args.items()}
@@ -0,0 +1,99 @@
+# array_store.py
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_MB = 256
+DEFAULT_TTL = 3600.
+
+PREFIX = 'arr_'
+
+def is_handle(obj):
+    """
+    True for a handle reference dict from array_codec.pack. Plain strings
+    are never taken for handles: tool arguments such as file names may
+    start with PREFIX too.
+    """
+    return isinstance(obj, dict) and isinstance(obj.get('handle'), str) and obj['handle'].startswith(PREFIX)
+
+class ArrayStore:
+    """
+    Server-side store of arrays referenced by short handles, so large tool
+    results are passed by reference instead of being sent to the client.
+    Arrays are kept read-only. Entries expire ttl seconds after they were
+    last used, and the least recently used ones are evicted once the total
+    size exceeds max_bytes.
+    """
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, handle):
+        arr, expires = self._entries.pop(handle)
+        self._bytes -= arr.nbytes
+
+    def _expire(self, now):
+        for handle in [h for h, (arr, expires) in self._entries.items() if expires <= now]:
+            self._drop(handle)
+
+    def put(self, arr):
+        """
+        Store arr and return its handle. Writeable arrays are copied so the
+        caller keeps its array as it was; read-only ones (e.g. from the
+        wavelet cache) are stored as views. Stored arrays are read-only.
+        """
+        arr = arr.copy() if arr.flags.writeable else arr.view()
+        arr.flags.writeable = False
+        handle = PREFIX + uuid.uuid4().hex[:16]
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._entries[handle] = (arr, now + self.ttl)
+            self._bytes += arr.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+        return handle
+
+    def get(self, handle):
+        if isinstance(handle, dict):
+            handle = handle['handle']
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if handle not in self._entries:
+                raise KeyError('Unknown or expired array handle: %s' % handle)
+            arr, expires = self._entries[handle]
+            self._entries[handle] = (arr, now + self.ttl)
+            self._entries.move_to_end(handle)
+        return arr
+
+    def delete(self, handle):
+        with self._lock:
+            if handle in self._entries:
+                self._drop(handle)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes, 'ttl': self.ttl}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArrayStore(float(os.environ.get('ARRAY_STORE_MB', DEFAULT_MAX_MB))*2**20,
+                float(os.environ.get('ARRAY_STORE_TTL', DEFAULT_TTL)))
+        return _store
+
+def put(arr):
+    return get_store().put(arr)
+
+def get(handle):
+    return get_store().get(handle)
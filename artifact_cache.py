@@ -0,0 +1,202 @@
+# artifact_cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+# Sources whose contents are part of every cache key, so editing the
+# modelling, plotting or parameter handling code invalidates earlier
+# artifacts. The installed bruges version is folded in as well.
+CODE_FILES = ['wedge.py', 'synthetics.py', 'figures.py', 'wavelet_cache.py',
+    'image_output.py', 'tools.py']
+
+DEFAULT_MAX_MB = 512
+
+_code_version = None
+
+def code_version():
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in CODE_FILES:
+            with open(os.path.join(here, name), 'rb') as f:
+                h.update(f.read())
+        try:
+            import bruges
+            h.update(('bruges ' + str(getattr(bruges, '__version__', ''))).encode())
+        except ImportError:
+            pass
+        _code_version = h.hexdigest()[:16]
+    return _code_version
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    # NumPy scalars and anything else that round-trips through its repr
+    return repr(value.item() if hasattr(value, 'item') else value)
+
+def cache_key(fn_name, params):
+    """Canonical SHA-256 of the function name, its parameters and the code version."""
+    payload = json.dumps({'fn': fn_name, 'params': _canonical(params), 'code': code_version()},
+        sort_keys = True, separators = (',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ArtifactCache:
+    """
+    Content-addressed on-disk cache of rendered figures, CSV curves and raw
+    arrays. Each entry is a directory named by its key, created under a
+    temporary name and renamed into place so readers never see partial
+    entries. Entries are touched on every hit and the least recently used
+    ones are evicted once the cache grows beyond max_bytes.
+    """
+    def __init__(self, root, max_bytes):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok = True)
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        path = self._entry(key)
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process since meta.json was read
+            return None
+        return {name: os.path.join(path, fname) for name, fname in meta['files'].items()}
+
+    def put(self, key, build):
+        """
+        Create the entry for key by calling build(tmpdir), which writes its
+        files into tmpdir and returns {name: filename}.
+        """
+        tmpdir = tempfile.mkdtemp(dir = self.root, prefix = '.tmp-')
+        try:
+            files = build(tmpdir)
+            with open(os.path.join(tmpdir, 'meta.json'), 'w') as f:
+                json.dump({'files': files, 'created': time.time()}, f)
+            try:
+                os.rename(tmpdir, self._entry(key))
+            except OSError:
+                # Another writer finished the same entry first
+                shutil.rmtree(tmpdir, ignore_errors = True)
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors = True)
+            raise
+        self.evict(keep = key)
+        return self.get(key)
+
+    def evict(self, keep = None):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.startswith('.') or not os.path.isdir(path):
+                    continue
+                size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+                total += size
+                # keep counts towards the total but is never evicted
+                if name != keep:
+                    entries.append((os.stat(path).st_mtime, size, path))
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors = True)
+                total -= size
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ArtifactCache(os.environ.get('ARTIFACT_CACHE_DIR', 'artifact_cache'),
+            float(os.environ.get('ARTIFACT_CACHE_MB', DEFAULT_MAX_MB))*2**20)
+    return _cache
+
+def _save_arrays(path, arrays):
+    import numpy as np
+    np.savez(path, **{k: v for k, v in arrays.items() if v is not None})
+
+def _copy_out(entry, name, fname):
+    if fname and name in entry:
+        shutil.copyfile(entry[name], fname)
+
+def _wavelet_file_hash(wv_type, wavelet_str, wavelet_fname):
+    # gen_wavelet reads custom wavelets from wavelet_fname when no contents
+    # are given, so the key has to follow the file's contents, not its path
+    if wv_type in ('ricker', 'ormsby') or wavelet_str or not wavelet_fname or not os.path.isfile(wavelet_fname):
+        return None
+    from wedge import content_hash
+    with open(wavelet_fname, 'rb') as f:
+        return content_hash(f.read())
+
+def cached_wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, gain, plotpadtime, thickness_domain, fig_fname=None, csv_fname=None, image_opts=None, **kwargs):
+    """
+    wedge.wedge_model through the artifact cache. Returns a dict with the
+    cached 'figure', 'csv' and 'arrays' (.npz) paths and copies the figure
+    and CSV to fig_fname / csv_fname when given. Hits do not import wedge
+    or matplotlib.
+    """
+    args = [zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot,
+        vp1, vp2, vp3, rho1, rho2, rho3, gain, plotpadtime, thickness_domain]
+    fmt = (image_opts or {}).get('format', 'png')
+    key = cache_key('wedge_model', {'args': args, 'kwargs': kwargs, 'image_opts': image_opts or {},
+        'wavelet_file': _wavelet_file_hash(wv_type, wavelet_str, wavelet_fname)})
+
+    def build(tmpdir):
+        from wedge import wedge_model
+        fig = 'figure.%s' % fmt
+        result = wedge_model(*args, os.path.join(tmpdir, fig), os.path.join(tmpdir, 'curves.csv'), image_opts = image_opts, **kwargs)
+        _save_arrays(os.path.join(tmpdir, 'arrays.npz'), result)
+        return {'figure': fig, 'csv': 'curves.csv', 'arrays': 'arrays.npz'}
+
+    cache = get_cache()
+    entry = cache.get(key)
+    hit = entry is not None
+    if not hit:
+        entry = cache.put(key, build)
+
+    _copy_out(entry, 'figure', fig_fname)
+    _copy_out(entry, 'csv', csv_fname)
+    return dict(entry, hit = hit)
+
+def cached_plot_wavelet(wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, fig_fname=None, image_opts=None):
+    """wedge.plot_wavelet through the artifact cache; see cached_wedge_model."""
+    args = [wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot]
+    fmt = (image_opts or {}).get('format', 'png')
+    key = cache_key('plot_wavelet', {'args': args, 'image_opts': image_opts or {},
+        'wavelet_file': _wavelet_file_hash(wv_type, wavelet_str, wavelet_fname)})
+
+    def build(tmpdir):
+        from wedge import plot_wavelet
+        fig = 'figure.%s' % fmt
+        result = plot_wavelet(*args, os.path.join(tmpdir, fig), image_opts = image_opts)
+        _save_arrays(os.path.join(tmpdir, 'arrays.npz'), result)
+        return {'figure': fig, 'arrays': 'arrays.npz'}
+
+    cache = get_cache()
+    entry = cache.get(key)
+    hit = entry is not None
+    if not hit:
+        entry = cache.put(key, build)
+
+    _copy_out(entry, 'figure', fig_fname)
+    return dict(entry, hit = hit)
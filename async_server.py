@@ -0,0 +1,383 @@
+# async_server.py
+"""
+asyncio MCP server over stdio (newline-delimited JSON-RPC 2.0).
+
+Tool calls are dispatched to a thread or process pool instead of running on
+the event loop, so one slow render does not hold up the other calls of the
+same client. Each call has a per-tool timeout, is cancelled when the client
+sends notifications/cancelled, and the number of calls in flight is bounded.
+"""
+import os
+import sys
+import json
+import asyncio
+import importlib
+import multiprocessing
+import concurrent.futures
+
+PROTOCOL_VERSION = '2024-11-05'
+
+_number = {'type': 'number'}
+_string = {'type': 'string'}
+
+# Overrides the array encoding negotiated at initialize for a single call.
+# 'handle' keeps the arrays on the server and returns array_store handles,
+# which any array argument accepts in place of the data.
+_array_format = {
+    'type': 'object',
+    'properties': {
+        'format': {'type': 'string', 'enum': ['list', 'base64', 'handle']},
+        'dtype': {'type': 'string', 'enum': ['float32', 'float64']},
+        'compress': {'type': 'boolean'},
+    },
+}
+
+_wavelet_props = {
+    'wv_type': {'type': 'string', 'enum': ['ricker', 'ormsby', 'custom']},
+    'ricker_freq': _number,
+    'ormsby_freq': {'type': 'string', 'description': 'f1,f2,f3,f4 in Hz'},
+    'wavelet_str': _string,
+    'wavelet_fname': _string,
+    'phase_rot': _number,
+    'image_preset': {'type': 'string', 'enum': ['chat', 'preview', 'thumbnail', 'print', 'vector']},
+    'array_format': _array_format,
+}
+
+# name -> module, function, default timeout (s), description, input schema.
+# Functions take the arguments dict and return something JSON serialisable.
+TOOLS = {
+    'make_ricker': ('tools', 'make_ricker', 10., 'Generate a Ricker wavelet', {
+        'type': 'object',
+        'properties': {'frequency': _number, 'dt': _number, 'duration': _number, 'array_format': _array_format},
+        'required': ['frequency'],
+    }),
+    'compute_reflectivity': ('tools', 'compute_reflectivity', 10., 'Compute 1D reflectivity series', {
+        'type': 'object',
+        'properties': {
+            'vp': {'type': 'array', 'items': _number},
+            'rho': {'type': 'array', 'items': _number},
+            'n_samples': {'type': 'integer'},
+            'positions': {'type': 'array', 'items': {'type': 'integer'}},
+            'array_format': _array_format,
+        },
+        'required': ['vp'],
+    }),
+    'synthetic_seismogram': ('tools', 'synthetic_seismogram', 60., 'Synthetic seismograms for one or many wells from depth-sampled Vp and density logs', {
+        'type': 'object',
+        'properties': {
+            'depth': {'description': 'Depths (m), (nz,) or (nwells, nz); an array, encoded array or handle'},
+            'vp': {'description': 'P-wave velocity (m/s), same shape as depth'},
+            'rho': {'description': 'Density, same shape as depth'},
+            'dt': _number,
+            'wv_type': _wavelet_props['wv_type'],
+            'ricker_freq': _number,
+            'ormsby_freq': _wavelet_props['ormsby_freq'],
+            'wavelet_str': _string,
+            'wavelet_fname': _string,
+            'phase_rot': _number,
+            't_top': {'description': 'Two-way time (ms) of the first log sample, scalar or one per well'},
+            'array_format': _array_format,
+        },
+        'required': ['depth', 'vp', 'rho'],
+    }),
+    'synthetic_section': ('tools', 'synthetic_section', 600., 'Synthetic section of a large 2D impedance or Vp/density model (.npy files), written to an .npy file', {
+        'type': 'object',
+        'properties': {
+            'out_fname': _string,
+            'impedance': {'type': 'string', 'description': '.npy file, (nsamples, ntraces), sampled in time at dt'},
+            'vp': {'type': 'string', 'description': '.npy file, same layout as impedance'},
+            'rho': {'type': 'string', 'description': '.npy file, same layout as impedance'},
+            'dz': {'type': 'number', 'description': 'Depth step (m) when vp and rho are sampled in depth'},
+            'dt': _number,
+            'wv_type': _wavelet_props['wv_type'],
+            'ricker_freq': _number,
+            'ormsby_freq': _wavelet_props['ormsby_freq'],
+            'phase_rot': _number,
+            'chunk_traces': {'type': 'integer'},
+            'max_chunk_mb': _number,
+            'dtype': {'type': 'string', 'enum': ['float32', 'float64']},
+            'segy_fname': {'type': 'string', 'description': 'Also write the section to this SEG-Y file'},
+            'dx': {'type': 'number', 'description': 'Trace spacing for the SEG-Y CDP X coordinate'},
+        },
+        'required': ['out_fname'],
+    }),
+    'plot_wavelet': ('tools', 'plot_wavelet', 60., 'Plot a wavelet and its spectra; returns the image path', {
+        'type': 'object',
+        'properties': _wavelet_props,
+    }),
+    'wedge_model': ('tools', 'wedge_model', 120., 'Model and plot a three-layer wedge; returns the image, CSV and array paths', {
+        'type': 'object',
+        'properties': dict(_wavelet_props,
+            zunit = {'type': 'string', 'enum': ['m', 'ft']},
+            max_thickness = _number,
+            vp1 = _number, vp2 = _number, vp3 = _number,
+            rho1 = _number, rho2 = _number, rho3 = _number,
+            gain = _number,
+            plotpadtime = _number,
+            thickness_domain = {'type': 'string', 'enum': ['depth', 'time']},
+            ntraces = {'type': 'integer'},
+            sparse = {'type': 'boolean'},
+            segy_fname = {'type': 'string', 'description': 'Also write the synthetic section to this SEG-Y file'},
+            bundle_fname = {'type': 'string', 'description': 'Also write section, picks, curves and wavelet to this .npz file or directory'},
+        ),
+    }),
+    'wedge_phase_scan': ('tools', 'wedge_phase_scan', 120., 'Wedge tuning thickness and amplitude for a range of wavelet phase rotations', {
+        'type': 'object',
+        'properties': dict({k: v for k, v in _wavelet_props.items() if k not in ('phase_rot', 'image_preset')},
+            angles = {'description': 'Phase rotations in degrees (default 0-180 in 5 degree steps); an array, encoded array or handle'},
+            max_thickness = _number,
+            vp1 = _number, vp2 = _number, vp3 = _number,
+            rho1 = _number, rho2 = _number, rho3 = _number,
+            plotpadtime = _number,
+            ntraces = {'type': 'integer'},
+            sparse = {'type': 'boolean'},
+        ),
+    }),
+    'avo_wedge': ('tools', 'avo_wedge', 120., 'Angle-dependent (AVO) wedge: tuning thickness and amplitude per incidence angle', {
+        'type': 'object',
+        'properties': dict({k: v for k, v in _wavelet_props.items() if k != 'image_preset'},
+            angles = {'description': 'Incidence angles in degrees (default 0-40 in 2 degree steps); an array, encoded array or handle'},
+            method = {'type': 'string', 'enum': ['zoeppritz', 'akirichards']},
+            max_thickness = _number,
+            vp1 = _number, vp2 = _number, vp3 = _number,
+            vs1 = _number, vs2 = _number, vs3 = _number,
+            rho1 = _number, rho2 = _number, rho3 = _number,
+            plotpadtime = _number,
+            ntraces = {'type': 'integer'},
+            sparse = {'type': 'boolean'},
+        ),
+        'required': ['vs1', 'vs2', 'vs3'],
+    }),
+}
+
+class ToolError(Exception):
+    pass
+
+def _call(module, func, args):
+    return getattr(importlib.import_module(module), func)(args)
+
+def _uses_handles(args):
+    import array_store
+    fmt = args.get('array_format')
+    if isinstance(fmt, dict):
+        fmt = fmt.get('format')
+    return fmt == 'handle' or any(array_store.is_handle(v) for v in args.values())
+
+def _init_worker():
+    # Calls run side by side in separate processes; keep each one's FFTs single-threaded
+    import wedge
+    wedge.FFT_WORKERS = 1
+
+class ToolExecutor:
+    """
+    Runs tool functions in a 'thread' or 'process' pool of max_workers.
+    At most max_inflight calls hold a worker slot; up to max_queued more wait
+    for one and further calls are rejected straight away. A call that times
+    out or is cancelled returns at once, but keeps its slot until the worker
+    has actually finished, so abandoned calls cannot pile up in the pool.
+    """
+    def __init__(self, mode = None, max_workers = None, max_inflight = None, max_queued = None, timeouts = None):
+        self.mode = mode or os.environ.get('MCP_EXECUTOR', 'process')
+        self.max_workers = max_workers or int(os.environ.get('MCP_WORKERS', 0)) or os.cpu_count()
+        self.max_inflight = max_inflight or int(os.environ.get('MCP_MAX_INFLIGHT', 0)) or self.max_workers
+        self.max_queued = max_queued if max_queued is not None else int(os.environ.get('MCP_MAX_QUEUED', 32))
+        self.timeouts = {name: spec[2] for name, spec in TOOLS.items()}
+        if os.environ.get('MCP_TOOL_TIMEOUT'):
+            self.timeouts = dict.fromkeys(self.timeouts, float(os.environ['MCP_TOOL_TIMEOUT']))
+        self.timeouts.update(timeouts or {})
+        self._slots = None
+        self._waiting = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == 'process':
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers = self.max_workers,
+                    mp_context = multiprocessing.get_context('spawn'),
+                    initializer = _init_worker)
+            elif self.mode == 'thread':
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers = self.max_workers)
+            else:
+                raise ValueError('Unknown executor mode: %s' % self.mode)
+        return self._executor
+
+    async def call(self, name, args):
+        if name not in TOOLS:
+            raise ToolError('Unknown tool: %s' % name)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_inflight)
+        if self._slots.locked() and self._waiting >= self.max_queued:
+            raise ToolError('Server busy: %d calls in flight and %d queued, retry later' % (self.max_inflight, self._waiting))
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        module, func, timeout = TOOLS[name][:3]
+        try:
+            future = self._get_executor().submit(_call, module, func, args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release_callback(asyncio.get_running_loop()))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeouts.get(name, timeout))
+        except asyncio.TimeoutError:
+            raise ToolError('%s timed out after %g s' % (name, self.timeouts.get(name, timeout)))
+        finally:
+            # Drops the call if it has not started yet; a running call cannot be interrupted
+            future.cancel()
+
+    def _release_callback(self, loop):
+        def release(future):
+            try:
+                loop.call_soon_threadsafe(self._slots.release)
+            except RuntimeError:
+                pass  # the event loop has already been closed
+        return release
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait = False, cancel_futures = True)
+            self._executor = None
+
+class Server:
+    """Dispatches JSON-RPC messages from a client to a ToolExecutor."""
+    def __init__(self, executor = None, name = 'geo-mcp'):
+        self.executor = executor or ToolExecutor()
+        self.name = name
+        self._tasks = {}
+        self.array_format = None
+
+    def negotiate_arrays(self, capabilities):
+        """
+        Pick the array encoding for this client from the 'ndarray' entry of
+        its experimental capabilities, e.g. {'dtype': 'float32', 'compress': true}
+        or {'format': 'handle'}; the format defaults to 'base64'. Clients
+        that do not ask for it, or ask for something unsupported, get plain
+        lists.
+        """
+        wanted = (capabilities.get('experimental') or {}).get('ndarray')
+        if not isinstance(wanted, dict):
+            return None
+        import array_codec
+        try:
+            self.array_format = array_codec.options(dict({'format': 'base64'}, **wanted))
+            if self.array_format['format'] == 'raw':
+                raise ValueError('raw arrays cannot be sent to a client')
+        except ValueError:
+            self.array_format = None
+        return self.array_format
+
+    def list_tools(self):
+        return [{'name': name, 'description': spec[3], 'inputSchema': spec[4]} for name, spec in TOOLS.items()]
+
+    async def call_tool(self, name, args):
+        args = dict(args or {})
+        if self.array_format and name in TOOLS and 'array_format' in TOOLS[name][4]['properties']:
+            args.setdefault('array_format', self.array_format)
+        handles = None
+        try:
+            if _uses_handles(args):
+                # The store lives in this process: look handles up before the
+                # call goes to a worker, and store the arrays it returns here
+                import array_codec
+                args = array_codec.resolve(args)
+                if array_codec.options(args.get('array_format'))['format'] == 'handle':
+                    handles, args['array_format'] = args['array_format'], 'raw'
+            result = await self.executor.call(name, args)
+            if handles is not None:
+                result = array_codec.pack(result, handles)
+        except ToolError as e:
+            return {'content': [{'type': 'text', 'text': str(e)}], 'isError': True}
+        except Exception as e:
+            return {'content': [{'type': 'text', 'text': '%s: %s' % (type(e).__name__, e)}], 'isError': True}
+        return {'content': [{'type': 'text', 'text': json.dumps(result)}], 'isError': False}
+
+    async def handle(self, msg):
+        """Handle one request or notification; returns the response or None."""
+        method = msg.get('method')
+        params = msg.get('params') or {}
+        if method == 'initialize':
+            array_format = self.negotiate_arrays(params.get('capabilities') or {})
+            result = {
+                'protocolVersion': PROTOCOL_VERSION,
+                'capabilities': {'tools': {}, 'experimental': {'ndarray': array_format or {'format': 'list'}}},
+                'serverInfo': {'name': self.name, 'version': '0.1'},
+            }
+        elif method == 'ping':
+            result = {}
+        elif method == 'tools/list':
+            result = {'tools': self.list_tools()}
+        elif method == 'tools/call':
+            result = await self.call_tool(params.get('name'), params.get('arguments'))
+        elif method == 'notifications/cancelled':
+            task = self._tasks.get(params.get('requestId'))
+            if task is not None:
+                task.cancel()
+            return None
+        elif 'id' not in msg:
+            return None
+        else:
+            return {'jsonrpc': '2.0', 'id': msg['id'], 'error': {'code': -32601, 'message': 'Method not found: %s' % method}}
+        if 'id' not in msg:
+            return None
+        return {'jsonrpc': '2.0', 'id': msg['id'], 'result': result}
+
+    async def serve(self, reader, write):
+        """
+        Read messages from reader (an asyncio.StreamReader) and pass each
+        response to write(dict). Requests are handled concurrently; the
+        response to a cancelled request is dropped.
+        """
+        async def run(msg):
+            try:
+                response = await self.handle(msg)
+            except asyncio.CancelledError:
+                return
+            finally:
+                self._tasks.pop(msg.get('id'), None)
+            if response is not None:
+                write(response)
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    write({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+                    continue
+                task = asyncio.ensure_future(run(msg))
+                if 'id' in msg and msg.get('method') == 'tools/call':
+                    self._tasks[msg['id']] = task
+            if self._tasks:
+                await asyncio.gather(*self._tasks.values(), return_exceptions = True)
+        finally:
+            self.executor.shutdown()
+
+async def serve_stdio(server = None):
+    server = server or Server()
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(msg):
+        sys.stdout.write(json.dumps(msg) + '\n')
+        sys.stdout.flush()
+
+    await server.serve(reader, write)
+
+def run_stdio(**kwargs):
+    """Serve the tools on stdin/stdout; keyword arguments go to ToolExecutor."""
+    asyncio.run(serve_stdio(Server(ToolExecutor(**kwargs))))
+
+if __name__ == '__main__':
+    run_stdio()
@@ -0,0 +1,101 @@
+# bench_startup.py
+"""
+Cold-start benchmark for the MCP tool modules.
+
+Every measurement runs in a fresh interpreter, as a newly spawned server
+would: the import time of each module, and the time from interpreter start
+to the first response of each tool. Usage:
+
+    python bench_startup.py [--repeat 5] [--importtime]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = ['tools', 'wedge', 'wavelet_cache', 'figures', 'render_pool', 'artifact_cache']
+
+# Tool name -> (module, function, example arguments)
+TOOLS = {
+    'compute_reflectivity': ('tools', 'compute_reflectivity', {'vp': [2000, 2500, 2000], 'n_samples': 500, 'positions': [100, 300]}),
+    'make_ricker': ('tools', 'make_ricker', {'frequency': 25}),
+    'plot_ricker': ('tools', 'plot_ricker', {'wavelet': [0., 0.5, 1., 0.5, 0.]}),
+}
+
+_IMPORT_SNIPPET = """
+import time, json
+t = time.perf_counter()
+import {module}
+print(json.dumps({{'ms': (time.perf_counter() - t)*1000}}))
+"""
+
+_TOOL_SNIPPET = """
+import time, json
+t = time.perf_counter()
+from {module} import {func}
+t_import = time.perf_counter()
+{func}(json.loads({args!r}))
+t_call = time.perf_counter()
+print(json.dumps({{'import_ms': (t_import - t)*1000, 'call_ms': (t_call - t_import)*1000}}))
+"""
+
+def _run(snippet):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', snippet], cwd = HERE, capture_output = True, text = True, check = True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['wall_ms'] = (time.perf_counter() - start)*1000
+    return result
+
+def bench_import(module, repeat = 5):
+    """Median import time (ms) of module in a fresh interpreter."""
+    return statistics.median(_run(_IMPORT_SNIPPET.format(module = module))['ms'] for i in range(repeat))
+
+def bench_first_response(tool, repeat = 5):
+    """
+    Median cold-start cost (ms) of a tool: importing it, its first call, and
+    the process wall time including interpreter start-up.
+    """
+    module, func, args = TOOLS[tool]
+    runs = [_run(_TOOL_SNIPPET.format(module = module, func = func, args = json.dumps(args))) for i in range(repeat)]
+    return {key: statistics.median(r[key] for r in runs) for key in ('import_ms', 'call_ms', 'wall_ms')}
+
+def import_offenders(module, top = 15):
+    """Slowest cumulative imports of module according to python -X importtime."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module], cwd = HERE,
+        capture_output = True, text = True, check = True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse = True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type = int, default = 5)
+    parser.add_argument('--importtime', action = 'store_true', help = 'also list the slowest imports of tools')
+    opts = parser.parse_args()
+
+    print('%-24s %10s' % ('module', 'import ms'))
+    for module in MODULES:
+        print('%-24s %10.1f' % (module, bench_import(module, opts.repeat)))
+
+    print()
+    print('%-24s %10s %10s %10s' % ('tool', 'import ms', 'call ms', 'wall ms'))
+    for tool in TOOLS:
+        r = bench_first_response(tool, opts.repeat)
+        print('%-24s %10.1f %10.1f %10.1f' % (tool, r['import_ms'], r['call_ms'], r['wall_ms']))
+
+    if opts.importtime:
+        print()
+        for cumulative_us, name in import_offenders('tools'):
+            print('%10.1f ms  %s' % (cumulative_us/1000, name))
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,25 @@
-import gradio as gr
 import json
 import re
 import numpy as np
-import matplotlib.pyplot as plt
-from tools import make_ricker, plot_ricker, compute_reflectivity
-import io
-import base64
+from tools import make_ricker, compute_reflectivity
+from array_codec import decode, resolve
+import render_pool
+import image_output
+import streaming
 
 class SeismicChatBot:
-    def __init__(self):
+    def __init__(self, image_preset=None):
+        self.image_opts = image_output.options(image_preset)
         self.available_tools = {
             'make_ricker': {
                 'function': make_ricker,
                 'description': 'Creates a Ricker wavelet',
                 'keywords': ['ricker', 'wavelet', 'create', 'make', 'generate'],
                 'required_params': ['frequency'],
-                'optional_params': {'dt': 0.001, 'duration': 0.256}
+                'optional_params': {'dt': 0.001, 'duration': 0.256, 'array_format': 'handle'}
             },
             'plot_ricker': {
-                'function': plot_ricker,
+                'function': self.render_ricker,
                 'description': 'Plots a Ricker wavelet with time domain and frequency domain analysis',
                 'keywords': ['plot', 'show', 'visualize', 'display', 'graph', 'chart'],
                 'required_params': ['wavelet'],
@@ -29,11 +30,42 @@ class SeismicChatBot:
                 'description': 'Computes reflectivity from velocity and density data',
                 'keywords': ['reflectivity', 'reflection', 'coefficient', 'velocity', 'density', 'impedance'],
                 'required_params': ['vp'],
-                'optional_params': {'rho': None, 'n_samples': 1000, 'positions': [100, 300]}
+                'optional_params': {'rho': None, 'n_samples': 1000, 'positions': None, 'array_format': 'handle'}
+            },
+            'wedge_model': {
+                'function': self.render_wedge,
+                'description': 'Models a three-layer wedge and its tuning response',
+                'keywords': ['wedge', 'tuning', 'thickness', 'thin bed'],
+                'required_params': [],
+                'optional_params': {'ricker_freq': 25}
             }
         }
+        # Arrays are kept as array_store handles, not as the data itself
         self.conversation_context = {}
     
+    def render_ricker(self, params):
+        """Render the plot_ricker figure in the worker pool and return the stored image path"""
+        img_bytes = render_pool.render('ricker', dict(self.image_opts, args=resolve(params)))
+        return image_output.store(img_bytes, self.image_opts['format'])
+    
+    def stream_wedge(self, params):
+        """Yield the chat response for a wedge model as it builds up: progress lines, a preview, then the final plot"""
+        lines = []
+        image = ''
+        for event in streaming.stream_wedge(params, self.image_opts):
+            lines.append(streaming.describe(event, params.get('zunit', 'm')))
+            if event['stage'] == 'preview':
+                image = "\n\n" + image_output.markdown(event['image'], "Wedge Model Preview")
+            elif event['stage'] == 'done':
+                image = "\n\n" + image_output.markdown(event['image'], "Wedge Model")
+            yield "\n".join(lines) + image
+
+    def render_wedge(self, params):
+        """Run the wedge model without streaming and return the stored image path"""
+        for event in streaming.stream_wedge(params, self.image_opts):
+            pass
+        return event['image']
+
     def extract_numbers(self, text):
         """Extract numbers from text"""
         numbers = re.findall(r'\d+\.?\d*', text)
@@ -101,6 +133,10 @@ class SeismicChatBot:
                 max_score = score
                 best_tool = tool_name
         
+        # The wedge keyword is decisive; wedge requests also mention wavelets
+        if 'wedge' in text:
+            best_tool = 'wedge_model'
+
         if not best_tool:
             return None, "I couldn't understand what seismic modeling operation you'd like to perform. Try asking about creating a ricker wavelet, plotting wavelets, or computing reflectivity."
         
@@ -138,12 +174,21 @@ class SeismicChatBot:
                 # Try to create a wavelet first
                 frequencies = self.extract_frequencies(text)
                 if frequencies:
-                    ricker_params = {'frequency': frequencies[0]}
+                    ricker_params = {'frequency': frequencies[0], 'array_format': 'handle'}
                     result = make_ricker(ricker_params)
                     params['wavelet'] = result['wavelet']
                     params['time'] = result['time']
                     self.conversation_context.update(result)
         
+        elif best_tool == 'wedge_model':
+            frequencies = self.extract_frequencies(text)
+            if frequencies:
+                params['ricker_freq'] = frequencies[0]
+            # Lengths only: '2000 m/s' and '2000 m per second' are velocities
+            thickness = re.findall(r'(\d+\.?\d*)\s*(?:m|meters?|metres?)\b(?!\s*(?:/|per\b))', text)
+            if thickness:
+                params['max_thickness'] = float(thickness[0])
+
         elif best_tool == 'compute_reflectivity':
             velocities = self.extract_velocities(text)
             if velocities:
@@ -195,7 +240,7 @@ class SeismicChatBot:
 - Sampling interval (dt): {dt} seconds
 - Duration: {duration} seconds
 
-The wavelet contains {len(result['wavelet'])} samples. This Ricker wavelet is commonly used in seismic modeling as a source wavelet due to its zero-phase characteristic and compact frequency spectrum.
+The wavelet contains {len(decode(result['wavelet']))} samples. This Ricker wavelet is commonly used in seismic modeling as a source wavelet due to its zero-phase characteristic and compact frequency spectrum.
 
 The wavelet data has been stored for further analysis. You can now ask me to plot it or use it in other operations."""
         
@@ -216,7 +261,7 @@ This visualization helps understand both the temporal and spectral characteristi
             
             response = f"""I've computed the reflectivity series from {n_layers} velocity layers:
 - Input velocities: {vp}
-- Generated {len(result['reflectivity'])} reflection coefficients
+- Generated {len(decode(result['reflectivity']))} reflection coefficients
 
 The reflectivity represents the contrast in acoustic impedance between layers. Positive values indicate an increase in impedance (hard reflection), while negative values indicate a decrease (soft reflection). This reflectivity series can be convolved with a source wavelet to generate synthetic seismograms."""
         
@@ -225,21 +270,37 @@ The reflectivity represents the contrast in acoustic impedance between layers. P
         
         return response
 
-def create_chat_interface():
-    chatbot = SeismicChatBot()
+def create_chat_interface(image_preset=None):
+    # Gradio is only needed for the UI, not for the chatbot itself
+    import gradio as gr
+    chatbot = SeismicChatBot(image_preset)
     
     def chat_fn(message, history):
+        # Generator: Gradio shows every yielded history, so long jobs stream
         # Parse the natural language input
         tool_name, params_or_error = chatbot.parse_natural_language(message)
         
         if tool_name is None:
-            return history + [[message, params_or_error]]
+            yield history + [[message, params_or_error]]
+            return
+        
+        if tool_name == 'wedge_model':
+            # Stream progress, intermediate numbers and a preview before the final plot
+            try:
+                for response in chatbot.stream_wedge(params_or_error):
+                    yield history + [[message, response]]
+            except Exception as e:
+                yield history + [[message, f"Error: {str(e)}"]]
+            return
+        
+        yield history + [[message, "Working on it..."]]
         
         # Execute the tool
         result, error = chatbot.execute_tool(tool_name, params_or_error)
         
         if error:
-            return history + [[message, f"Error: {error}"]]
+            yield history + [[message, f"Error: {error}"]]
+            return
         
         # Update conversation context
         if isinstance(result, dict):
@@ -249,17 +310,11 @@ def create_chat_interface():
         response = chatbot.format_response(tool_name, params_or_error, result)
         
         # Handle plotting
-        if tool_name == 'plot_ricker' and isinstance(result, plt.Figure):
-            # Convert matplotlib figure to image
-            buf = io.BytesIO()
-            result.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-            buf.seek(0)
-            img_str = base64.b64encode(buf.read()).decode()
-            
-            response += f"\n\n![Ricker Wavelet Plot](data:image/png;base64,{img_str})"
-            plt.close(result)  # Clean up the figure
+        if tool_name == 'plot_ricker' and isinstance(result, str):
+            # Reference the stored image instead of inlining it
+            response += "\n\n" + image_output.markdown(result, "Ricker Wavelet Plot")
         
-        return history + [[message, response]]
+        yield history + [[message, response]]
     
     # Create the Gradio interface
     with gr.Blocks(title="Seismic Modeling Chat Interface") as demo:
@@ -270,6 +325,7 @@ def create_chat_interface():
         - Create Ricker wavelets: *"Create a 30 Hz Ricker wavelet"*
         - Plot wavelets: *"Plot the wavelet"* or *"Show me a 25 Hz ricker wavelet"*
         - Compute reflectivity: *"Calculate reflectivity for velocities [2000, 3000, 2500]"*
+        - Model wedges: *"Model a 50 m wedge with a 30 Hz wavelet"*
         
         Just describe what you want to do in natural language!
         """)
@@ -294,7 +350,8 @@ def create_chat_interface():
                 "Plot a 30 Hz Ricker wavelet", 
                 "Generate a ricker wavelet with frequency 20 Hz and duration 0.5 seconds",
                 "Compute reflectivity for velocities [2000, 3000, 2500, 4000]",
-                "Show me the frequency spectrum of a 35 Hz ricker"
+                "Show me the frequency spectrum of a 35 Hz ricker",
+                "Model a 40 m wedge with a 30 Hz wavelet"
             ],
             inputs=msg
         )
@@ -311,4 +368,4 @@ def create_chat_interface():
 
 if __name__ == "__main__":
     demo = create_chat_interface()
-    demo.launch(debug=True, share=True)
\ No newline at end of file
+    demo.launch(debug=True, share=True, allowed_paths=[image_output.get_store().root])
\ No newline at end of file
@@ -0,0 +1,3 @@
+# conftest.py
+# test_messages_chatbot.py is a Gradio demo app, not a test module
+collect_ignore = ['test_messages_chatbot.py']
@@ -0,0 +1,130 @@
+# export.py
+"""
+Binary export bundles: a set of named arrays plus JSON metadata.
+
+A bundle is either a directory of .npy files with a meta.json, or a single
+.npz archive holding the same members. Arrays are written a block of rows
+at a time, so memory-mapped inputs larger than RAM can be exported.
+read_bundle memory-maps the arrays of directory bundles and of
+uncompressed .npz archives without copying them.
+"""
+import os
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+# Arrays from a wedge result that go into its bundle, when present
+WEDGE_ARRAYS = ['data', 't', 'thickness', 'hor1_tpicks', 'hor2_tpicks', 'hor3_tpicks', 'amp_picks',
+    'thickness_apparent_t', 'thickness_apparent_z', 'wavelet_t', 'wavelet']
+
+CHUNK_BYTES = 64*2**20
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+def _write_npy(f, arr, chunk_bytes):
+    arr = np.asanyarray(arr)
+    if not arr.flags.c_contiguous and not isinstance(arr, np.memmap):
+        arr = np.ascontiguousarray(arr)
+    header = np.lib.format.header_data_from_array_1_0(arr)
+    header['fortran_order'] = False
+    np.lib.format.write_array_header_1_0(f, header)
+    if arr.ndim == 0:
+        f.write(arr.tobytes())
+        return
+    rows = max(1, chunk_bytes//max(1, arr[:1].nbytes))
+    for i in range(0, arr.shape[0], rows):
+        f.write(np.ascontiguousarray(arr[i:i+rows]).tobytes())
+
+def write_bundle(path, arrays, meta = None, compress = False, chunk_bytes = CHUNK_BYTES):
+    """
+    Write arrays (name -> array; None values are skipped) and meta (a JSON
+    serialisable dict) to path: a .npz archive, deflated when compress is
+    set, or otherwise a directory. Returns path.
+    """
+    arrays = {name: arr for name, arr in arrays.items() if arr is not None}
+    meta = {key: _jsonable(value) for key, value in (meta or {}).items()}
+    if path.endswith('.npz'):
+        mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(path, 'w', compression = mode, allowZip64 = True) as zf:
+            for name, arr in arrays.items():
+                with zf.open(name + '.npy', 'w', force_zip64 = True) as f:
+                    _write_npy(f, arr, chunk_bytes)
+            zf.writestr('meta.json', json.dumps(meta))
+    else:
+        if compress:
+            raise ValueError('Only .npz bundles can be compressed')
+        os.makedirs(path, exist_ok = True)
+        for name, arr in arrays.items():
+            with open(os.path.join(path, name + '.npy'), 'wb') as f:
+                _write_npy(f, arr, chunk_bytes)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+    return path
+
+def _mmap_member(path, zf, info):
+    # Stored members are plain .npy files inside the zip: find where the
+    # data starts and map it directly
+    with open(path, 'rb') as f:
+        f.seek(info.header_offset)
+        local = struct.unpack('<4s5H3L2H', f.read(30))
+        f.seek(info.header_offset + 30 + local[9] + local[10])
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject:
+        raise ValueError('Cannot memory-map object arrays')
+    if not shape or 0 in shape:
+        with zf.open(info) as f:
+            return np.lib.format.read_array(f)
+    return np.memmap(path, dtype = dtype, mode = 'r', offset = offset, shape = shape, order = 'F' if fortran_order else 'C')
+
+def read_bundle(path, mmap = True):
+    """
+    Read a bundle back as (arrays, meta). With mmap the arrays are
+    read-only memory maps wherever the format allows (directories and
+    uncompressed .npz); compressed members are decompressed into memory.
+    """
+    arrays = {}
+    if path.endswith('.npz'):
+        with zipfile.ZipFile(path) as zf:
+            meta = json.loads(zf.read('meta.json')) if 'meta.json' in zf.namelist() else {}
+            for info in zf.infolist():
+                if not info.filename.endswith('.npy'):
+                    continue
+                name = info.filename[:-4]
+                if mmap and info.compress_type == zipfile.ZIP_STORED:
+                    arrays[name] = _mmap_member(path, zf, info)
+                else:
+                    with zf.open(info) as f:
+                        arrays[name] = np.lib.format.read_array(f)
+    else:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        for fname in sorted(os.listdir(path)):
+            if fname.endswith('.npy'):
+                arrays[fname[:-4]] = np.load(os.path.join(path, fname), mmap_mode = 'r' if mmap else None)
+    return arrays, meta
+
+def wedge_meta(result, zunit = 'm'):
+    """Metadata of a wedge result: sampling, units, layer properties and the tuning summary."""
+    meta = {key: result[key] for key in ('wavelet_label', 'vp_layers', 'rho_layers', 't0', 'nt', 'dt',
+        'z_min', 'z_max', 'dz', 'tuning_thickness', 'tuning_thickness_t', 'tuning_amplitude',
+        'min_apparent_thickness_t', 'min_apparent_thickness_z') if key in result}
+    meta.update(zunit = zunit, time_unit = 'ms', layout = {'data': ['time', 'trace']})
+    return meta
+
+def export_wedge(path, result, zunit = 'm', compress = False):
+    """Bundle the section, picks, amplitude curve and wavelet of a wedge result (see wedge.analyze_wedge)."""
+    return write_bundle(path, {name: result.get(name) for name in WEDGE_ARRAYS}, wedge_meta(result, zunit), compress)
@@ -0,0 +1,301 @@
+# figures.py
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+
+STYLE = {
+    'legend.fontsize': 'x-large',
+    'axes.labelsize': 16,
+    'axes.titlesize': 'x-large',
+    'xtick.labelsize': 'x-large',
+    'ytick.labelsize': 'x-large',
+}
+
+def create_figure():
+    """
+    Build the 3x1 figure used by the wavelet and wedge plots. The style is
+    applied through rc_context so the global rcParams are left untouched,
+    and the figure is not registered with pyplot.
+    """
+    with matplotlib.rc_context(STYLE):
+        fig = Figure(figsize=(12, 14))
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(3, 1)
+        for ax in axes:
+            ax.tick_params(labelsize = STYLE['xtick.labelsize'])
+
+    return fig, axes
+
+def _fill_polys(x, y):
+    """Polygons filling the positive and negative parts of y(x) down to zero."""
+    xx = np.hstack((x, x[::-1]))
+    zeros = np.zeros_like(y)
+    return [
+        np.column_stack((xx, np.hstack((np.maximum(y, 0), zeros)))),
+        np.column_stack((xx, np.hstack((np.minimum(y, 0), zeros)))),
+    ]
+
+class WaveletFigure:
+    """Pre-laid-out wavelet / amplitude spectrum / power spectrum figure."""
+    layout = 'wavelet'
+
+    def __init__(self):
+        lw = 1.5
+        self.fig, axes = create_figure()
+        ax0, ax1, ax2 = self.axes = axes
+
+        with matplotlib.rc_context(STYLE):
+            self.wavelet_line, = ax0.plot([], [], color = 'black', lw = lw, label = 'wavelet')
+            ax0.legend()
+            self.wavelet_fill = PolyCollection([], facecolors = [[0.8, 0.8, 1.0], [1.0, 0.8, 0.8]], edgecolors = 'none')
+            ax0.add_collection(self.wavelet_fill)
+            ax0.set_xlabel('Time (ms)')
+            ax0.set_ylabel('Amplitude')
+            self.title = ax0.set_title(' ', fontsize = 18)
+            ax0.tick_params(top = True, right = True, labelright = True)
+            ax0.grid(linestyle = ':')
+
+            self.amp_line, = ax1.plot([], [], color = 'green', lw = lw, label = 'Amplitude spectrum')
+            ax1.legend()
+            ax1.set_xlabel('Frequency (Hz)')
+            ax1.set_ylabel('Amplitude (linear)')
+            ax1.tick_params(top = True, right = True, labelright = True)
+            ax1.grid(linestyle = ':')
+
+            self.pow_line, = ax2.plot([], [], color = 'blue', lw = lw, label = 'Power spectrum (normalized)')
+            ax2.legend()
+            ax2.set_xlabel('Frequency (Hz)')
+            ax2.set_ylabel('Power (dB)')
+            ax2.set_ylim((-65, 5))
+            ax2.tick_params(top = True, right = True, labelright = True)
+            ax2.grid(linestyle = ':')
+
+            # Lay out once against representative limits; updates keep it fixed
+            ax0.set_xlim(-100, 100)
+            ax0.set_ylim(-0.5, 1.0)
+            ax1.set_xlim(0, 200)
+            ax1.set_ylim(0, 100)
+            ax2.set_xlim(0, 200)
+            self.fig.tight_layout()
+            for ax in (ax0, ax1):
+                ax.set_autoscale_on(True)
+            ax2.set_autoscalex_on(True)
+
+    def update(self, t, wavelet, freq, amp_spec, pow_spec, title):
+        ax0, ax1, ax2 = self.axes
+        self.wavelet_line.set_data(t, wavelet)
+        self.wavelet_fill.set_verts(_fill_polys(t, wavelet))
+        self.amp_line.set_data(freq, amp_spec)
+        self.pow_line.set_data(freq, pow_spec)
+        self.title.set_text(title)
+
+        for ax in (ax0, ax1):
+            ax.relim()
+            ax.autoscale_view()
+        ax2.relim()
+        ax2.autoscale_view(scaley = False)
+
+        return self.fig
+
+class WedgeFigure:
+    """Pre-laid-out wedge model / synthetic section / tuning curve figure."""
+    layout = 'wedge'
+
+    def __init__(self):
+        self.fig, axes = create_figure()
+        ax0, ax1, ax2 = self.axes = axes
+        self.section = []
+
+        with matplotlib.rc_context(STYLE):
+            self.model_if1, = ax0.plot([], [], color = 'blue', lw = 1.5)
+            self.model_if2, = ax0.plot([], [], color = 'red', lw = 1.5)
+            ax0.set_ylabel('Time (ms)')
+            ax0.tick_params(top = True, right = True, labelright = True)
+            ax0.grid(linestyle = ':')
+            self.layer_texts = [ax0.text(0, 0, '', verticalalignment = 'center', fontsize = 16) for i in range(3)]
+
+            self.section_if1, = ax1.plot([], [], color = 'blue', lw = 1)
+            self.section_if2, = ax1.plot([], [], color = 'red', lw = 1)
+            self.hor1, = ax1.plot([], [], 'o', color = 'blue', lw = 2, linestyle = '--')
+            self.hor3, = ax1.plot([], [], 'o', color = 'blue', lw = 2, linestyle = ':')
+            self.hor2, = ax1.plot([], [], 'o', color = 'red', lw = 2, linestyle = '--')
+            ax1.set_ylabel('Time (ms)')
+            ax1.tick_params(top = True, right = True, labelright = True)
+            self.wavelet_text = ax1.text(0, 0, '', verticalalignment = 'center', fontsize = 16,
+                bbox = dict(facecolor = 'white'))
+
+            self.amp_line, = ax2.plot([], [], color = 'blue')
+            ax2.tick_params(top = True)
+            ax2.tick_params(axis = 'y', labelcolor = 'blue')
+            self.tuning_vline = ax2.axvline(0, color = 'k', lw = 2, linestyle = '--')
+            self.tuning_marker, = ax2.plot([], [], marker = 'o', markersize = 8, color = 'k', linestyle = ':')
+            ax2.grid(True, axis = 'x', linestyle = ':')
+            self.tuning_text = ax2.text(0, 0, '', fontsize = 16)
+
+            ax3_color = 'magenta'
+            self.ax3 = ax3 = ax2.twinx()
+            ax3.tick_params(labelsize = STYLE['ytick.labelsize'])
+            self.true_thickness, = ax3.plot([], [], color = ax3_color, lw = 0.5, linestyle = '--')
+            self.apparent_thickness, = ax3.plot([], [], color = ax3_color)
+            ax3.tick_params(top = True)
+            ax3.tick_params(axis = 'y', labelcolor = ax3_color)
+            ax3.set_ylabel(' ', color = ax3_color)
+            ax3.grid(True, axis = 'y', linestyle = ':')
+
+            # Lay out once against representative labels and limits
+            ax0.set_xlabel(' ')
+            ax1.set_xlabel(' ')
+            ax2.set_xlabel(' \n\n \n ', color = 'blue')
+            for ax in (ax0, ax1):
+                ax.set_ylim(360, 280)
+            ax2.set_ylim(0, 0.25)
+            ax3.set_ylim(0, 100)
+            self.fig.tight_layout()
+            ax2.set_autoscaley_on(True)
+            ax3.set_autoscaley_on(True)
+
+    def clear_section(self):
+        for artist in self.section:
+            artist.remove()
+        self.section = []
+
+    def update(self, zunit, t, section, wavelet_label, vp_layers, rho_layers, thickness,
+            interface1_t, interface2_t, hor1_tpicks, hor2_tpicks, hor3_tpicks, amp_picks,
+            thickness_true, thickness_apparent, thickness_apparent_t, thickness_apparent_z, thickness_unit,
+            tuning_thickness, itrc_tuning, z_min, z_max, dz, excursion, plotpadtime):
+        from wedge import plot_vawig
+        ax0, ax1, ax2 = self.axes
+        ax3 = self.ax3
+
+        min_plot_time = interface1_t[0] - plotpadtime
+        max_plot_time = interface2_t[-1] + plotpadtime
+        xlim = (z_min - excursion, z_max + excursion)
+        xlabel = 'True Thickness (%s)' % zunit
+
+        self.model_if1.set_data(thickness, interface1_t)
+        self.model_if2.set_data(thickness, interface2_t)
+        ax0.set_ylim(max_plot_time, min_plot_time)
+        ax0.set_xlim(*xlim)
+        ax0.xaxis.label.set_text(xlabel)
+
+        text_pos = [
+            (2, min_plot_time+(interface1_t[0]-min_plot_time)*0.5),
+            ((z_min+z_max)*0.8, interface1_t[-1] + (interface2_t[-1]-interface1_t[-1])*0.5),
+            (2, interface2_t[0] + (max_plot_time-interface1_t[0])*0.5),
+        ]
+        for i, text in enumerate(self.layer_texts):
+            text.set_position(text_pos[i])
+            text.set_text('Layer %d\n$V_P$=%.2f %s/s\n$\\rho$=%.2f $g/cc$' % (i+1, vp_layers[i], zunit, rho_layers[i]))
+
+        self.clear_section()
+        ncoll = len(ax1.collections)
+        in_plot = (t >= min_plot_time - (t[1] - t[0])) & (t <= max_plot_time + (t[1] - t[0]))
+        ax1.set_xlim(*xlim)
+        plot_vawig(ax1, section[in_plot].T, t[in_plot], z_min, dz, excursion, decimate = True)
+        self.section = ax1.collections[ncoll:]
+
+        self.section_if1.set_data(thickness, interface1_t)
+        self.section_if2.set_data(thickness, interface2_t)
+        self.hor1.set_data(thickness, hor1_tpicks)
+        self.hor2.set_data(thickness, hor2_tpicks)
+        if hor3_tpicks is None:
+            self.hor1.set_color('blue')
+            self.hor3.set_data([], [])
+        else:
+            self.hor1.set_color('black')
+            self.hor3.set_data(thickness, hor3_tpicks)
+        ax1.set_xlim(*xlim)
+        ax1.set_ylim(max_plot_time, min_plot_time)
+        ax1.xaxis.label.set_text(xlabel)
+        self.wavelet_text.set_position((0, min_plot_time + (max_plot_time - min_plot_time)*0.9))
+        self.wavelet_text.set_text(wavelet_label)
+
+        self.amp_line.set_data(thickness, amp_picks)
+        ax2.set_xlim(*xlim)
+        ax2.relim()
+        ax2.autoscale_view(scalex = False)
+        self.tuning_vline.set_xdata([tuning_thickness, tuning_thickness])
+        self.tuning_marker.set_data([tuning_thickness], [amp_picks[itrc_tuning]])
+
+        ylim = ax2.get_ylim()
+        if amp_picks[itrc_tuning] > 0:
+            y = ylim[0] + (ylim[1] - ylim[0])*0.1
+        else:
+            y = ylim[1] + (ylim[1] - ylim[0])*0.17
+        dx = (xlim[1] - xlim[0]) / 60
+        self.tuning_text.set_position((tuning_thickness + dx, y))
+        self.tuning_text.set_text('peak tuning thickness:\n%.1f %s (%.1f ms)' % (tuning_thickness, zunit, tuning_thickness*2000/vp_layers[1]))
+
+        self.true_thickness.set_data(thickness, thickness_true)
+        self.apparent_thickness.set_data(thickness, thickness_apparent)
+        ax3.relim()
+        ax3.autoscale_view(scalex = False)
+        min_thickness_txt = 'minimum apparent thickness:\n%.1f %s (%.1f ms)' % (thickness_apparent_z.min(), zunit, thickness_apparent_t.min())
+        ax2.xaxis.label.set_text(xlabel + '\n\n%s' % min_thickness_txt)
+        ax3.yaxis.label.set_text('Apparent Thickness (%s)' % thickness_unit)
+
+        return self.fig
+
+LAYOUTS = {
+    WaveletFigure.layout: WaveletFigure,
+    WedgeFigure.layout: WedgeFigure,
+}
+
+class FigurePool:
+    """
+    Pool of pre-built figure templates per layout. acquire() hands out an
+    idle template (building one if none is free) and release() returns it
+    for reuse, keeping at most max_idle idle templates per layout.
+    """
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._idle = {layout: [] for layout in LAYOUTS}
+        self._busy = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, layout):
+        with self._lock:
+            tpl = self._idle[layout].pop() if self._idle[layout] else None
+        if tpl is None:
+            tpl = LAYOUTS[layout]()
+        with self._lock:
+            self._busy[id(tpl.fig)] = tpl
+        return tpl
+
+    def release(self, tpl_or_fig):
+        with self._lock:
+            tpl = self._busy.pop(id(getattr(tpl_or_fig, 'fig', tpl_or_fig)), None)
+            if tpl is not None and len(self._idle[tpl.layout]) < self.max_idle:
+                self._idle[tpl.layout].append(tpl)
+
+    def warm(self, layouts = None, count = 1):
+        tpls = [self.acquire(layout) for layout in (layouts or LAYOUTS) for i in range(count)]
+        for tpl in tpls:
+            self.release(tpl)
+
+_pool = FigurePool(int(os.environ.get('FIGURE_POOL_SIZE', 4)))
+
+def acquire(layout):
+    return _pool.acquire(layout)
+
+def release(tpl_or_fig):
+    """Return a template (or the figure it owns) to the pool."""
+    _pool.release(tpl_or_fig)
+
+def warm(layouts = None, count = 1):
+    _pool.warm(layouts, count)
+
+@contextmanager
+def figure_template(layout):
+    tpl = acquire(layout)
+    try:
+        yield tpl
+    finally:
+        release(tpl)
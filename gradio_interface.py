@@ -1,14 +1,14 @@
 import os
 import json
 import gradio as gr
-import numpy as np
-import matplotlib.pyplot as plt
 from PIL import Image
 import openai
 from dotenv import load_dotenv
 from tools import make_ricker, compute_reflectivity
-from  import wedge_model, plot_wavelet
-from chat_interface import parse_user_input, process_request
+from array_codec import decode
+import render_pool
+import image_output
+from chat_interface import SeismicChatBot
 
 # Load environment variables
 load_dotenv()
@@ -20,7 +20,20 @@ if not openai_api_key:
 
 openai.api_key = openai_api_key
 
-# Function to handle chat interactions
+# Keyword parser for requests that can be plotted without the LLM
+direct_chatbot = SeismicChatBot()
+
+def process_request(message):
+    """Render wedge and wavelet plot requests directly; returns (text, image path), or (None, None) for anything else."""
+    tool_name, params = direct_chatbot.parse_natural_language(message)
+    if tool_name == 'wedge_model':
+        return "Here is the wedge model.", direct_chatbot.render_wedge(params)
+    if tool_name == 'plot_ricker' and 'wavelet' in params:
+        return "Here is the Ricker wavelet plot.", direct_chatbot.render_ricker(params)
+    return None, None
+
+# Function to handle chat interactions. It is a generator, so the image is
+# shown as soon as it is rendered, before the model's explanation arrives.
 def chat_and_generate(message, history):
     # Parse the user input to extract parameters
     try:
@@ -30,7 +43,8 @@ def chat_and_generate(message, history):
         # If successful, return the image and response
         if image_path and os.path.exists(image_path):
             img = Image.open(image_path)
-            return response_text, img
+            yield response_text, img
+            return
         
         # If no image was generated, treat as a regular chat message for OpenAI
         client = openai.OpenAI()
@@ -106,23 +120,21 @@ def chat_and_generate(message, history):
             
             # Execute the tool
             if tool_name == "make_ricker":
-                result = make_ricker(tool_args)
+                # Arrays stay in the array store; the model only sees handles
+                result = make_ricker(dict(tool_args, array_format='handle'))
                 
                 # Plot the Ricker wavelet
-                wavelet = np.array(result["wavelet"])
-                time = np.array(result["time"])
+                wavelet = decode(result["wavelet"])
+                time = decode(result["time"])
                 
-                plt.figure(figsize=(10, 6))
-                plt.plot(time, wavelet)
-                plt.title(f"Ricker Wavelet ({tool_args['frequency']} Hz)")
-                plt.xlabel("Time (s)")
-                plt.ylabel("Amplitude")
-                plt.grid(True)
-                
-                # Save the plot
-                temp_img_path = "temp_wavelet.png"
-                plt.savefig(temp_img_path)
-                plt.close()
+                img_bytes = render_pool.render('xy', {
+                    'x': time, 'y': wavelet,
+                    'title': f"Ricker Wavelet ({tool_args['frequency']} Hz)",
+                    'xlabel': "Time (s)", 'ylabel': "Amplitude",
+                    **image_output.options(),
+                })
+                img_path = image_output.store(img_bytes, image_output.options()['format'])
+                yield "Generated the Ricker wavelet, explaining the result...", img_path
                 
                 # Send result back to OpenAI
                 followup = client.chat.completions.create(
@@ -136,26 +148,23 @@ def chat_and_generate(message, history):
                 )
                 
                 # Return the image and the explanation
-                img = Image.open(temp_img_path)
-                return followup.choices[0].message.content, img
+                yield followup.choices[0].message.content, img_path
+                return
                 
             elif tool_name == "compute_reflectivity":
-                result = compute_reflectivity(tool_args)
+                result = compute_reflectivity(dict(tool_args, array_format='handle'))
                 
                 # Plot the reflectivity series
-                reflectivity = np.array(result["reflectivity"])
-                
-                plt.figure(figsize=(10, 6))
-                plt.stem(reflectivity)
-                plt.title("Reflectivity Series")
-                plt.xlabel("Sample Index")
-                plt.ylabel("Reflection Coefficient")
-                plt.grid(True)
+                reflectivity = decode(result["reflectivity"])
                 
-                # Save the plot
-                temp_img_path = "temp_reflectivity.png"
-                plt.savefig(temp_img_path)
-                plt.close()
+                img_bytes = render_pool.render('xy', {
+                    'y': reflectivity, 'style': 'stem',
+                    'title': "Reflectivity Series",
+                    'xlabel': "Sample Index", 'ylabel': "Reflection Coefficient",
+                    **image_output.options(),
+                })
+                img_path = image_output.store(img_bytes, image_output.options()['format'])
+                yield "Computed the reflectivity series, explaining the result...", img_path
                 
                 # Send result back to OpenAI
                 followup = client.chat.completions.create(
@@ -169,14 +178,14 @@ def chat_and_generate(message, history):
                 )
                 
                 # Return the image and the explanation
-                img = Image.open(temp_img_path)
-                return followup.choices[0].message.content, img
+                yield followup.choices[0].message.content, img_path
+                return
         
         # If no tool was called, just return the response content
-        return response_message.content, None
+        yield response_message.content, None
         
     except Exception as e:
-        return f"Error: {str(e)}", None
+        yield f"Error: {str(e)}", None
 
 # Create the Gradio interface
 with gr.Blocks(title="Seismic Modeling Chat") as demo:
@@ -190,12 +199,12 @@ with gr.Blocks(title="Seismic Modeling Chat") as demo:
             clear = gr.Button("Clear")
         
         with gr.Column(scale=2):
-            image_output = gr.Image(label="Generated Visualization", height=500)
+            image_display = gr.Image(label="Generated Visualization", height=500)
     
     # Set up event handlers
-    msg.submit(chat_and_generate, [msg, chatbot], [chatbot, image_output])
+    msg.submit(chat_and_generate, [msg, chatbot], [chatbot, image_display])
     clear.click(lambda: None, None, chatbot, queue=False)
 
 # Launch the app
 if __name__ == "__main__":
-    demo.launch(share=True)
\ No newline at end of file
+    demo.launch(share=True, allowed_paths=[image_output.get_store().root])
\ No newline at end of file
@@ -0,0 +1,94 @@
+# image_output.py
+import os
+import hashlib
+import tempfile
+
+# Output presets, selected per client. width_px fixes the raster width by
+# choosing the dpi from the figure size; dpi sets it directly.
+PRESETS = {
+    'chat': {'format': 'webp', 'width_px': 900, 'quality': 85},
+    'preview': {'format': 'jpeg', 'width_px': 480, 'quality': 60},
+    'thumbnail': {'format': 'jpeg', 'width_px': 320, 'quality': 70},
+    'print': {'format': 'png', 'dpi': 300},
+    'vector': {'format': 'svg'},
+}
+
+DEFAULT_PRESET = os.environ.get('IMAGE_PRESET', 'chat')
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'svg': 'image/svg+xml',
+}
+
+def options(preset = None, **overrides):
+    """
+    Encoding options for a render job (see render_pool): format, dpi or
+    width_px, and quality for lossy formats. Keyword overrides take
+    precedence over the preset.
+    """
+    preset = preset or DEFAULT_PRESET
+    if preset not in PRESETS:
+        raise ValueError('Unknown image preset: %s' % preset)
+    opts = dict(PRESETS[preset])
+    opts.update(overrides)
+    fmt = opts['format'] = opts['format'].lower().replace('jpg', 'jpeg')
+    if fmt not in MIME_TYPES:
+        raise ValueError('Unsupported image format: %s' % fmt)
+    return opts
+
+def savefig_kwargs(fig, opts):
+    """Translate encoding options into Figure.savefig keyword arguments."""
+    kwargs = {}
+    if opts.get('format'):
+        kwargs['format'] = opts['format']
+    if opts.get('width_px'):
+        kwargs['dpi'] = opts['width_px']/fig.get_figwidth()
+    elif opts.get('dpi'):
+        kwargs['dpi'] = opts['dpi']
+    if opts.get('bbox_inches'):
+        kwargs['bbox_inches'] = opts['bbox_inches']
+    if kwargs.get('format') in ('jpeg', 'webp') and opts.get('quality'):
+        kwargs['pil_kwargs'] = {'quality': opts['quality']}
+    return kwargs
+
+class ArtifactStore:
+    """
+    Local content-addressed store for encoded images. Files are named by the
+    SHA-256 of their content, written atomically, and referenced by path
+    instead of being inlined in chat messages.
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok = True)
+
+    def put(self, data, fmt):
+        name = '%s.%s' % (hashlib.sha256(data).hexdigest()[:24], fmt)
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            fd, tmp = tempfile.mkstemp(dir = self.root, suffix = '.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        return path
+
+_store = None
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = ArtifactStore(os.environ.get('IMAGE_STORE_DIR', 'artifacts'))
+    return _store
+
+def store(data, fmt):
+    """Save encoded image bytes in the artifact store and return the file path."""
+    return get_store().put(data, fmt)
+
+def markdown(path, alt = ''):
+    """Markdown image that references a stored artifact through Gradio's file route."""
+    return '![%s](/file=%s)' % (alt, path)
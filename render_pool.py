@@ -0,0 +1,195 @@
+# render_pool.py
+import io
+import os
+import threading
+import multiprocessing
+import concurrent.futures
+
+DEFAULT_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', 60))
+
+class RenderTimeout(TimeoutError):
+    pass
+
+def _init_worker():
+    # Load matplotlib with Agg, fonts and the figure templates up front so
+    # the first job a worker receives does not pay for them.
+    import matplotlib
+    matplotlib.use('Agg')
+    import figures
+    import wedge
+    import tools
+    for layout in figures.LAYOUTS:
+        with figures.figure_template(layout) as tpl:
+            tpl.fig.canvas.draw()
+
+def _encode(fig, spec):
+    from image_output import savefig_kwargs
+    buf = io.BytesIO()
+    fig.savefig(buf, **savefig_kwargs(fig, spec))
+    return buf.getvalue()
+
+def _render_wavelet(spec):
+    import figures
+    from array_codec import decode
+    from wedge import spectrum_analysis, spectrum_trim_small_val, wavelet_trim_small_val
+    t, wavelet = wavelet_trim_small_val(decode(spec['t'], float), decode(spec['wavelet'], float))
+    freq, amp_spec, pow_spec = spectrum_trim_small_val(*spectrum_analysis(t, wavelet))
+    with figures.figure_template('wavelet') as tpl:
+        return _encode(tpl.update(t, wavelet, freq, amp_spec, pow_spec, spec.get('title', '')), spec)
+
+def _render_ricker(spec):
+    from tools import plot_ricker
+    return plot_ricker(spec['args'], _image_opts(spec))
+
+def _render_xy(spec):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize = spec.get('figsize', (10, 6)))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    xy = (spec['y'],) if spec.get('x') is None else (spec['x'], spec['y'])
+    if spec.get('style') == 'stem':
+        ax.stem(*xy)
+    else:
+        ax.plot(*xy)
+    ax.set_title(spec.get('title', ''))
+    ax.set_xlabel(spec.get('xlabel', ''))
+    ax.set_ylabel(spec.get('ylabel', ''))
+    ax.grid(True)
+    return _encode(fig, spec)
+
+def _image_opts(spec):
+    return {k: spec[k] for k in ('format', 'dpi', 'width_px', 'quality', 'bbox_inches') if k in spec}
+
+def _render_plot_wavelet(spec):
+    from artifact_cache import cached_plot_wavelet
+    entry = cached_plot_wavelet(*spec['args'], image_opts = _image_opts(spec))
+    with open(entry['figure'], 'rb') as f:
+        return f.read()
+
+def _render_wedge_model(spec):
+    from artifact_cache import cached_wedge_model
+    entry = cached_wedge_model(*spec['args'], image_opts = _image_opts(spec), **spec.get('kwargs', {}))
+    with open(entry['figure'], 'rb') as f:
+        return f.read()
+
+def _render_wedge_result(spec):
+    # Renders a finished wedge.analyze_wedge result; nothing is recomputed.
+    # The result comes in the spec or, so that several jobs can share it
+    # without each being sent a copy, as a bundle directory
+    # (export.write_bundle) that is memory-mapped here
+    from wedge import make_plot
+    result = spec.get('result')
+    if result is None:
+        from export import read_bundle
+        arrays, meta = read_bundle(spec['result_bundle'])
+        result = dict(meta, **arrays)
+    buf = io.BytesIO()
+    make_plot(spec['zunit'], result, spec['gain'], spec['plotpadtime'], spec['thickness_domain'], buf,
+        image_opts = _image_opts(spec))
+    return buf.getvalue()
+
+RENDERERS = {
+    'wavelet': _render_wavelet,
+    'ricker': _render_ricker,
+    'xy': _render_xy,
+    'plot_wavelet': _render_plot_wavelet,
+    'wedge_model': _render_wedge_model,
+    'wedge_result': _render_wedge_result,
+}
+
+def _run(kind, spec):
+    return RENDERERS[kind](spec)
+
+class RenderPool:
+    """
+    Pool of pre-warmed worker processes that turn plot specs into encoded
+    images. Each render waits at most timeout seconds for its job. A job
+    that has not started by then is cancelled. One that is already running
+    cannot be stopped on its own and would hold its worker for good, so the
+    whole pool is retired instead (see abandon): new jobs go to a fresh pool
+    and the old workers are terminated once their other jobs are done.
+    """
+    def __init__(self, max_workers = None, timeout = DEFAULT_TIMEOUT):
+        self.max_workers = max_workers or int(os.environ.get('RENDER_WORKERS', 0)) or os.cpu_count()
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = set()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers = self.max_workers,
+                    mp_context = multiprocessing.get_context('spawn'),
+                    initializer = _init_worker)
+            return self._executor
+
+    def submit(self, kind, spec):
+        if kind not in RENDERERS:
+            raise ValueError('Unknown render job: %s' % kind)
+        executor = self._get_executor()
+        future = executor.submit(_run, kind, spec)
+        with self._lock:
+            if executor is self._executor:
+                self._jobs.add(future)
+        future.add_done_callback(self._jobs.discard)
+        return future
+
+    def abandon(self, *futures):
+        """
+        Give up on submitted jobs: cancel those that have not started, and
+        retire the pool if any of them is already running.
+        """
+        running = {f for f in futures if not f.cancel() and not f.done()}
+        with self._lock:
+            if not running & self._jobs:
+                return  # nothing running, or its pool has been retired already
+            executor, others = self._executor, [f for f in self._jobs if f not in running]
+            self._executor, self._jobs = None, set()
+        threading.Thread(target = _terminate, args = (executor, others), daemon = True).start()
+
+    def render(self, kind, spec, timeout = None):
+        future = self.submit(kind, spec)
+        try:
+            return future.result(timeout = timeout or self.timeout)
+        except concurrent.futures.TimeoutError:
+            self.abandon(future)
+            raise RenderTimeout('Rendering %s took longer than %g s' % (kind, timeout or self.timeout))
+
+    def warm(self):
+        """Start all worker processes now instead of on the first job."""
+        executor = self._get_executor()
+        for f in [executor.submit(os.getpid) for i in range(self.max_workers)]:
+            f.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor, self._jobs = self._executor, None, set()
+        if executor is not None:
+            executor.shutdown()
+
+def _terminate(executor, futures):
+    # Let the retired pool finish its other jobs, then stop its workers,
+    # including the one stuck on the abandoned job. ProcessPoolExecutor has
+    # no public way to terminate its workers before Python 3.14
+    concurrent.futures.wait(futures)
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait = False, cancel_futures = True)
+    for p in processes:
+        p.terminate()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RenderPool()
+        return _pool
+
+def render(kind, spec, timeout = None):
+    """Render spec with the shared worker pool and return the encoded image bytes."""
+    return get_pool().render(kind, spec, timeout)
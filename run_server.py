@@ -1,11 +1,26 @@
 # run_server.py
-from mcp import Tool, Session
-from tools import make_ricker, compute_reflectivity
+# MCP_SERVER_MODE=async (or --async) serves the tools from async_server with
+# a worker pool, per-tool timeouts, cancellation and bounded concurrency.
+import os
+import sys
 
-tools = [
-    Tool(name="make_ricker", description="Generate a Ricker wavelet", func=make_ricker),
-    Tool(name="compute_reflectivity", description="Compute 1D reflectivity series", func=compute_reflectivity),
-]
+def run_session():
+    from mcp import Tool, Session
+    from tools import make_ricker, compute_reflectivity, plot_wavelet, wedge_model
 
-session = Session(tools=tools)
-session.run_stdio()
+    tools = [
+        Tool(name="make_ricker", description="Generate a Ricker wavelet", func=make_ricker),
+        Tool(name="compute_reflectivity", description="Compute 1D reflectivity series", func=compute_reflectivity),
+        Tool(name="plot_wavelet", description="Plot a wavelet and its spectra", func=plot_wavelet),
+        Tool(name="wedge_model", description="Model and plot a three-layer wedge", func=wedge_model),
+    ]
+
+    session = Session(tools=tools)
+    session.run_stdio()
+
+if __name__ == '__main__':
+    if '--async' in sys.argv[1:] or os.environ.get('MCP_SERVER_MODE') == 'async':
+        from async_server import run_stdio
+        run_stdio()
+    else:
+        run_session()
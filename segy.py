@@ -0,0 +1,182 @@
+# segy.py
+"""
+Streaming SEG-Y rev 1 writer (4-byte IEEE float samples, big-endian).
+
+Traces are appended in batches, laid out like wedge's data arrays
+(nsamples, ntraces), so a section never has to be in memory at once. Trace
+headers for a batch are filled in as one structured array.
+"""
+import numpy as np
+
+# Trace header fields: name -> (byte offset, type), offsets from 0
+TRACE_HEADER = {
+    'tracl': (0, '>i4'),      # trace sequence number within line
+    'tracr': (4, '>i4'),      # trace sequence number within file
+    'fldr': (8, '>i4'),       # field record number
+    'tracf': (12, '>i4'),     # trace number within field record
+    'cdp': (20, '>i4'),       # ensemble (CDP) number
+    'cdpt': (24, '>i4'),      # trace number within ensemble
+    'trid': (28, '>i2'),      # trace identification code, 1 = seismic data
+    'duse': (34, '>i2'),      # data use, 1 = production
+    'offset': (36, '>i4'),
+    'scalel': (68, '>i2'),    # scalar for elevations and depths
+    'scalco': (70, '>i2'),    # scalar for coordinates
+    'sx': (72, '>i4'),
+    'sy': (76, '>i4'),
+    'gx': (80, '>i4'),
+    'gy': (84, '>i4'),
+    'counit': (88, '>i2'),    # coordinate units, 1 = length
+    'delrt': (108, '>i2'),    # delay recording time (ms)
+    'ns': (114, '>u2'),       # samples in this trace
+    'dt': (116, '>u2'),       # sample interval (us)
+    'cdp_x': (180, '>i4'),
+    'cdp_y': (184, '>i4'),
+    'iline': (188, '>i4'),
+    'xline': (192, '>i4'),
+}
+
+TRACE_HEADER_DTYPE = np.dtype({
+    'names': list(TRACE_HEADER),
+    'offsets': [offset for offset, fmt in TRACE_HEADER.values()],
+    'formats': [fmt for offset, fmt in TRACE_HEADER.values()],
+    'itemsize': 240,
+})
+
+# Binary file header fields, offsets from the start of the 400-byte header
+BINARY_HEADER = {
+    'jobid': (0, '>i4'),
+    'lino': (4, '>i4'),
+    'reno': (8, '>i4'),
+    'ntrpr': (12, '>i2'),     # data traces per ensemble
+    'nart': (14, '>i2'),      # auxiliary traces per ensemble
+    'hdt': (16, '>u2'),       # sample interval (us)
+    'dto': (18, '>u2'),
+    'hns': (20, '>u2'),       # samples per trace
+    'nso': (22, '>u2'),
+    'format': (24, '>i2'),    # 5 = 4-byte IEEE float
+    'fold': (26, '>i2'),
+    'tsort': (28, '>i2'),     # 4 = horizontally stacked
+    'mfeet': (54, '>i2'),     # measurement system, 1 = metres, 2 = feet
+    'rev': (300, '>u2'),      # SEG-Y revision, 0x0100 for rev 1
+    'trflag': (302, '>i2'),   # 1 = fixed length traces
+    'exth': (304, '>i2'),     # extended textual headers
+}
+
+BINARY_HEADER_DTYPE = np.dtype({
+    'names': list(BINARY_HEADER),
+    'offsets': [offset for offset, fmt in BINARY_HEADER.values()],
+    'formats': [fmt for offset, fmt in BINARY_HEADER.values()],
+    'itemsize': 400,
+})
+
+def textual_header(lines):
+    """
+    3200-byte EBCDIC card image header: 40 lines of 80 characters, 'C 1 '
+    ... 'C40 '. lines fill cards 1-38; rev 1 puts 'SEG Y REV1' on C39 and
+    'END TEXTUAL HEADER' on C40.
+    """
+    lines = list(lines)[:38]
+    lines += [''] * (38 - len(lines)) + ['SEG Y REV1', 'END TEXTUAL HEADER']
+    return ''.join('C%2d %-76s' % (i + 1, line[:76]) for i, line in enumerate(lines)).encode('cp037')
+
+class SegyWriter:
+    """
+    Writes a SEG-Y rev 1 file trace batch by trace batch. dt is the sample
+    interval in ms and t0 the time of the first sample (the delay recording
+    time). The header holds t0 in whole ms, so other start times raise
+    ValueError; resample the traces onto a whole-ms grid first (see
+    wedge.export_segy). Coordinates are stored as integers with
+    coord_scalar (negative means divide, as in the standard), so -100 keeps
+    centimetres.
+
+        with SegyWriter('wedge.sgy', nt, dt, t0) as f:
+            f.write(data, cdp_x = thickness)
+    """
+    def __init__(self, fname, ns, dt, t0 = 0., text = (), units = 'm', coord_scalar = -100):
+        if not 0 < ns < 2**16:
+            raise ValueError('SEG-Y traces hold at most 65535 samples, got %d' % ns)
+        self.ns = int(ns)
+        self.dt_us = int(round(dt*1000))
+        if not 0 < self.dt_us < 2**16:
+            raise ValueError('Sample interval of %g ms does not fit a SEG-Y header' % dt)
+        if abs(t0 - round(t0)) > 1e-6 or not -2**15 <= round(t0) < 2**15:
+            raise ValueError('SEG-Y delay recording time is a whole number of ms, got t0 = %g ms' % t0)
+        self.t0 = int(round(t0))
+        self.coord_scalar = coord_scalar
+        self.ntraces = 0
+        self._trace_dtype = np.dtype([('header', TRACE_HEADER_DTYPE), ('data', '>f4', (self.ns,))])
+
+        binary = np.zeros((), dtype = BINARY_HEADER_DTYPE)
+        binary['hdt'] = binary['dto'] = self.dt_us
+        binary['hns'] = binary['nso'] = self.ns
+        binary['format'] = 5
+        binary['fold'] = 1
+        binary['tsort'] = 4
+        binary['mfeet'] = 2 if units == 'ft' else 1
+        binary['rev'] = 0x0100
+        binary['trflag'] = 1
+
+        self._file = open(fname, 'wb')
+        self._file.write(textual_header(text))
+        self._file.write(binary.tobytes())
+
+    def _scaled(self, coords):
+        scale = -self.coord_scalar if self.coord_scalar < 0 else 1./self.coord_scalar if self.coord_scalar else 1.
+        return np.round(np.asarray(coords, dtype = float)*scale)
+
+    def write(self, traces, cdp_x = None, cdp_y = None, cdp = None, iline = None, xline = None, offset = None):
+        """
+        Append a batch of traces, shape (ns, ntraces). Header values are
+        scalars or one per trace; cdp defaults to the running trace number.
+        """
+        traces = np.asarray(traces)
+        if traces.ndim == 1:
+            traces = traces[:, None]
+        if traces.shape[0] != self.ns:
+            raise ValueError('Expected %d samples per trace, got %d' % (self.ns, traces.shape[0]))
+        n = traces.shape[1]
+        seq = self.ntraces + 1 + np.arange(n)
+
+        out = np.zeros(n, dtype = self._trace_dtype)
+        h = out['header']
+        h['tracl'] = h['tracr'] = h['tracf'] = seq
+        h['fldr'] = 1
+        h['cdp'] = seq if cdp is None else cdp
+        h['cdpt'] = 1
+        h['trid'] = 1
+        h['duse'] = 1
+        h['counit'] = 1
+        h['scalel'] = h['scalco'] = self.coord_scalar
+        h['delrt'] = self.t0
+        h['ns'] = self.ns
+        h['dt'] = self.dt_us
+        if offset is not None:
+            h['offset'] = offset
+        if cdp_x is not None:
+            h['cdp_x'] = h['sx'] = h['gx'] = self._scaled(cdp_x)
+        if cdp_y is not None:
+            h['cdp_y'] = h['sy'] = h['gy'] = self._scaled(cdp_y)
+        h['iline'] = 1 if iline is None else iline
+        h['xline'] = seq if xline is None else xline
+        out['data'] = traces.T
+
+        out.tofile(self._file)
+        self.ntraces += n
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_segy(fname, data, dt, t0 = 0., cdp_x = None, text = (), units = 'm', batch_traces = 4096):
+    """Write a whole (ns, ntraces) array, e.g. wedge data with cdp_x = thickness, in batches."""
+    ns, ntraces = data.shape
+    with SegyWriter(fname, ns, dt, t0, text, units) as f:
+        for i in range(0, ntraces, batch_traces):
+            j = min(i + batch_traces, ntraces)
+            f.write(data[:, i:j], cdp_x = None if cdp_x is None else np.asarray(cdp_x)[i:j])
@@ -0,0 +1,118 @@
+# streaming.py
+"""
+Generators that run long jobs in the background and yield progress events
+as they happen, for the streaming chat handlers.
+"""
+import os
+import queue
+import threading
+import concurrent.futures
+
+_DONE = object()
+
+def run_with_progress(fn, *args, **kwargs):
+    """
+    Call fn(*args, progress=callback, **kwargs) in a background thread and
+    yield each progress event as soon as it is reported, followed by
+    {'stage': 'result', 'result': <return value>}. Exceptions raised by fn
+    are re-raised in the caller.
+    """
+    events = queue.Queue()
+
+    def target():
+        try:
+            events.put({'stage': 'result', 'result': fn(*args, progress = events.put, **kwargs)})
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target = target, daemon = True).start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            return
+        if isinstance(event, BaseException):
+            raise event
+        yield event
+
+def stream_wedge(params, image_opts = None, timeout = None):
+    """
+    Model a wedge and yield its progress: the analyze_wedge stages, then
+    'preview' with the path of a low-resolution image, then 'done' with the
+    full-resolution image path and the analysis result. params are
+    tools.wedge_model arguments and image_opts come from
+    image_output.options. Both images are rendered in the render pool once
+    the analysis is done. The result is written once to a temporary bundle
+    that both jobs memory-map, instead of being pickled to each worker, and
+    the preview is submitted first; being small, it is ready well before
+    the full image.
+    """
+    import shutil
+    import tempfile
+    import numpy as np
+    import render_pool
+    import image_output
+    from export import write_bundle
+    from wedge import analyze_wedge
+    from tools import WEDGE_DEFAULTS
+
+    p = dict(WEDGE_DEFAULTS, **params)
+    display = {k: p.pop(k) for k in ('zunit', 'gain', 'plotpadtime', 'thickness_domain')}
+    p.pop('image_preset', None)
+    p.pop('array_format', None)
+
+    result = None
+    for event in run_with_progress(analyze_wedge, plotpadtime = display['plotpadtime'], **p):
+        if event['stage'] == 'result':
+            result = event['result']
+        else:
+            yield event
+
+    yield {'stage': 'render'}
+    pool = render_pool.get_pool()
+    timeout = timeout or pool.timeout
+    tmpdir = tempfile.mkdtemp(prefix = 'wedge-render-')
+    try:
+        bundle = write_bundle(os.path.join(tmpdir, 'result'), {k: v for k, v in result.items() if isinstance(v, np.ndarray)},
+            {k: v for k, v in result.items() if not isinstance(v, np.ndarray)})
+        spec = dict(display, result_bundle = bundle)
+        preview_opts = image_output.options('preview')
+        full_opts = image_opts or image_output.options()
+        preview = pool.submit('wedge_result', dict(spec, **preview_opts))
+        full = pool.submit('wedge_result', dict(spec, **full_opts))
+
+        def wait(future, what):
+            # Same timeout type as render_pool.render
+            try:
+                return future.result(timeout = timeout)
+            except concurrent.futures.TimeoutError:
+                pool.abandon(preview, full)
+                raise render_pool.RenderTimeout('Rendering the wedge %s took longer than %g s' % (what, timeout))
+
+        yield {'stage': 'preview', 'image': image_output.store(wait(preview, 'preview'), preview_opts['format'])}
+        yield {'stage': 'done', 'image': image_output.store(wait(full, 'image'), full_opts['format']), 'result': result}
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors = True)
+
+def describe(event, zunit = 'm'):
+    """One line of chat text for a progress event."""
+    stage = event['stage']
+    if stage == 'wavelet':
+        return 'Wavelet: %s, peak frequency %.1f Hz, %.0f ms long' % (
+            event['wavelet_label'], event['peak_frequency'], event['wavelet_length'])
+    if stage == 'synthesis':
+        return 'Synthesizing %d traces of %d samples (RC %.3f / %.3f)...' % (
+            event['ntraces'], event['nt'], event['rc1'], event['rc2'])
+    if stage == 'picking':
+        return 'Picking horizons...'
+    if stage == 'analysis':
+        return 'Tuning thickness %.1f %s (%.1f ms), tuning amplitude %.3f' % (
+            event['tuning_thickness'], zunit, event['tuning_thickness_t'], event['tuning_amplitude'])
+    if stage == 'render':
+        return 'Rendering...'
+    if stage == 'preview':
+        return 'Preview ready, rendering full resolution...'
+    if stage == 'done':
+        return 'Done.'
+    return stage
@@ -0,0 +1,108 @@
+# sweep.py
+import os
+import csv
+import itertools
+import concurrent.futures
+
+DEFAULT_SCENARIO = {
+    'wv_type': 'ricker',
+    'ricker_freq': 25,
+    'ormsby_freq': '',
+    'wavelet_str': '',
+    'wavelet_fname': '',
+    'phase_rot': 0,
+    'vp1': 2000., 'vp2': 2500., 'vp3': 2000.,
+    'rho1': 2.2, 'rho2': 2.3, 'rho3': 2.2,
+    'max_thickness': 50.,
+    'plotpadtime': 20.,
+    'ntraces': 61,
+    'sparse': False,
+}
+
+RESULT_COLUMNS = ['tuning_thickness', 'tuning_thickness_ms', 'peak_amplitude',
+    'min_apparent_thickness', 'min_apparent_thickness_ms']
+
+def parameter_grid(**axes):
+    """
+    Cartesian product of parameter axes, e.g.
+    parameter_grid(ricker_freq=[20, 30, 40], vp2=[2200, 2500], phase_rot=[0, 90]).
+    Scalars are treated as single-valued axes. Yields scenario dicts lazily.
+    """
+    names = list(axes)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in axes.values()]
+    for combo in itertools.product(*values):
+        yield dict(zip(names, combo))
+
+def run_scenario(params):
+    """Model, pick and summarise one scenario; returns a result row (dict)."""
+    from wedge import analyze_wedge
+
+    p = dict(DEFAULT_SCENARIO, **params)
+    r = analyze_wedge(p['max_thickness'], p['wv_type'], p['ricker_freq'], p['ormsby_freq'], p['wavelet_str'],
+        p['wavelet_fname'], p['phase_rot'], p['vp1'], p['vp2'], p['vp3'], p['rho1'], p['rho2'], p['rho3'],
+        p['plotpadtime'], p['ntraces'], p['sparse'])
+
+    row = dict(params)
+    row.update(
+        tuning_thickness = float(r['tuning_thickness']),
+        tuning_thickness_ms = float(r['tuning_thickness_t']),
+        peak_amplitude = float(r['tuning_amplitude']),
+        min_apparent_thickness = float(r['min_apparent_thickness_z']),
+        min_apparent_thickness_ms = float(r['min_apparent_thickness_t']),
+    )
+    return row
+
+def _init_worker():
+    # Parallelism comes from the process pool; keep each worker's FFTs single-threaded
+    import wedge
+    wedge.FFT_WORKERS = 1
+
+def iter_sweep(scenarios, chunk_size=256, max_workers=None):
+    """
+    Run scenarios (an iterable of parameter dicts, e.g. from parameter_grid)
+    across a process pool and yield the result rows in input order, one list
+    of at most chunk_size rows at a time. Only one chunk of scenarios is in
+    flight, so arbitrarily large grids never build up in memory.
+    """
+    scenarios = iter(scenarios)
+    max_workers = max_workers or os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        while True:
+            chunk = list(itertools.islice(scenarios, chunk_size))
+            if not chunk:
+                break
+            yield list(executor.map(run_scenario, chunk, chunksize=max(1, len(chunk)//(4*max_workers))))
+
+def run_sweep(scenarios, chunk_size=256, max_workers=None, csv_fname='', collect=True, bundle_fname=''):
+    """
+    Run a sweep and return it as a tidy table: a dict mapping each column
+    (scenario parameters followed by RESULT_COLUMNS) to a list of values.
+    With csv_fname, rows are also appended to a CSV file chunk by chunk;
+    collect=False then skips building the in-memory table. bundle_fname
+    saves the table as one array per column (see export.write_bundle) and
+    needs collect.
+    """
+    if bundle_fname and not collect:
+        raise ValueError('bundle_fname needs the collected table; use collect=True')
+    table = {}
+    writer = None
+    f = open(csv_fname, 'w', newline='') if csv_fname else None
+    try:
+        for rows in iter_sweep(scenarios, chunk_size, max_workers):
+            for row in rows if collect else []:
+                for key, value in row.items():
+                    table.setdefault(key, []).append(value)
+            if f:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                writer.writerows(rows)
+    finally:
+        if f:
+            f.close()
+    if bundle_fname and table:
+        import numpy as np
+        from export import write_bundle
+        write_bundle(bundle_fname, {key: np.asarray(values) for key, values in table.items()},
+            {'columns': list(table), 'rows': len(next(iter(table.values())))})
+    return table
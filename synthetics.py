@@ -0,0 +1,193 @@
+# synthetics.py
+"""
+Batched 1D synthetic seismograms from depth-sampled well logs, and chunked
+synthetic sections of large 2D models.
+
+Logs are (nz,) for one well or (nwells, nz) for many; shorter wells can be
+padded with NaN. Depths are in m, velocities in m/s and times in ms (two-way),
+as in wedge.py. Every step works on the whole batch at once.
+"""
+import numpy as np
+
+from wedge import convolve_traces, gen_wavelet
+
+def _logs(*logs):
+    return np.broadcast_arrays(*[np.atleast_2d(np.asarray(log, dtype = float)) for log in logs])
+
+def depth_to_time(depth, vp, t_top = 0.):
+    """
+    Two-way time (ms) at every log sample, from the cumulative interval
+    times 2*dz/v. Slowness is averaged over each interval. depth may be
+    shared by all wells; t_top is the time of the first sample, a scalar or
+    one value per well.
+    """
+    depth, vp = _logs(depth, vp)
+    dt_int = 2000.*np.diff(depth, axis = 1)*0.5*(1/vp[:, 1:] + 1/vp[:, :-1])
+    twt = np.zeros(depth.shape)
+    twt[:, 1:] = np.cumsum(dt_int, axis = 1)
+    return twt + np.reshape(np.asarray(t_top, dtype = float), (-1, 1))
+
+def reflectivity(vp, rho):
+    """Normal-incidence reflection coefficients between consecutive log samples, (nwells, nz-1)."""
+    vp, rho = _logs(vp, rho)
+    imp = vp*rho
+    return (imp[:, 1:] - imp[:, :-1])/(imp[:, 1:] + imp[:, :-1])
+
+def time_reflectivity(rc_t, rc, t0, nt, dt, shift = 0.):
+    """
+    Reflectivity on the regular time axis t0 + arange(nt)*dt, shape
+    (nt, nwells), from coefficients rc at two-way times rc_t (both
+    (nwells, nk)). Each coefficient is split linearly between its two
+    neighbouring samples, so it keeps its sub-sample position. shift (in
+    samples) is added to every position. NaN entries and coefficients
+    outside the time axis are dropped.
+    """
+    nwells = rc.shape[0]
+    pos = (rc_t - t0)/dt + shift
+    ok = np.isfinite(pos) & np.isfinite(rc) & (pos >= 0) & (pos < nt - 1)
+    well = np.broadcast_to(np.arange(nwells)[:, None], rc.shape)[ok]
+    pos = pos[ok]
+    rc = rc[ok]
+    i0 = np.floor(pos).astype(int)
+    frac = pos - i0
+    flat = np.bincount(np.concatenate((i0*nwells + well, (i0 + 1)*nwells + well)),
+        weights = np.concatenate((rc*(1 - frac), rc*frac)), minlength = nt*nwells)
+    return flat.reshape(nt, nwells)
+
+def synthetic_seismograms(depth, vp, rho, wavelet, wavelet_t, dt, t0 = None, nt = None, t_top = 0.):
+    """
+    Synthetic seismograms for a batch of wells in one call.
+
+    The logs are converted to time (depth_to_time), the reflection
+    coefficients placed at their sub-sample interface times
+    (time_reflectivity) and all traces convolved with the wavelet in one
+    batched FFT (wedge.convolve_traces). wavelet is sampled at dt with times
+    wavelet_t (ms). By default the time axis spans all the logs.
+
+    Returns a dict with the time axis 't' (nt,), the traces 'data'
+    (nt, nwells), the time-sampled 'reflectivity' (nt, nwells) and the
+    two-way time of every log sample 'twt' (nwells, nz).
+    """
+    twt = depth_to_time(depth, vp, t_top)
+    rc = reflectivity(vp, rho)
+    # Each interface lies halfway (in time) between the samples it separates
+    rc_t = 0.5*(twt[:, 1:] + twt[:, :-1])
+
+    if t0 is None:
+        t0 = np.floor(np.nanmin(twt)/dt)*dt
+    if nt is None:
+        nt = int(np.ceil((np.nanmax(twt) - t0)/dt)) + 1
+
+    # convolve_traces lines the output up on wavelet sample (size-1)//2;
+    # shift the spikes so the wavelet's zero time lands on them instead
+    wavelet = np.asarray(wavelet, dtype = float)
+    shift = (wavelet.size - 1)//2 + wavelet_t[0]/dt
+    rc_model = time_reflectivity(rc_t, rc, t0, nt, dt, shift)
+    rc_true = time_reflectivity(rc_t, rc, t0, nt, dt) if shift else rc_model
+
+    return dict(
+        t = t0 + np.arange(nt)*dt,
+        data = convolve_traces(rc_model, wavelet),
+        reflectivity = rc_true,
+        twt = twt,
+    )
+
+def well_synthetics(depth, vp, rho, dt = 1., wv_type = 'ricker', ricker_freq = 25, ormsby_freq = '', wavelet_str = '', wavelet_fname = '', phase_rot = 0, t0 = None, nt = None, t_top = 0.):
+    """synthetic_seismograms with a wavelet from wedge.gen_wavelet (so from the wavelet cache)."""
+    wavelet_t, wavelet, wavelet_label = gen_wavelet(dt, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot)
+    result = synthetic_seismograms(depth, vp, rho, wavelet, wavelet_t, dt, t0, nt, t_top)
+    result['wavelet_label'] = wavelet_label
+    return result
+
+def _grid(grid):
+    # File names are opened memory-mapped, so only the current chunk is read
+    if isinstance(grid, str):
+        return np.load(grid, mmap_mode = 'r')
+    return np.asarray(grid)
+
+def synthetic_section(out_fname, wavelet, wavelet_t, dt, impedance = None, vp = None, rho = None, dz = None, t_top = 0., chunk_traces = None, max_chunk_mb = 256, dtype = 'float32', workers = None, progress = None, segy_fname = None, dx = 1.):
+    """
+    Synthetic section of an arbitrarily large 2D model, computed a chunk of
+    traces at a time and written to a memory-mapped .npy file.
+
+    The model grids (arrays or .npy file names, opened with mmap_mode='r')
+    have shape (nsamples, ntraces) like wedge's rc_model. Without dz they
+    are sampled in time at dt: give either impedance or vp and rho. With dz
+    (m) they are sampled in depth, vp and rho are required and every trace
+    is converted to time as in synthetic_seismograms; the time axis then
+    starts at t_top (a scalar) and covers the slowest trace.
+
+    chunk_traces defaults to what fits in about max_chunk_mb of working
+    memory. workers is passed to the FFTs of each chunk and progress gets a
+    'chunk' event per chunk (see wedge.emit). With segy_fname each chunk is
+    also appended to a SEG-Y file, with trace spacing dx as CDP X; depth
+    models then start at t_top rounded down to a whole ms. Returns
+    a dict with the output file name, its shape and the time axis (t0, dt).
+    """
+    import scipy.fft
+    from wedge import emit
+
+    if impedance is not None:
+        if dz is not None:
+            raise ValueError('Depth-sampled models need vp and rho, not impedance')
+        grids = [_grid(impedance)]
+    elif vp is not None and rho is not None:
+        grids = [_grid(vp), _grid(rho)]
+    else:
+        raise ValueError('Need an impedance grid or both vp and rho grids')
+    nsamples, ntraces = grids[0].shape
+    if any(g.shape != (nsamples, ntraces) for g in grids):
+        raise ValueError('Model grids must all have the same shape')
+
+    wavelet = np.asarray(wavelet, dtype = float)
+    shift = (wavelet.size - 1)//2 + wavelet_t[0]/dt
+
+    def chunks(step):
+        for i in range(0, ntraces, step):
+            yield i, min(i + step, ntraces)
+
+    if dz is None:
+        t0, nt = 0., nsamples
+    else:
+        # First pass: the time axis has to cover the slowest trace
+        depth = np.arange(nsamples)*dz
+        t_max = max(np.nanmax(depth_to_time(depth, np.asarray(grids[0][:, i:j]).T, t_top)[:, -1])
+            for i, j in chunks(max(1, int(max_chunk_mb*2**20//(16*nsamples)))))
+        # SEG-Y start times are whole ms
+        t0 = float(np.floor(t_top)) if segy_fname else float(t_top)
+        nt = int(np.ceil((t_max - t0)/dt)) + 1
+
+    if chunk_traces is None:
+        nfft = scipy.fft.next_fast_len(nt + wavelet.size - 1, real = True)
+        # Reflectivity, spectrum and full-length output per trace
+        chunk_traces = max(1, int(max_chunk_mb*2**20//(8*(nt + 2*nfft + nsamples*len(grids)))))
+
+    out = np.lib.format.open_memmap(out_fname, mode = 'w+', dtype = dtype, shape = (nt, ntraces))
+    segy = None
+    if segy_fname:
+        from segy import SegyWriter
+        segy = SegyWriter(segy_fname, nt, dt, t0, ['Synthetic section, %d traces' % ntraces, 'CDP X: trace position, coordinate scalar -100'])
+    for i, j in chunks(chunk_traces):
+        if dz is None:
+            imp = np.asarray(grids[0][:, i:j], dtype = float)
+            if len(grids) == 2:
+                imp = imp*grids[1][:, i:j]
+            rc_model = np.zeros((nt, j - i))
+            rc_model[1:] = (imp[1:] - imp[:-1])/(imp[1:] + imp[:-1])
+            if shift:
+                rc_model = time_reflectivity(np.broadcast_to(t0 + np.arange(nt)*dt, (j - i, nt)), rc_model.T, t0, nt, dt, shift)
+        else:
+            vp_chunk = np.asarray(grids[0][:, i:j], dtype = float).T
+            rho_chunk = np.asarray(grids[1][:, i:j], dtype = float).T
+            twt = depth_to_time(depth, vp_chunk, t_top)
+            rc_model = time_reflectivity(0.5*(twt[:, 1:] + twt[:, :-1]), reflectivity(vp_chunk, rho_chunk), t0, nt, dt, shift)
+        out[:, i:j] = convolve_traces(rc_model, wavelet, workers)
+        if segy is not None:
+            segy.write(out[:, i:j], cdp_x = np.arange(i, j)*dx)
+        emit(progress, 'chunk', start = i, stop = j, ntraces = ntraces)
+    out.flush()
+    del out
+    if segy is not None:
+        segy.close()
+
+    return dict(fname = out_fname, shape = (nt, ntraces), t0 = t0, dt = dt)
@@ -0,0 +1,34 @@
+# test_array_codec.py
+import json
+
+import numpy as np
+import pytest
+
+from array_codec import decode, encode, options, pack
+
+def test_encode_decode_round_trip():
+    arr = np.random.default_rng(0).standard_normal((40, 3))
+    for dtype in ('float32', 'float64'):
+        for compress in (False, True):
+            obj = json.loads(json.dumps(encode(arr, dtype, compress)))
+            out = decode(obj)
+            assert out.dtype == np.dtype(dtype) and out.shape == arr.shape
+            assert np.array_equal(out, arr.astype(dtype))
+            assert not out.flags.writeable
+
+def test_integers_and_big_endian_keep_their_values():
+    ints = np.arange(10, dtype = 'i8')
+    assert np.array_equal(decode(encode(ints)), ints) and decode(encode(ints)).dtype == np.dtype('<i8')
+    big = np.linspace(0., 1., 5).astype('>f8')
+    assert np.array_equal(decode(encode(big, 'float64')), big)
+
+def test_pack_formats():
+    result = {'data': np.ones((2, 2)), 'label': 'wedge', 'tuning': 12.5}
+    assert pack(result) == {'data': [[1., 1.], [1., 1.]], 'label': 'wedge', 'tuning': 12.5}
+    packed = pack(result, {'format': 'base64', 'dtype': 'float64', 'compress': True})
+    assert packed['data']['compression'] == 'zlib' and np.array_equal(decode(packed['data']), result['data'])
+    assert pack(result, 'raw')['data'] is result['data']
+    with pytest.raises(ValueError):
+        options({'format': 'hdf5'})
+    with pytest.raises(ValueError):
+        options({'dtype': 'float16'})
@@ -0,0 +1,47 @@
+# test_array_store.py
+import time
+
+import numpy as np
+import pytest
+
+from array_codec import decode, pack, resolve
+from async_server import _uses_handles
+from array_store import ArrayStore, is_handle
+
+def test_put_leaves_caller_array_writeable():
+    store = ArrayStore(2**20, 60.)
+    arr = np.arange(5.)
+    stored = store.get(store.put(arr))
+    assert arr.flags.writeable and not stored.flags.writeable
+    arr[0] = 10.
+    assert stored[0] == 0.
+    readonly = np.arange(5.)
+    readonly.flags.writeable = False
+    assert np.shares_memory(store.get(store.put(readonly)), readonly)
+
+def test_eviction_and_expiry():
+    store = ArrayStore(2*800, 60.)
+    handles = [store.put(np.zeros(100)) for _ in range(3)]
+    with pytest.raises(KeyError):
+        store.get(handles[0])
+    assert store.stats()['entries'] == 2
+
+    store = ArrayStore(2**20, 0.05)
+    handle = store.put(np.zeros(10))
+    time.sleep(0.1)
+    with pytest.raises(KeyError):
+        store.get(handle)
+
+def test_handles_through_codec():
+    arr = np.linspace(0., 1., 7)
+    ref = pack({'data': arr}, 'handle')['data']
+    assert is_handle(ref) and not is_handle(ref['handle']) and not is_handle('data')
+    assert ref['shape'] == [7] and np.array_equal(decode(ref), arr)
+
+def test_file_names_are_not_handles():
+    ref = pack({'vp': np.array([2000., 2500.])}, 'handle')['vp']
+    args = {'vp': ref, 'segy_fname': 'arr_line1.sgy', 'bundle_fname': 'arr_x.npz'}
+    resolved = resolve(args)
+    assert np.array_equal(resolved['vp'], [2000., 2500.])
+    assert resolved['segy_fname'] == 'arr_line1.sgy' and resolved['bundle_fname'] == 'arr_x.npz'
+    assert not _uses_handles({'segy_fname': 'arr_line1.sgy'}) and _uses_handles({'vp': ref})
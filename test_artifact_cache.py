@@ -0,0 +1,58 @@
+# test_artifact_cache.py
+import os
+
+import pytest
+
+import artifact_cache
+from artifact_cache import ArtifactCache, cache_key, cached_plot_wavelet
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / 'cache'), 2**30)
+    monkeypatch.setattr(artifact_cache, '_cache', cache)
+    return cache
+
+def test_cache_key_is_canonical():
+    assert cache_key('f', {'a': 1, 'b': [1., 2.]}) == cache_key('f', {'b': [1., 2.], 'a': 1})
+    assert cache_key('f', {'a': 1}) != cache_key('f', {'a': 2})
+    assert cache_key('f', {'a': 1}) != cache_key('g', {'a': 1})
+
+def test_plot_wavelet_hit(cache, tmp_path):
+    fig_fname = str(tmp_path / 'wavelet.png')
+    first = cached_plot_wavelet('ricker', 30, '', '', '', 0, fig_fname)
+    second = cached_plot_wavelet('ricker', 30, '', '', '', 0)
+    assert not first['hit'] and second['hit']
+    assert second['figure'] == first['figure'] and os.path.getsize(fig_fname) > 0
+    assert not cached_plot_wavelet('ricker', 35, '', '', '', 0)['hit']
+
+def test_eviction(tmp_path):
+    cache = ArtifactCache(str(tmp_path / 'cache'), 1500)
+    def build(tmpdir):
+        with open(os.path.join(tmpdir, 'blob'), 'wb') as f:
+            f.write(bytes(1000))
+        return {'blob': 'blob'}
+    cache.put('a', build)
+    cache.put('b', build)
+    assert cache.get('a') is None and cache.get('b') is not None
+
+def test_wavelet_file_contents_in_key(cache, tmp_path):
+    fname = tmp_path / 'wavelet.txt'
+    fname.write_text('-4 0\n-2 -0.5\n0 1\n2 -0.5\n4 0\n')
+    assert not cached_plot_wavelet('custom', 0, '', '', str(fname), 0)['hit']
+    assert cached_plot_wavelet('custom', 0, '', '', str(fname), 0)['hit']
+    fname.write_text('-4 0\n-2 -0.3\n0 1\n2 -0.3\n4 0\n')
+    assert not cached_plot_wavelet('custom', 0, '', '', str(fname), 0)['hit']
+
+def test_bruges_version_in_code_version(monkeypatch):
+    import bruges
+    before = artifact_cache.code_version()
+    monkeypatch.setattr(artifact_cache, '_code_version', None)
+    monkeypatch.setattr(bruges, '__version__', 'other', raising = False)
+    assert artifact_cache.code_version() != before
+
+def test_get_after_concurrent_evict_is_a_miss(cache, monkeypatch):
+    cache.put('a', lambda tmpdir: {})
+    def utime(path):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(artifact_cache.os, 'utime', utime)
+    assert cache.get('a') is None
@@ -0,0 +1,105 @@
+# test_async_server.py
+import json
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import async_server
+from array_codec import decode, reference
+from async_server import Server, ToolExecutor
+
+RELEASE = threading.Event()
+_schema = {'type': 'object', 'properties': {}}
+
+def blocking(args):
+    # Holds its worker until the test releases it
+    RELEASE.wait(10.)
+    return {'ok': True}
+
+def echo(args):
+    return {'x': args.get('x')}
+
+@pytest.fixture
+def server(monkeypatch):
+    RELEASE.clear()
+    monkeypatch.setitem(async_server.TOOLS, 'blocking', ('test_async_server', 'blocking', 10., 'Block', _schema))
+    monkeypatch.setitem(async_server.TOOLS, 'echo', ('test_async_server', 'echo', 10., 'Echo', _schema))
+    def make(**kwargs):
+        return Server(ToolExecutor(mode = 'thread', max_workers = 2, **kwargs))
+    yield make
+    RELEASE.set()
+
+def _text(response):
+    return response['content'][0]['text']
+
+async def _until(predicate, timeout = 5.):
+    for i in range(int(timeout/0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('condition not reached')
+
+def test_timeout_returns_error_and_frees_slot_when_worker_ends(server):
+    srv = server(max_inflight = 1, timeouts = {'blocking': 0.05})
+    async def main():
+        response = await srv.call_tool('blocking', {})
+        assert response['isError'] and 'timed out' in _text(response)
+        # The running call keeps its slot until its worker is done
+        assert srv.executor._slots.locked()
+        RELEASE.set()
+        await _until(lambda: not srv.executor._slots.locked())
+        response = await srv.call_tool('echo', {'x': 1})
+        assert not response['isError'] and json.loads(_text(response)) == {'x': 1}
+    asyncio.run(main())
+
+def test_busy_server_rejects_calls(server):
+    srv = server(max_inflight = 1, max_queued = 0)
+    async def main():
+        first = asyncio.ensure_future(srv.call_tool('blocking', {}))
+        await _until(lambda: srv.executor._slots is not None and srv.executor._slots.locked())
+        response = await srv.call_tool('echo', {})
+        assert response['isError'] and 'Server busy' in _text(response)
+        RELEASE.set()
+        assert not (await first)['isError']
+    asyncio.run(main())
+
+def test_cancelled_request_gets_no_response(server):
+    srv = server(max_inflight = 2)
+    responses = []
+    async def main():
+        reader = asyncio.StreamReader()
+        for msg in ({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': {'name': 'blocking'}},
+                {'jsonrpc': '2.0', 'method': 'notifications/cancelled', 'params': {'requestId': 1}},
+                {'jsonrpc': '2.0', 'id': 2, 'method': 'tools/call', 'params': {'name': 'echo', 'arguments': {'x': 2}}}):
+            reader.feed_data((json.dumps(msg) + '\n').encode())
+        reader.feed_eof()
+        await srv.serve(reader, responses.append)
+    asyncio.run(main())
+    assert [r['id'] for r in responses] == [2]
+
+def test_array_negotiation(server):
+    srv = server()
+    async def main():
+        init = await srv.handle({'jsonrpc': '2.0', 'id': 0, 'method': 'initialize',
+            'params': {'capabilities': {'experimental': {'ndarray': {'dtype': 'float64'}}}}})
+        assert init['result']['capabilities']['experimental']['ndarray']['format'] == 'base64'
+        response = await srv.call_tool('compute_reflectivity', {'vp': [2000., 2500.], 'n_samples': 200})
+        reflectivity = decode(json.loads(_text(response))['reflectivity'])
+        assert reflectivity.dtype == np.float64 and np.isclose(reflectivity[100], 500./4500.)
+
+        # Handles come back as references and are accepted as arguments
+        response = await srv.call_tool('make_ricker', {'frequency': 30, 'array_format': {'format': 'handle'}})
+        wavelet = json.loads(_text(response))['wavelet']
+        assert set(wavelet) == {'handle', 'dtype', 'shape'}
+        vp = reference(np.array([2000., 2500.]))
+        response = await srv.call_tool('compute_reflectivity', {'vp': vp, 'n_samples': 200})
+        assert np.isclose(decode(json.loads(_text(response))['reflectivity'])[100], 500./4500.)
+
+        plain = Server(ToolExecutor(mode = 'thread', max_workers = 1))
+        init = await plain.handle({'jsonrpc': '2.0', 'id': 0, 'method': 'initialize', 'params': {}})
+        assert init['result']['capabilities']['experimental']['ndarray'] == {'format': 'list'}
+        response = await plain.call_tool('compute_reflectivity', {'vp': [2000., 2500.], 'n_samples': 200})
+        assert isinstance(json.loads(_text(response))['reflectivity'], list)
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+# test_avo.py
+import numpy as np
+import pytest
+
+from wedge import analyze_wedge, avo_reflectivity, avo_wedge, pick_interface_and_amp
+
+WAVELET = (50., 'ricker', 25, '', '', '', 0)
+VP = (2400., 2200., 2400.)
+VS = (1100., 1300., 1100.)
+RHO = (2.35, 2.1, 2.35)
+
+def _avo(**kwargs):
+    return avo_wedge(*WAVELET, *VP, *VS, *RHO, **kwargs)
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_normal_incidence_matches_analyze_wedge(sparse):
+    avo = _avo(angles = [0., 20.], sparse = sparse, return_data = True)
+    single = analyze_wedge(*WAVELET, *VP, *RHO, sparse = sparse)
+    assert np.isclose(avo['rc1'][0], single['rc1']) and np.isclose(avo['rc2'][0], single['rc2'])
+    assert np.allclose(avo['data'][0], single['data'], atol = 1e-12)
+    assert np.allclose(avo['amp_picks'][0], single['amp_picks'], atol = 1e-9)
+    assert np.allclose(avo['thickness_apparent_t'][0], single['thickness_apparent_t'], atol = 1e-9)
+    for key in ('tuning_thickness', 'tuning_thickness_t', 'tuning_amplitude', 'min_apparent_thickness_t'):
+        assert np.isclose(avo[key][0], single[key], rtol = 0, atol = 1e-9), key
+
+def test_angles_picked_like_single_sections():
+    avo = _avo(return_data = True)
+    assert avo['data'].shape == (avo['angles'].size, avo['nt'], avo['thickness'].size)
+    for k in range(avo['angles'].size):
+        hor1, hor2, _, amp = pick_interface_and_amp(avo['data'][k], avo['interface1_t'], avo['interface2_t'][k],
+            avo['t0'], avo['nt'], avo['dt'])
+        assert np.array_equal(amp, avo['amp_picks'][k])
+        assert np.array_equal(hor2 - hor1, avo['thickness_apparent_t'][k])
+    assert 'data' not in _avo(angles = [0.])
+
+def test_avo_reflectivity():
+    angles = np.array([0., 10., 20.])
+    zoeppritz = avo_reflectivity(2400., 1100., 2.35, 2200., 1300., 2.1, angles)
+    akirichards = avo_reflectivity(2400., 1100., 2.35, 2200., 1300., 2.1, angles, 'akirichards')
+    assert np.isclose(zoeppritz[0], (2200.*2.1 - 2400.*2.35)/(2200.*2.1 + 2400.*2.35))
+    assert np.allclose(zoeppritz, akirichards, atol = 5e-3)
+    with pytest.raises(ValueError):
+        avo_reflectivity(2000., 1000., 2.2, 2500., 1200., 2.3, [60.])
+    with pytest.raises(ValueError):
+        avo_reflectivity(2400., 1100., 2.35, 2200., 1300., 2.1, angles, 'shuey')
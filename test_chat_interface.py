@@ -0,0 +1,11 @@
+# test_chat_interface.py
+from chat_interface import SeismicChatBot
+
+def test_wedge_thickness_ignores_velocities():
+    bot = SeismicChatBot()
+    tool, params = bot.parse_natural_language('Create a wedge model with a 2000 m/s shale over sand, 30 Hz, up to 40 m thick')
+    assert tool == 'wedge_model' and params['max_thickness'] == 40. and params['ricker_freq'] == 30
+    tool, params = bot.parse_natural_language('Wedge model for a 2500 m per second sand and 2000 meters/s shale')
+    assert tool == 'wedge_model' and 'max_thickness' not in params
+    _, params = bot.parse_natural_language('Show the tuning of a 25 metre wedge')
+    assert params['max_thickness'] == 25.
@@ -0,0 +1,23 @@
+# test_convolve.py
+import numpy as np
+import scipy.signal
+
+from wedge import convolve_traces, ricker
+
+def test_convolve_traces_matches_scipy_same():
+    rng = np.random.default_rng(0)
+    rc_model = rng.standard_normal((301, 7))
+    for length in (64, 65):
+        wavelet = rng.standard_normal(length)
+        expected = np.stack([scipy.signal.convolve(trc, wavelet, mode = 'same') for trc in rc_model.T], axis = 1)
+        assert np.allclose(convolve_traces(rc_model, wavelet), expected, atol = 1e-10)
+
+def test_convolve_traces_spike_returns_wavelet():
+    _, wavelet = ricker(100, 0.5, 25)
+    rc_model = np.zeros((401, 3))
+    rc_model[200] = [1., -0.5, 0.]
+    data = convolve_traces(rc_model, wavelet)
+    i0 = 200 - (wavelet.size - 1)//2
+    assert np.allclose(data[i0:i0+wavelet.size, 0], wavelet, atol = 1e-12)
+    assert np.allclose(data[:, 1], -0.5*data[:, 0], atol = 1e-12)
+    assert np.allclose(data[:, 2], 0., atol = 1e-12)
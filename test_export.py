@@ -0,0 +1,39 @@
+# test_export.py
+import numpy as np
+import pytest
+
+from export import export_wedge, read_bundle, write_bundle
+from wedge import analyze_wedge
+
+ARRAYS = {
+    'section': np.random.default_rng(0).standard_normal((500, 9)).astype('f4'),
+    'curve': np.linspace(0., 1., 9),
+    'index': np.arange(9),
+    'scalar': np.array(2.5),
+    'empty': np.zeros((0, 3)),
+}
+
+@pytest.mark.parametrize('name, compress', [('bundle.npz', False), ('bundle.npz', True), ('bundle', False)])
+def test_bundle_round_trip(tmp_path, name, compress):
+    path = str(tmp_path / name)
+    meta = {'dt': np.float64(0.5), 'layers': np.array([2000., 2500.]), 'label': 'test'}
+    write_bundle(path, dict(ARRAYS, skipped = None), meta, compress, chunk_bytes = 1000)
+    for mmap in (True, False):
+        arrays, meta_read = read_bundle(path, mmap)
+        assert sorted(arrays) == sorted(ARRAYS)
+        for key, arr in ARRAYS.items():
+            assert arrays[key].dtype == arr.dtype and np.array_equal(arrays[key], arr)
+        assert meta_read == {'dt': 0.5, 'layers': [2000., 2500.], 'label': 'test'}
+    arrays, _ = read_bundle(path)
+    assert isinstance(arrays['section'], np.memmap) != compress
+
+def test_directory_bundles_cannot_be_compressed(tmp_path):
+    with pytest.raises(ValueError):
+        write_bundle(str(tmp_path / 'bundle'), ARRAYS, compress = True)
+
+def test_export_wedge(tmp_path):
+    result = analyze_wedge(50., 'ricker', 25, '', '', '', 0, 2000., 2500., 2000., 2.2, 2.3, 2.2)
+    arrays, meta = read_bundle(export_wedge(str(tmp_path / 'wedge.npz'), result))
+    assert np.array_equal(arrays['data'], result['data'])
+    assert np.array_equal(arrays['amp_picks'], result['amp_picks'])
+    assert meta['tuning_thickness'] == result['tuning_thickness'] and meta['zunit'] == 'm'
@@ -0,0 +1,43 @@
+# test_image_output.py
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pytest
+
+import image_output
+from image_output import ArtifactStore, options, savefig_kwargs
+
+def test_preset_lookup():
+    assert options('preview') == image_output.PRESETS['preview']
+    assert options('print', dpi = 150) == {'format': 'png', 'dpi': 150}
+    assert options('thumbnail', format = 'JPG')['format'] == 'jpeg'
+    assert options() == options(image_output.DEFAULT_PRESET)
+
+def test_unknown_preset_or_format():
+    with pytest.raises(ValueError):
+        options('poster')
+    with pytest.raises(ValueError):
+        options('chat', format = 'bmp')
+
+def test_savefig_kwargs():
+    fig = plt.figure(figsize = (6, 4))
+    try:
+        assert savefig_kwargs(fig, options('preview')) == {
+            'format': 'jpeg', 'dpi': 80., 'pil_kwargs': {'quality': 60}}
+        assert savefig_kwargs(fig, options('print')) == {'format': 'png', 'dpi': 300}
+        assert savefig_kwargs(fig, options('vector')) == {'format': 'svg'}
+    finally:
+        plt.close(fig)
+
+def test_store_round_trip(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    path = store.put(b'image bytes', 'png')
+    assert path.endswith('.png') and os.path.dirname(path) == str(tmp_path)
+    with open(path, 'rb') as f:
+        assert f.read() == b'image bytes'
+    assert store.put(b'image bytes', 'png') == path
+    assert store.put(b'other bytes', 'png') != path
+    assert sorted(os.listdir(str(tmp_path))) == sorted(
+        os.path.basename(p) for p in (path, store.put(b'other bytes', 'png')))
@@ -0,0 +1,33 @@
+# test_phase_scan.py
+import numpy as np
+import pytest
+
+from wedge import analyze_wedge, phase_scan
+
+ARGS = (50., 'ricker', 25, '', '', '')
+LAYERS = (2000., 2500., 2000., 2.2, 2.3, 2.2)
+CURVES = ('tuning_thickness', 'tuning_thickness_t', 'tuning_amplitude', 'min_apparent_thickness_t')
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_phase_scan_matches_analyze_wedge(sparse):
+    angles = [0., 45., 90., 150., 180.]
+    scan = phase_scan(*ARGS, *LAYERS, angles = angles, sparse = sparse, return_data = True)
+    for k, angle in enumerate(angles):
+        single = analyze_wedge(*ARGS, angle, *LAYERS, sparse = sparse)
+        assert np.allclose(scan['data'][k], single['data'], atol = 1e-12)
+        assert np.allclose(scan['amp_picks'][k], single['amp_picks'], atol = 1e-9)
+        for key in CURVES:
+            assert np.isclose(scan[key][k], single[key], rtol = 0, atol = 1e-9), key
+
+def test_phase_scan_zero_degrees():
+    scan = phase_scan(*ARGS, *LAYERS, angles = 0)
+    single = analyze_wedge(*ARGS, 0, *LAYERS)
+    assert 'data' not in scan
+    assert np.array_equal(scan['wavelets'][0], single['wavelet'])
+    assert np.array_equal(scan['amp_picks'][0], single['amp_picks'])
+    assert scan['tuning_thickness'][0] == single['tuning_thickness']
+
+def test_phase_scan_label_states_angle_range():
+    label = phase_scan(*ARGS, *LAYERS, angles = [30., 90., 150.])['wavelet_label']
+    assert label == r'Ricker 25 Hz with $30^\circ$ to $150^\circ$ phase rotation'
+    assert 'zero phase' not in phase_scan(*ARGS, *LAYERS, angles = 0)['wavelet_label']
@@ -0,0 +1,97 @@
+# test_picking.py
+import numpy as np
+
+from wedge import build_wedge, choose_pick_mode, parabolic_refine, pick_interface_and_amp, pick_panels
+
+ARGS = (50., 'ricker', 25, '', '', '')
+LAYERS = (2000., 2500., 2000., 2.2, 2.3, 2.2)
+
+def _index(t, t0, dt):
+    return int(np.round((t - t0)/dt))
+
+def loop_zero_crossings(data, ref_interface, top_limit, base_limit, t0, dt):
+    # Trace by trace search outwards from the reference, as the original picker did
+    tpicks = ref_interface.copy()
+    for itr in range(data.shape[1]):
+        it0 = it1 = _index(ref_interface[itr], t0, dt)
+        it_top, it_base = _index(top_limit[itr], t0, dt), _index(base_limit[itr], t0, dt)
+        pick = None
+        while pick is None and (it0 > it_top or it1 < it_base):
+            for i in (it0, it1):
+                ii = min(max(i, it_top), it_base)
+                if data[ii - 1, itr]*data[ii, itr] <= 0.:
+                    pick = t0 + ii*dt
+                    break
+            it0 -= 1
+            it1 += 1
+        if pick is not None:
+            tpicks[itr] = pick
+    return tpicks
+
+def loop_peaks_or_troughs(data, top_limit, base_limit, t0, dt, pickmode):
+    tpicks = np.empty_like(top_limit)
+    amp_picks = np.empty_like(top_limit)
+    op = np.argmax if pickmode == 'peaks' else np.argmin
+    for itr in range(data.shape[1]):
+        # Windows that round to nothing at the thin end hold one sample
+        it_top = _index(top_limit[itr], t0, dt)
+        it_base = max(_index(base_limit[itr], t0, dt), it_top + 1)
+        i = it_top + op(data[it_top:it_base, itr])
+        tpicks[itr], amp_picks[itr] = t0 + i*dt, data[i, itr]
+    return tpicks, amp_picks
+
+def loop_pick_interface_and_amp(data, interface1_t, interface2_t, t0, nt, dt):
+    halfwin = (interface2_t[-1] - interface1_t[-1])/2
+    pickmode = choose_pick_mode(data, interface1_t, halfwin, t0, dt)
+    tmax = t0 + (nt - 1)*dt
+    middle = (interface1_t + interface2_t)/2.
+    if pickmode == 'zero-crossings':
+        hor1 = loop_zero_crossings(data, interface1_t, np.full_like(middle, t0), middle, t0, dt)
+        hor2 = loop_zero_crossings(data, interface2_t, middle, np.full_like(middle, tmax), t0, dt)
+        it_top = np.round((hor1 - t0)/dt).astype(int)
+        polarity = sum(data[it_top[-k] + 2, -k] for k in range(1, 6))
+        hor3, amp = loop_peaks_or_troughs(data, hor1, hor1 + (hor2 - hor1)*0.67, t0, dt,
+            'peaks' if polarity > 0. else 'troughs')
+        return hor1, hor2, hor3, amp
+    hor1, amp = loop_peaks_or_troughs(data, np.full_like(middle, t0), middle, t0, dt, pickmode)
+    hor2, _ = loop_peaks_or_troughs(data, middle, np.full_like(middle, tmax), t0, dt,
+        'troughs' if pickmode == 'peaks' else 'peaks')
+    return hor1, hor2, None, amp
+
+def _section(phase_rot, sparse = False):
+    return build_wedge(*ARGS, phase_rot, *LAYERS, 20, 61, sparse)
+
+def test_vectorized_picks_match_loop():
+    modes = set()
+    for phase_rot in (0, 45, 90, 135, 180, 270):
+        for sparse in (False, True):
+            m = _section(phase_rot, sparse)
+            section = (m['data'], m['interface1_t'], m['interface2_t'], m['t0'], m['nt'], m['dt'])
+            expected = loop_pick_interface_and_amp(*section)
+            picks = pick_interface_and_amp(*section, refine = False)
+            for got, want in zip(picks, expected):
+                assert (got is None) == (want is None)
+                if want is not None:
+                    assert np.allclose(got, want, rtol = 0, atol = 1e-9)
+            modes.add(choose_pick_mode(m['data'], m['interface1_t'], (m['interface2_t'][-1] - m['interface1_t'][-1])/2, m['t0'], m['dt']))
+    assert modes == {'peaks', 'troughs', 'zero-crossings'}
+
+def test_pick_panels_matches_single_sections():
+    sections = [_section(phase_rot) for phase_rot in (0, 90, 180)]
+    m = sections[0]
+    data = np.stack([s['data'] for s in sections], axis = 1)
+    panels = pick_panels(data, m['interface1_t'], m['interface2_t'], m['t0'], m['nt'], m['dt'])
+    for k, s in enumerate(sections):
+        single = pick_interface_and_amp(s['data'], m['interface1_t'], m['interface2_t'], m['t0'], m['nt'], m['dt'])
+        for got, want in zip(panels, single):
+            if want is None:
+                assert np.isnan(got[k]).all()
+            else:
+                assert np.array_equal(got[k], want)
+
+def test_parabolic_refine_finds_vertex():
+    x = np.arange(20.)
+    data = np.stack((1. - (x - 7.3)**2, 2. - 0.5*(x - 11.8)**2), axis = 1)
+    pos, amp = parabolic_refine(data, np.argmax(data, axis = 0))
+    assert np.allclose(pos, [7.3, 11.8])
+    assert np.allclose(amp, [1., 2.])
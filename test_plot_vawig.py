@@ -0,0 +1,43 @@
+# test_plot_vawig.py
+import math
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from matplotlib.collections import LineCollection, PolyCollection
+
+from wedge import plot_vawig, trace_stride
+
+NTRC, NSAMP = 400, 64
+
+@pytest.fixture
+def data():
+    t = np.linspace(-1, 1, NSAMP)
+    return np.outer(np.linspace(0.5, 1, NTRC), np.exp(-20*t**2)*np.cos(10*t))
+
+def _draw(data, figsize, **kwargs):
+    fig, ax = plt.subplots(figsize = figsize, dpi = 50)
+    t = np.arange(NSAMP)*0.001
+    plot_vawig(ax, data, t, 0., 1., 1.5, **kwargs)
+    lines = [c for c in ax.collections if isinstance(c, LineCollection)]
+    fills = [c for c in ax.collections if isinstance(c, PolyCollection)]
+    stride = trace_stride(ax, NTRC, 1., 1.5)
+    plt.close(fig)
+    return lines, fills, stride
+
+def test_decimated_plot_draws_every_stride_trace(data):
+    lines, fills, stride = _draw(data, (3, 2), decimate = True)
+    assert stride > 1
+    ntraces = math.ceil(NTRC/stride)
+    assert len(lines) == 1 and len(lines[0].get_segments()) == ntraces
+    assert len(fills) == 1 and len(fills[0].get_paths()) == 2*ntraces
+    # decimated traces keep their original positions
+    assert lines[0].get_segments()[1][:, 0].mean() == pytest.approx(stride*1., abs = 1.5)
+
+def test_stride_one_draws_every_trace(data):
+    lines, fills, stride = _draw(data, (3, 2))
+    assert len(lines[0].get_segments()) == NTRC and len(fills[0].get_paths()) == 2*NTRC
+    lines, _, stride = _draw(data, (40, 2), decimate = True)
+    assert stride == 1 and len(lines[0].get_segments()) == NTRC
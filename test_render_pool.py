@@ -0,0 +1,44 @@
+# test_render_pool.py
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from render_pool import RenderPool, RenderTimeout
+
+class Hang:
+    # Unpickling this in the worker blocks it, like a render that never returns
+    def __reduce__(self):
+        return time.sleep, (60,)
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(max_workers = 1, timeout = 30.)
+    pool.warm()
+    yield pool
+    pool.shutdown()
+
+def test_timed_out_render_does_not_starve_the_pool(pool):
+    hung = pool._executor
+    workers = list(hung._processes.values())
+    with pytest.raises(RenderTimeout):
+        pool.render('xy', {'y': Hang()}, timeout = 0.5)
+
+    # The next job goes to a fresh pool, although the only old worker is stuck
+    image = pool.render('xy', {'y': [1., 3., 2.], 'format': 'png', 'dpi': 50})
+    assert Image.open(io.BytesIO(image)).format == 'PNG'
+    assert pool._executor is not hung
+
+    for i in range(100):
+        if not any(p.is_alive() for p in workers):
+            break
+        time.sleep(0.05)
+    assert not any(p.is_alive() for p in workers)
+
+def test_abandoning_finished_job_keeps_pool(pool):
+    executor = pool._executor
+    future = pool.submit('xy', {'y': [1., 2.], 'format': 'png', 'dpi': 50})
+    future.result(30.)
+    pool.abandon(future)
+    assert pool._executor is executor
@@ -0,0 +1,31 @@
+# test_resample.py
+import numpy as np
+import pytest
+
+from wedge import resample, resample_ratio
+
+def analytic_ricker(t, f0 = 30.):
+    arg = (np.pi*f0*t/1000.)**2
+    return (1. - 2.*arg)*np.exp(-arg)
+
+@pytest.mark.parametrize('dt, dt_new', [(2., 0.5), (0.5, 2.), (1., 0.4), (4., 1.)])
+def test_resample_matches_analytic_ricker(dt, dt_new):
+    t = np.arange(-100., 100. + dt/2, dt)
+    t_new, trc = resample(t, analytic_ricker(t), dt_new)
+    assert t_new[0] == t[0] and np.allclose(np.diff(t_new), dt_new)
+    # Away from the filter edge effects at both ends
+    inner = np.abs(t_new) < 80.
+    assert np.allclose(trc[inner], analytic_ricker(t_new[inner]), atol = 1e-4)
+
+def test_resample_stack_matches_single_traces():
+    t = np.arange(0., 200., 2.)
+    traces = np.random.default_rng(0).standard_normal((t.size, 4))
+    t_new, stack = resample(t, traces, 0.5, axis = 0)
+    for i in range(4):
+        assert np.allclose(stack[:, i], resample(t, traces[:, i], 0.5)[1])
+
+def test_resample_ratio():
+    assert resample_ratio(2., 0.5) == (4, 1)
+    assert resample_ratio(1., 0.4) == (5, 2)
+    with pytest.raises(ValueError):
+        resample_ratio(1., 1.0001)
@@ -0,0 +1,48 @@
+# test_segy.py
+import numpy as np
+import pytest
+
+from segy import BINARY_HEADER_DTYPE, TRACE_HEADER_DTYPE, SegyWriter, write_segy
+from wedge import analyze_wedge, export_segy
+
+def read_segy(fname):
+    with open(fname, 'rb') as f:
+        text = f.read(3200).decode('cp037')
+        binary = np.frombuffer(f.read(400), dtype = BINARY_HEADER_DTYPE)[0]
+        trace_dtype = np.dtype([('header', TRACE_HEADER_DTYPE), ('data', '>f4', (binary['hns'],))])
+        traces = np.frombuffer(f.read(), dtype = trace_dtype)
+    return text, binary, traces['header'], traces['data'].T
+
+def test_write_read_round_trip(tmp_path):
+    fname = str(tmp_path / 'section.sgy')
+    data = np.random.default_rng(0).standard_normal((250, 7)).astype('f4')
+    cdp_x = np.linspace(0., 30., 7)
+    write_segy(fname, data, 0.5, 12., cdp_x = cdp_x, text = ['Test section'], units = 'ft', batch_traces = 3)
+
+    text, binary, headers, traces = read_segy(fname)
+    cards = [text[i:i+80] for i in range(0, 3200, 80)]
+    assert cards[0].rstrip() == 'C 1 Test section'
+    assert cards[38].rstrip() == 'C39 SEG Y REV1' and cards[39].rstrip() == 'C40 END TEXTUAL HEADER'
+    assert (binary['hdt'], binary['hns'], binary['format'], binary['mfeet'], binary['rev']) == (500, 250, 5, 2, 0x0100)
+
+    assert np.array_equal(traces, data)
+    assert np.array_equal(headers['tracl'], np.arange(1, 8))
+    assert (headers['ns'] == 250).all() and (headers['dt'] == 500).all() and (headers['delrt'] == 12).all()
+    # Negative coordinate scalars divide
+    assert (headers['scalco'] == -100).all() and np.allclose(headers['cdp_x']/100., cdp_x)
+
+def test_start_time_must_be_whole_ms(tmp_path):
+    with pytest.raises(ValueError):
+        SegyWriter(str(tmp_path / 'bad.sgy'), 100, 0.5, 12.25)
+
+def test_export_segy_shifts_onto_whole_ms(tmp_path):
+    result = analyze_wedge(50., 'ricker', 25, '', '', '', 0, 2000., 2500., 2000., 2.2, 2.3, 2.2)
+    fname = str(tmp_path / 'wedge.sgy')
+    export_segy(fname, result)
+    _, _, headers, traces = read_segy(fname)
+
+    delrt = int(headers['delrt'][0])
+    assert 0. <= delrt - result['t0'] < 1.
+    t = delrt + np.arange(traces.shape[0])*result['dt']
+    expected = np.stack([np.interp(t, result['t'], trc) for trc in result['data'].T], axis = 1)
+    assert np.allclose(traces, expected, atol = 1e-3*np.abs(result['data']).max())
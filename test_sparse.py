@@ -0,0 +1,31 @@
+# test_sparse.py
+import numpy as np
+
+from wedge import analyze_wedge, convolve_traces, ricker, synthesize_spikes
+
+ARGS = (50., 'ricker', 25, '', '', '', 0, 2000., 2500., 2000., 2.2, 2.3, 2.2)
+
+def test_spikes_on_samples_match_dense_convolution():
+    t, wavelet = ricker(128, 0.5, 30)
+    t0, nt, dt = 10., 400, 0.5
+    it = np.array([[50, 120, 200], [60, 300, 210]])
+    rc_model = np.zeros((nt, 3))
+    rc_model[it[0], np.arange(3)] += 0.2
+    rc_model[it[1], np.arange(3)] -= 0.1
+    sparse = synthesize_spikes(t0 + it*dt, [0.2, -0.1], wavelet, t[0], t0, nt, dt)
+    assert np.allclose(sparse, convolve_traces(rc_model, wavelet), atol = 1e-12)
+
+def test_sub_sample_spike_matches_analytic_ricker():
+    t, wavelet = ricker(128, 0.5, 30)
+    t0, nt, dt = 10., 400, 0.5
+    tk = t0 + 100.3*dt
+    trace = synthesize_spikes([[tk]], [1.], wavelet, t[0], t0, nt, dt)[:, 0]
+    arg = (np.pi*30*(t0 + np.arange(nt)*dt - tk)/1000.)**2
+    assert np.allclose(trace, (1. - 2.*arg)*np.exp(-arg), atol = 1e-9)
+
+def test_sparse_wedge_tuning_matches_dense():
+    dense = analyze_wedge(*ARGS)
+    sparse = analyze_wedge(*ARGS, sparse = True)
+    assert sparse['data'].shape == dense['data'].shape
+    assert sparse['tuning_thickness'] == dense['tuning_thickness']
+    assert np.isclose(sparse['tuning_amplitude'], dense['tuning_amplitude'], rtol = 1e-3)
@@ -0,0 +1,27 @@
+# test_spectrum.py
+import numpy as np
+
+from wedge import phaserotate_batch, ricker, spectrum_analysis, spectrum_analysis_batch, spectrum_trim_small_val, wavelet_trim_small_val
+
+def test_batch_matches_single_wavelets():
+    t, wavelet = ricker(200, 0.5, 30)
+    wavelets = phaserotate_batch(wavelet, [0., 45., 90.])
+    freq, amp_spec, pow_spec = spectrum_analysis_batch(t, wavelets)
+    for k in range(3):
+        f1, a1, p1 = spectrum_analysis(t, wavelets[k])
+        assert np.array_equal(f1, freq) and np.allclose(a1, amp_spec[k]) and np.allclose(p1, pow_spec[k])
+    assert np.allclose(pow_spec.max(axis = 1), 0., atol = 1e-6)
+
+def test_ricker_spectrum_peaks_at_dominant_frequency():
+    t, wavelet = ricker(200, 0.5, 30)
+    freq, amp_spec, _ = spectrum_analysis(t, wavelet)
+    assert abs(freq[np.argmax(amp_spec)] - 30.) < freq[1]
+
+def test_trimming_keeps_significant_part():
+    t, wavelet = ricker(500, 0.5, 30)
+    t_trim, w_trim = wavelet_trim_small_val(t, np.stack((wavelet, -wavelet)))
+    assert t_trim.size < t.size and np.allclose(t_trim[0], -t_trim[-1])
+    assert np.isclose(np.abs(w_trim).max(), 1.)
+    freq, amp_spec, pow_spec = spectrum_analysis(t, wavelet)
+    f_trim, a_trim, _ = spectrum_trim_small_val(freq, amp_spec, pow_spec)
+    assert f_trim[-1] < freq[-1] and (amp_spec[f_trim.size:] < 2e-4*amp_spec.max()).all()
@@ -0,0 +1,82 @@
+# test_streaming.py
+import os
+import concurrent.futures
+
+import pytest
+
+import image_output
+import render_pool
+from streaming import run_with_progress, stream_wedge
+
+def _job(n, progress = None):
+    for i in range(n):
+        progress({'stage': 'step', 'i': i})
+    if n < 0:
+        raise ValueError('negative')
+    return n*10
+
+def test_run_with_progress_yields_events_then_result():
+    events = list(run_with_progress(_job, 3))
+    assert [e.get('i') for e in events[:-1]] == [0, 1, 2]
+    assert events[-1] == {'stage': 'result', 'result': 30}
+
+def test_run_with_progress_reraises():
+    with pytest.raises(ValueError):
+        list(run_with_progress(_job, -1))
+
+class StalledPool:
+    # Render jobs that never finish
+    timeout = 60.
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, kind, spec):
+        self.futures.append(concurrent.futures.Future())
+        return self.futures[-1]
+
+    def abandon(self, *futures):
+        for future in futures:
+            future.cancel()
+
+def test_stream_wedge_render_timeout(monkeypatch):
+    pool = StalledPool()
+    monkeypatch.setattr(render_pool, '_pool', pool)
+    stages = []
+    with pytest.raises(render_pool.RenderTimeout):
+        for event in stream_wedge({'max_thickness': 30.}, timeout = 0.05):
+            stages.append(event['stage'])
+    assert stages[-1] == 'render'
+    assert len(pool.futures) == 2 and all(f.cancelled() for f in pool.futures)
+
+class InlinePool:
+    # Renders each job in this process as soon as it is submitted
+    timeout = 60.
+
+    def __init__(self):
+        self.specs = []
+
+    def submit(self, kind, spec):
+        self.specs.append(spec)
+        future = concurrent.futures.Future()
+        future.set_result(render_pool._run(kind, spec))
+        return future
+
+def test_stream_wedge_renders_both_images_from_one_bundle(monkeypatch):
+    pool = InlinePool()
+    monkeypatch.setattr(render_pool, '_pool', pool)
+    stored = []
+    monkeypatch.setattr(image_output, 'store', lambda data, fmt: stored.append((data, fmt)) or 'image.%s' % fmt)
+    events = list(stream_wedge({'max_thickness': 30.}))
+    assert [e['stage'] for e in events[-2:]] == ['preview', 'done']
+
+    # The result is shipped once, as a shared bundle, not in each spec
+    assert len(pool.specs) == 2 and all('result' not in spec for spec in pool.specs)
+    assert pool.specs[0]['result_bundle'] == pool.specs[1]['result_bundle']
+    assert not os.path.exists(pool.specs[0]['result_bundle'])
+
+    # Rendering from the bundle gives the image of the in-memory result
+    result = events[-1]['result']
+    spec = dict(pool.specs[0], result = result)
+    del spec['result_bundle']
+    assert stored[0] == (render_pool._run('wedge_result', spec), 'jpeg')
@@ -0,0 +1,27 @@
+# test_sweep.py
+import csv
+
+import pytest
+
+from sweep import RESULT_COLUMNS, parameter_grid, run_scenario, run_sweep
+
+def test_parameter_grid():
+    grid = list(parameter_grid(ricker_freq = [20, 30], vp2 = 2500., phase_rot = (0, 90)))
+    assert len(grid) == 4
+    assert grid[1] == {'ricker_freq': 20, 'vp2': 2500., 'phase_rot': 90}
+
+def test_run_sweep_matches_run_scenario(tmp_path):
+    scenarios = list(parameter_grid(ricker_freq = [20, 30, 40], max_thickness = 30.))
+    csv_fname = str(tmp_path / 'sweep.csv')
+    table = run_sweep(scenarios, chunk_size = 2, max_workers = 2, csv_fname = csv_fname)
+    assert list(table) == ['ricker_freq', 'max_thickness'] + RESULT_COLUMNS
+    for i, params in enumerate(scenarios):
+        row = run_scenario(params)
+        assert all(table[key][i] == value for key, value in row.items())
+    with open(csv_fname, newline = '') as f:
+        rows = list(csv.DictReader(f))
+    assert [float(r['tuning_thickness']) for r in rows] == table['tuning_thickness']
+
+def test_bundle_needs_collect(tmp_path):
+    with pytest.raises(ValueError):
+        run_sweep([{}], collect = False, bundle_fname = str(tmp_path / 'sweep.npz'))
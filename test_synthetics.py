@@ -0,0 +1,71 @@
+# test_synthetics.py
+import numpy as np
+
+from synthetics import depth_to_time, synthetic_section, synthetic_seismograms
+from wedge import convolve_traces, ricker
+
+def analytic_ricker(t, f0 = 30.):
+    arg = (np.pi*f0*t/1000.)**2
+    return (1. - 2.*arg)*np.exp(-arg)
+
+def _blocky_log():
+    # 2000 m/s gives 1 ms of two-way time per metre, so every interface
+    # (halfway between log samples) falls on the 0.5 ms time axis
+    depth = np.arange(0., 200.)
+    vp = np.full(depth.size, 2000.)
+    rho = np.where(depth < 80., 2.2, np.where(depth < 120., 2.5, 2.3))
+    return depth, vp, rho
+
+def test_depth_to_time_constant_velocity():
+    depth = np.arange(0., 100., 5.)
+    assert np.allclose(depth_to_time(depth, np.full(depth.size, 2500.), 10.), 10. + 2000.*depth/2500.)
+
+def test_blocky_log_matches_analytic_ricker():
+    depth, vp, rho = _blocky_log()
+    wavelet_t, wavelet = ricker(128, 0.5, 30)
+    r = synthetic_seismograms(depth, vp, rho, wavelet, wavelet_t, 0.5)
+    rc = [(2.5 - 2.2)/(2.5 + 2.2), (2.3 - 2.5)/(2.3 + 2.5)]
+    expected = rc[0]*analytic_ricker(r['t'] - 79.5) + rc[1]*analytic_ricker(r['t'] - 119.5)
+    assert np.allclose(r['data'][:, 0], expected, atol = 1e-9)
+    assert np.isclose(r['reflectivity'][:, 0].sum(), sum(rc))
+
+def test_batch_matches_single_wells():
+    depth, vp, rho = _blocky_log()
+    rng = np.random.default_rng(0)
+    vp = vp*(1. + 0.1*rng.random((3, depth.size)))
+    rho = rho*(1. + 0.1*rng.random((3, depth.size)))
+    # The third well is shorter
+    vp[2, 150:] = rho[2, 150:] = np.nan
+    wavelet_t, wavelet = ricker(128, 0.5, 30)
+    batch = synthetic_seismograms(depth, vp, rho, wavelet, wavelet_t, 0.5)
+    for i in range(3):
+        n = 150 if i == 2 else depth.size
+        single = synthetic_seismograms(depth[:n], vp[i, :n], rho[i, :n], wavelet, wavelet_t, 0.5,
+            t0 = batch['t'][0], nt = batch['t'].size)
+        assert np.allclose(batch['data'][:, i], single['data'][:, 0], atol = 1e-12)
+
+def test_section_chunks_match_one_pass(tmp_path):
+    rng = np.random.default_rng(0)
+    impedance = 5000. + 500.*rng.random((300, 11))
+    np.save(tmp_path / 'impedance.npy', impedance)
+    wavelet_t, wavelet = ricker(64, 1., 30)
+    one = synthetic_section(str(tmp_path / 'one.npy'), wavelet, wavelet_t, 1., impedance = impedance, dtype = 'float64')
+    chunked = synthetic_section(str(tmp_path / 'chunked.npy'), wavelet, wavelet_t, 1.,
+        impedance = str(tmp_path / 'impedance.npy'), chunk_traces = 4, dtype = 'float64')
+    assert one['shape'] == chunked['shape'] == (300, 11)
+    data = np.load(one['fname'])
+    assert np.array_equal(np.load(chunked['fname']), data)
+
+    rc_model = np.zeros(impedance.shape)
+    rc_model[1:] = (impedance[1:] - impedance[:-1])/(impedance[1:] + impedance[:-1])
+    assert np.allclose(data, convolve_traces(rc_model, wavelet), atol = 1e-12)
+
+def test_depth_section_matches_well_synthetics(tmp_path):
+    depth, vp, rho = _blocky_log()
+    vp = np.stack((vp, 1.1*vp, 0.9*vp), axis = 1)
+    rho = np.repeat(rho[:, None], 3, axis = 1)
+    wavelet_t, wavelet = ricker(128, 0.5, 30)
+    r = synthetic_section(str(tmp_path / 'depth.npy'), wavelet, wavelet_t, 0.5, vp = vp, rho = rho, dz = 1.,
+        t_top = 10., chunk_traces = 2, dtype = 'float64')
+    wells = synthetic_seismograms(depth, vp.T, rho.T, wavelet, wavelet_t, 0.5, t0 = r['t0'], nt = r['shape'][0], t_top = 10.)
+    assert np.allclose(np.load(r['fname']), wells['data'], atol = 1e-12)
@@ -0,0 +1,31 @@
+# test_tools.py
+import io
+
+import numpy as np
+from PIL import Image
+
+import figures
+import tools
+from array_codec import decode
+from synthetics import well_synthetics
+
+def test_plot_ricker_returns_image_and_releases_template():
+    ricker = tools.make_ricker({'frequency': 30})
+    image = tools.plot_ricker(ricker)
+    assert Image.open(io.BytesIO(image)).size[0] > 0
+    # The pooled template is back in the pool, not held by the caller
+    assert not figures._pool._busy
+    assert tools.plot_ricker(ricker) == image
+
+def test_synthetic_seismogram_forwards_custom_wavelet(tmp_path):
+    depth = np.arange(0., 200.)
+    logs = {'depth': depth.tolist(), 'vp': [2000.]*200, 'rho': np.where(depth < 100., 2.2, 2.5).tolist()}
+    text = '-4 0\n-2 -0.5\n0 1\n2 -0.5\n4 0\n'
+    fname = tmp_path / 'wavelet.txt'
+    fname.write_text(text)
+    expected = well_synthetics(depth, logs['vp'], logs['rho'], wv_type = 'custom', wavelet_str = text)['data']
+    for wavelet in ({'wavelet_str': text}, {'wavelet_fname': str(fname)}):
+        r = tools.synthetic_seismogram(dict(logs, wv_type = 'custom', **wavelet))
+        assert np.allclose(decode(r['data']), expected)
+    ricker = tools.synthetic_seismogram(dict(logs, wv_type = 'ricker'))
+    assert not np.allclose(decode(ricker['data']), expected)
@@ -0,0 +1,41 @@
+# test_wavelet_cache.py
+import numpy as np
+import pytest
+
+import wavelet_cache
+from wavelet_cache import WaveletCache
+from wedge import gen_wavelet, phaserotate, ricker
+
+def test_lru_eviction_by_size():
+    # Two entries of 2*800 bytes fit
+    cache = WaveletCache(2*1600)
+    calls = []
+    def factory(n):
+        def build():
+            calls.append(n)
+            return np.zeros(100), np.full(100, float(n))
+        return build
+    for n in (1, 2, 1, 3):
+        cache.get(n, factory(n))
+    assert calls == [1, 2, 3]
+    # 2 was the least recently used entry when 3 came in
+    assert cache.stats()['entries'] == 2 and cache.stats()['nbytes'] == 2*1600
+    cache.get(2, factory(2))
+    assert calls == [1, 2, 3, 2]
+
+def test_entries_are_read_only():
+    cache = WaveletCache(2**20)
+    t, w = cache.get('k', lambda: (np.arange(3.), np.ones(3)))
+    with pytest.raises(ValueError):
+        w[0] = 2.
+
+def test_gen_wavelet_hits_cache():
+    wavelet_cache.clear_cache()
+    t, w, _ = gen_wavelet(0.5, 'ricker', 30, '', '', '', 45)
+    t2, w2, _ = gen_wavelet(0.5, 'ricker', 30, '', '', '', 45)
+    assert w2 is w
+    assert wavelet_cache.cache_stats()['hits'] == 1
+    _, expected = ricker(500, 0.5, 30)
+    assert np.allclose(w, phaserotate(expected, 45))
+    _, w3, _ = gen_wavelet(0.5, 'ricker', 30, '', '', '', 90)
+    assert w3 is not w and wavelet_cache.cache_stats()['misses'] == 2
@@ -0,0 +1,44 @@
+# test_wavelet_file.py
+import io
+
+import numpy as np
+import pytest
+
+from wedge import content_hash, gen_wavelet, parse_and_prep_wavelet, parse_wavelet, ricker
+
+T, WAVELET = ricker(128, 2., 30)
+
+def test_text_and_npy_formats_agree():
+    csv = 'Time (s),Amplitude\n' + ''.join('%.4f,%.12f\n' % (t/1000., a) for t, a in zip(T, WAVELET))
+    txt = '# t ms  amp\n' + ''.join('%g\t%.12f\n' % (t, a) for t, a in zip(T, WAVELET))
+    buf = io.BytesIO()
+    np.save(buf, np.stack((T, WAVELET)))
+    for data in (csv, txt.encode(), buf.getvalue(), np.stack((T, WAVELET), axis = 1)):
+        t, wavelet = parse_wavelet(data, 1.)
+        assert np.allclose(t, T) and np.allclose(wavelet, WAVELET)
+
+def test_amplitude_only_is_centred():
+    t, wavelet = parse_wavelet('\n'.join('%.12f' % a for a in WAVELET), 2.)
+    assert np.allclose(t, T) and np.array_equal(wavelet, np.round(WAVELET, 12))
+
+def test_prepared_at_model_dt():
+    text = ''.join('%g %.12f\n' % (t, a) for t, a in zip(T, WAVELET))
+    t, wavelet = parse_and_prep_wavelet(text, 0.5)
+    assert np.allclose(np.diff(t), 0.5) and t[np.argmax(wavelet)] == 0. and wavelet.max() == 1.
+    inner = np.abs(t) < 50.
+    arg = (np.pi*30*t[inner]/1000.)**2
+    assert np.allclose(wavelet[inner], (1. - 2.*arg)*np.exp(-arg), atol = 1e-3)
+
+def test_file_and_contents_share_cache(tmp_path):
+    text = ''.join('%g %.12f\n' % (t, a) for t, a in zip(T, WAVELET))
+    fname = tmp_path / 'wavelet.txt'
+    fname.write_text(text)
+    _, from_file, label = gen_wavelet(0.5, 'custom', 0, '', '', str(fname), 0)
+    _, from_text, _ = gen_wavelet(0.5, 'custom', 0, '', text, '', 0)
+    assert from_file is from_text and label == 'wavelet'
+    assert content_hash(text.encode()) == content_hash(fname.read_bytes())
+
+def test_bad_files():
+    for text in ('time,amp\n', 'a b\n1 2\n3 x\n', '1 2\n3\n'):
+        with pytest.raises(ValueError):
+            parse_wavelet(text, 1.)
@@ -1,61 +1,192 @@
 # tools.py
-from bruges.filters import ricker, convolve
+# bruges, wedge (scipy) and figures (matplotlib) are imported by the tools
+# that need them, so starting the server and calling the light tools stays fast.
 import numpy as np
-from wedge import spectrum_analysis, spectrum_trim_small_val, wavelet_trim_small_val, create_figure
-import matplotlib.pyplot as plt
+from wavelet_cache import get_wavelet
+from array_codec import decode, options, pack
 
 def make_ricker(args):
     f = args['frequency']
     dt = args.get('dt', 0.001)
     duration = args.get('duration', 0.256)
-    w, t = ricker(duration=duration, dt=dt, f=f)
-    return {'wavelet': w.tolist(), 'time': t.tolist()}
+    def generate():
+        from bruges.filters import ricker
+        return ricker(duration=duration, dt=dt, f=f)
+    w, t = get_wavelet(('bruges_ricker', (float(f),), float(dt), float(duration), 0.), generate)
+    return pack({'wavelet': w, 'time': t}, args.get('array_format'))
 
-def plot_ricker(args):
-    wavelet = np.array(args['wavelet'])
-    t = np.array(args.get('time', np.arange(len(wavelet))))
+def plot_ricker(args, image_opts=None):
+    """
+    Plot a wavelet ('wavelet', optional 'time') and its spectra and return
+    the encoded image bytes. image_opts come from image_output.options and
+    default to the 'image_preset' argument.
+    """
+    import io
+    import figures
+    import image_output
+    from wedge import spectrum_analysis, spectrum_trim_small_val, wavelet_trim_small_val
+    wavelet = decode(args['wavelet'], float)
+    t = decode(args['time'], float) if 'time' in args else np.arange(len(wavelet))
     t, wavelet = wavelet_trim_small_val(t, wavelet)
     freq, amp_spec, pow_spec = spectrum_analysis(t, wavelet)
     freq, amp_spec, pow_spec = spectrum_trim_small_val(freq, amp_spec, pow_spec)
-    
-    fig, axes = create_figure()
-    ax0, ax1, ax2 = axes
-    lw = 1.5
-    ax0.plot(t, wavelet, color = 'black', lw = lw, label = 'wavelet')
-    ax0.legend()
-    ax0.fill_between(t, wavelet, 0, where = wavelet > 0, facecolor = [0.8, 0.8, 1.0], interpolate = True)
-    ax0.fill_between(t, wavelet, 0, where = wavelet < 0, facecolor = [1.0, 0.8, 0.8], interpolate = True)
-    ax0.set_xlabel('Time (ms)')
-    ax0.set_ylabel('Amplitude')
-    ax0.set_title('Ricker Wavelet', fontsize = 18)
-    ax0.tick_params(top = True, right = True, labelright = True)
-    ax0.grid(linestyle = ':')
-
-    ax1.plot(freq, amp_spec, color = 'green', lw = lw, label = 'Amplitude spectrum')
-    ax1.legend()
-    ax1.set_xlabel('Frequency (Hz)')
-    ax1.set_ylabel('Amplitude (linear)')
-    ax1.tick_params(top = True, right = True, labelright = True)
-    ax1.grid(linestyle = ':')
-    
-    ax2.plot(freq, pow_spec, color = 'blue', lw = lw, label = 'Power spectrum (normalized)')
-    ax2.legend()
-    ax2.set_xlabel('Frequency (Hz)')
-    ax2.set_ylabel('Power (dB)')
-    ax2.set_ylim((-65, 5))
-    ax2.tick_params(top = True, right = True, labelright = True)
-    ax2.grid(linestyle = ':')
-    
-    plt.tight_layout()
-    return fig
+    image_opts = image_opts or image_output.options(args.get('image_preset'))
+
+    # The pooled template never leaves this function
+    buf = io.BytesIO()
+    with figures.figure_template('wavelet') as tpl:
+        fig = tpl.update(t, wavelet, freq, amp_spec, pow_spec, 'Ricker Wavelet')
+        fig.savefig(buf, **image_output.savefig_kwargs(fig, image_opts))
+    return buf.getvalue()
 
 def compute_reflectivity(args):
-    vp = np.array(args['vp'])
-    rho = np.array(args.get('rho', [2200]*len(vp)))
+    vp = decode(args['vp'], float)
+    rho = decode(args.get('rho', [2200]*len(vp)), float)
     Z = vp * rho
     rc = (Z[1:] - Z[:-1]) / (Z[1:] + Z[:-1])
-    reflectivity = np.zeros(args.get('n_samples', 1000))
-    positions = args.get('positions', [100, 300])  # indices
-    for i, pos in enumerate(positions):
-        reflectivity[pos] = rc[i]
-    return {'reflectivity': reflectivity.tolist()}
+    n_samples = args.get('n_samples', 1000)
+    # Sample index of each interface; by default 100, 300, 500, ...
+    positions = np.asarray(args.get('positions', 100 + 200*np.arange(len(rc))), dtype=int)
+    if positions.shape != rc.shape:
+        raise ValueError('Need one position per interface: got %d positions for %d interfaces' % (positions.size, rc.size))
+    if positions.size and (positions.min() < 0 or positions.max() >= n_samples):
+        raise ValueError('Interface positions must lie within the %d samples' % n_samples)
+    reflectivity = np.zeros(n_samples)
+    reflectivity[positions] = rc
+    return pack({'reflectivity': reflectivity}, args.get('array_format'))
+
+def synthetic_seismogram(args):
+    """
+    Synthetic seismograms from depth-sampled logs: 'depth' (m), 'vp' (m/s)
+    and 'rho', each (nz,) or (nwells, nz), with the wedge wavelet options
+    and 'dt' (ms); custom wavelets come from 'wavelet_str' or 'wavelet_fname'.
+    See synthetics.well_synthetics.
+    """
+    from synthetics import well_synthetics
+    logs = {k: decode(args[k], float) for k in ('depth', 'vp', 'rho')}
+    kwargs = {k: args[k] for k in ('dt', 'wv_type', 'ricker_freq', 'ormsby_freq', 'wavelet_str', 'wavelet_fname',
+        'phase_rot', 't0', 'nt') if k in args}
+    if 't_top' in args:
+        kwargs['t_top'] = decode(args['t_top'], float)
+    result = well_synthetics(logs['depth'], logs['vp'], logs['rho'], **kwargs)
+    return pack(result, args.get('array_format'))
+
+def synthetic_section(args):
+    """
+    Chunked synthetic section of a 2D model given as .npy files ('impedance',
+    or 'vp' and 'rho'; 'dz' for depth-sampled grids), written to the .npy
+    file 'out_fname'. See synthetics.synthetic_section.
+    """
+    from synthetics import synthetic_section as section
+    from wedge import gen_wavelet
+    dt = args.get('dt', 1.)
+    wavelet_t, wavelet, wavelet_label = gen_wavelet(dt, args.get('wv_type', 'ricker'), args.get('ricker_freq', 25),
+        args.get('ormsby_freq', ''), '', '', args.get('phase_rot', 0))
+    kwargs = {k: args[k] for k in ('impedance', 'vp', 'rho', 'dz', 't_top', 'chunk_traces', 'max_chunk_mb', 'dtype', 'segy_fname', 'dx') if k in args}
+    result = section(args['out_fname'], wavelet, wavelet_t, dt, **kwargs)
+    result['wavelet_label'] = wavelet_label
+    return result
+
+WEDGE_DEFAULTS = {
+    'zunit': 'm',
+    'max_thickness': 50.,
+    'wv_type': 'ricker',
+    'ricker_freq': 25,
+    'ormsby_freq': '',
+    'wavelet_str': '',
+    'wavelet_fname': '',
+    'phase_rot': 0,
+    'vp1': 2000., 'vp2': 2500., 'vp3': 2000.,
+    'rho1': 2.2, 'rho2': 2.3, 'rho3': 2.2,
+    'gain': 1.,
+    'plotpadtime': 20.,
+    'thickness_domain': 'depth',
+}
+
+WEDGE_ARGS = ['zunit', 'max_thickness', 'wv_type', 'ricker_freq', 'ormsby_freq', 'wavelet_str', 'wavelet_fname',
+    'phase_rot', 'vp1', 'vp2', 'vp3', 'rho1', 'rho2', 'rho3', 'gain', 'plotpadtime', 'thickness_domain']
+
+WAVELET_ARGS = ['wv_type', 'ricker_freq', 'ormsby_freq', 'wavelet_str', 'wavelet_fname', 'phase_rot']
+
+def _load_arrays(fname):
+    with np.load(fname) as npz:
+        arrays = {k: npz[k] for k in npz.files}
+    return {k: v if v.ndim else v.item() for k, v in arrays.items()}
+
+def _with_arrays(result, entry, array_format):
+    # The cached arrays are only inlined when a compact array format was asked for
+    if options(array_format)['format'] != 'list':
+        result.update(pack(_load_arrays(entry['arrays']), array_format))
+    return result
+
+def wedge_model(args):
+    # Rendered through the artifact cache; returns file paths rather than pixels
+    from artifact_cache import cached_wedge_model
+    import image_output
+    p = dict(WEDGE_DEFAULTS, **args)
+    image_opts = image_output.options(p.pop('image_preset', None))
+    array_format = p.pop('array_format', None)
+    segy_fname = p.pop('segy_fname', None)
+    bundle_fname = p.pop('bundle_fname', None)
+    zunit = p['zunit']
+    entry = cached_wedge_model(*[p.pop(k) for k in WEDGE_ARGS], image_opts=image_opts, **p)
+    result = {'figure': entry['figure'], 'csv': entry['csv'], 'arrays': entry['arrays'], 'cached': entry['hit']}
+    # Exports are written from the cached arrays, so cache hits can export too
+    if segy_fname:
+        from wedge import export_segy
+        export_segy(segy_fname, _load_arrays(entry['arrays']), zunit)
+        result['segy'] = segy_fname
+    if bundle_fname:
+        from export import export_wedge
+        export_wedge(bundle_fname, _load_arrays(entry['arrays']), zunit)
+        result['bundle'] = bundle_fname
+    return _with_arrays(result, entry, array_format)
+
+def plot_wavelet(args):
+    from artifact_cache import cached_plot_wavelet
+    import image_output
+    p = dict(WEDGE_DEFAULTS, **args)
+    image_opts = image_output.options(p.get('image_preset'))
+    entry = cached_plot_wavelet(*[p[k] for k in WAVELET_ARGS], image_opts=image_opts)
+    result = {'figure': entry['figure'], 'arrays': entry['arrays'], 'cached': entry['hit']}
+    return _with_arrays(result, entry, p.get('array_format'))
+
+PHASE_SCAN_ARGS = ['max_thickness', 'wv_type', 'ricker_freq', 'ormsby_freq', 'wavelet_str', 'wavelet_fname',
+    'vp1', 'vp2', 'vp3', 'rho1', 'rho2', 'rho3']
+
+def wedge_phase_scan(args):
+    """
+    Wedge tuning thickness and amplitude for every wavelet phase rotation in
+    'angles' (degrees, default 0-180 in 5 degree steps) from a single model.
+    Returns the per-angle curves, not the sections. See wedge.phase_scan.
+    """
+    from wedge import phase_scan
+    p = dict(WEDGE_DEFAULTS, **args)
+    kwargs = {k: p[k] for k in ('plotpadtime', 'ntraces', 'sparse') if k in p}
+    if 'angles' in p:
+        kwargs['angles'] = decode(p['angles'], float)
+    r = phase_scan(*[p[k] for k in PHASE_SCAN_ARGS], **kwargs)
+    return pack({k: r[k] for k in ('wavelet_label', 'angles', 'thickness', 'tuning_thickness', 'tuning_thickness_t',
+        'tuning_amplitude', 'min_apparent_thickness_t', 'amp_picks')}, p.get('array_format'))
+
+AVO_ARGS = ['max_thickness', 'wv_type', 'ricker_freq', 'ormsby_freq', 'wavelet_str', 'wavelet_fname', 'phase_rot',
+    'vp1', 'vp2', 'vp3', 'vs1', 'vs2', 'vs3', 'rho1', 'rho2', 'rho3']
+
+def avo_wedge(args):
+    """
+    Angle-dependent wedge tuning: the wedge_model arguments plus 'vs1',
+    'vs2', 'vs3', 'angles' (degrees, default 0-40 in 2 degree steps) and
+    'method' ('zoeppritz' or 'akirichards'). Returns the per-angle
+    coefficients and tuning curves, not the sections. See wedge.avo_wedge.
+    """
+    from wedge import avo_wedge as avo
+    p = dict(WEDGE_DEFAULTS, **args)
+    missing = [k for k in ('vs1', 'vs2', 'vs3') if k not in p]
+    if missing:
+        raise ValueError('AVO wedge needs S-wave velocities: missing %s' % ', '.join(missing))
+    kwargs = {k: p[k] for k in ('method', 'plotpadtime', 'ntraces', 'sparse') if k in p}
+    if 'angles' in p:
+        kwargs['angles'] = decode(p['angles'], float)
+    r = avo(*[p[k] for k in AVO_ARGS], **kwargs)
+    return pack({k: r[k] for k in ('wavelet_label', 'method', 'angles', 'angles_base', 'rc1', 'rc2', 'thickness',
+        'tuning_thickness', 'tuning_thickness_t', 'tuning_amplitude', 'min_apparent_thickness_t', 'amp_picks')}, p.get('array_format'))
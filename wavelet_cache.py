@@ -0,0 +1,92 @@
+# wavelet_cache.py
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_MB = 64
+
+class WaveletCache:
+    """
+    Bounded LRU cache of generated wavelets.
+
+    Entries are tuples of NumPy arrays (typically time and amplitude) keyed
+    on something like (type, frequencies, dt, length, phase rotation). The
+    arrays are stored and returned read-only so callers can share them
+    safely. Least recently used entries are evicted once the total size
+    exceeds max_bytes.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = tuple(_readonly(a) for a in factory())
+        size = sum(a.nbytes for a in value if isinstance(a, np.ndarray))
+
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = value
+                self.nbytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, value = self._entries.popitem(last = False)
+            self.nbytes -= sum(a.nbytes for a in value if isinstance(a, np.ndarray))
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+            }
+
+def _readonly(a):
+    if isinstance(a, np.ndarray):
+        a = np.array(a)
+        a.flags.writeable = False
+    return a
+
+_cache = WaveletCache(float(os.environ.get('WAVELET_CACHE_MB', DEFAULT_MAX_MB))*2**20)
+
+def get_wavelet(key, factory):
+    """Return the cached arrays for key, calling factory() to build them on a miss."""
+    return _cache.get(key, factory)
+
+def cache_stats():
+    return _cache.stats()
+
+def set_cache_limit(max_mb):
+    _cache.set_max_bytes(max_mb*2**20)
+
+def clear_cache():
+    _cache.clear()
@@ -1,15 +1,21 @@
+import io
+import re
 import math
+import hashlib
+import functools
+from fractions import Fraction
 import numpy as np
-import scipy.signal
 
 import os
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from wavelet_cache import get_wavelet
+from image_output import savefig_kwargs
 
 _debug = bool(os.environ.get('DEBUG'))
 
+# Threads used by scipy.fft; -1 means one per CPU
+FFT_WORKERS = int(os.environ.get('FFT_WORKERS', -1))
+
 def debug(*args):
     import sys
     if _debug:
@@ -20,6 +26,82 @@ def phaserotate(trc, deg):
     spec *=np.exp(1j * deg * np.pi / 180.)
     return np.fft.irfft(spec, trc.size)
 
+def hilbert_transform(trc, axis = -1):
+    """Hilbert transform of trc along axis (the imaginary part of its analytic signal) from one real FFT pair."""
+    n = trc.shape[axis]
+    spec = np.fft.rfft(trc, axis = axis)
+    spec *= -1j
+    # DC and Nyquist have no quadrature component
+    index = [slice(None)]*spec.ndim
+    index[axis] = [0, -1] if n % 2 == 0 else [0]
+    spec[tuple(index)] = 0
+    return np.fft.irfft(spec, n, axis = axis)
+
+def phaserotate_batch(trc, degs):
+    """
+    trc rotated by every angle in degs at once, shape (len(degs), trc.size).
+    Each rotation is cos(deg)*trc - sin(deg)*H(trc) with the Hilbert
+    transform H computed once, and matches phaserotate(trc, deg).
+    """
+    rad = np.deg2rad(np.asarray(degs, dtype = float))[:, None]
+    return np.cos(rad)*trc - np.sin(rad)*hilbert_transform(trc)
+
+@functools.lru_cache(maxsize = 32)
+def _wavelet_spectrum(wavelet_bytes, dtype, nfft):
+    import scipy.fft
+    spec = scipy.fft.rfft(np.frombuffer(wavelet_bytes, dtype = dtype), nfft)
+    spec.flags.writeable = False
+    return spec
+
+def wavelet_spectrum(wavelet, nfft):
+    """Real FFT of wavelet padded to nfft, memoized so repeated syntheses reuse it."""
+    wavelet = np.ascontiguousarray(wavelet)
+    return _wavelet_spectrum(wavelet.tobytes(), wavelet.dtype.str, nfft)
+
+def convolve_traces(rc_model, wavelet, workers = None):
+    """
+    Convolve every column of rc_model with wavelet in a single batched FFT.
+
+    Equivalent to scipy.signal.convolve(trace, wavelet, mode='same') applied
+    to each column, but the whole (nt, ntraces) panel is transformed at once
+    using a fast transform length and a shared wavelet spectrum.
+    """
+    import scipy.fft
+    nt = rc_model.shape[0]
+    nfft = scipy.fft.next_fast_len(nt + wavelet.size - 1, real = True)
+    spec = scipy.fft.rfft(rc_model, nfft, axis = 0, workers = workers or FFT_WORKERS)
+    spec *= wavelet_spectrum(wavelet, nfft)[:, None]
+    full = scipy.fft.irfft(spec, nfft, axis = 0, workers = workers or FFT_WORKERS)
+    i0 = (wavelet.size - 1)//2
+    return full[i0:i0+nt]
+
+def synthesize_spikes(spike_t, spike_rc, wavelet, wavelet_t0, t0, nt, dt, workers = None):
+    """
+    Build traces from sparse (time, coefficient) pairs by frequency-domain superposition.
+
+    spike_t holds the reflector times (ms) with shape (nspikes, ntraces) and
+    spike_rc the matching coefficients, either (nspikes,) or (nspikes, ntraces).
+    Each trace is sum_k rc_k*W(f)*exp(-i2*pi*f*t_k) evaluated in one inverse
+    FFT, so reflectors land at their exact sub-sample times. wavelet_t0 is
+    the time (ms) of the first wavelet sample.
+    """
+    import scipy.fft
+    spike_t = np.atleast_2d(spike_t)
+    spike_rc = np.asarray(spike_rc, dtype = float)
+    if spike_rc.ndim == 1:
+        spike_rc = spike_rc[:, None]
+
+    nfft = scipy.fft.next_fast_len(nt + 2*wavelet.size, real = True)
+    freq = np.fft.rfftfreq(nfft)
+    shifts = (spike_t - t0 + wavelet_t0)/dt
+
+    spec = np.zeros((freq.size, spike_t.shape[1]), dtype = complex)
+    for k in range(spike_t.shape[0]):
+        spec += spike_rc[k]*np.exp(-2j*np.pi*freq[:, None]*shifts[k])
+    spec *= wavelet_spectrum(wavelet, nfft)[:, None]
+
+    return scipy.fft.irfft(spec, nfft, axis = 0, workers = workers or FFT_WORKERS)[:nt]
+
 def ricker(length, dt, f0, quad = False):
     f0 /= 1000.
 
@@ -51,57 +133,53 @@ def ormsby(length, dt, f1, f2, f3, f4):
 
     return t_ms, trc
 
-def resample_prep(t, trc, dt_new):
-    NPAD_MAX = 2000
-    n = trc.size - 1
-    dt = t[1] - t[0]
-
-    npad = 0
-    for i in range(NPAD_MAX):
-        n +=1
-        tmax = dt*n
-        if math.isclose(int(round(tmax/dt_new))*dt_new, tmax):
-            npad = n - trc.size
-            break
-    else:
-        raise Exception('resample_prep: failed to find proper padding length')
-        
-    t_pad = np.hstack((t, np.arange(1, npad+1)*dt + t[-1]))
-    trc_pad = np.hstack((trc, np.zeros(npad)))
-
-    return t_pad, trc_pad
-    
-
-def resample(t, trc, dt_new):
-    assert t.shape == trc.shape, 'resampleL t and trc need to have the same shape'
+# Longest rational ratio accepted for dt_in/dt_out, and the polyphase
+# filter design: half length in taps per unit of max(up, down), Kaiser beta
+RESAMPLE_MAX_DENOMINATOR = 1000
+RESAMPLE_HALF_TAPS = 16
+RESAMPLE_KAISER_BETA = 8.
+
+def resample_ratio(dt, dt_new):
+    """Sample interval ratio dt/dt_new as (up, down) integers."""
+    ratio = Fraction(dt/dt_new).limit_denominator(RESAMPLE_MAX_DENOMINATOR)
+    if ratio == 0 or not math.isclose(ratio, dt/dt_new, rel_tol = 1e-6):
+        raise ValueError('Cannot resample from %g ms to %g ms: no rational ratio with denominator up to %d'
+            % (dt, dt_new, RESAMPLE_MAX_DENOMINATOR))
+    return ratio.numerator, ratio.denominator
+
+@functools.lru_cache(maxsize = 32)
+def _polyphase_filter(up, down):
+    import scipy.signal
+    rate = max(up, down)
+    h = scipy.signal.firwin(2*RESAMPLE_HALF_TAPS*rate + 1, 1./rate, window = ('kaiser', RESAMPLE_KAISER_BETA))
+    h.flags.writeable = False
+    return h
+
+def resample(t, trc, dt_new, axis = -1):
+    """
+    Resample trc, sampled at times t (ms), to interval dt_new by rational
+    polyphase filtering (scipy.signal.resample_poly). trc is a single trace
+    or a stack of traces sampled along axis. The anti-alias filter is
+    designed once per up/down ratio and memoized. Returns the new time axis,
+    starting at t[0], and the resampled traces.
+    """
+    import scipy.signal
+    trc = np.asarray(trc)
+    if t.size != trc.shape[axis]:
+        raise ValueError('resample: t has %d samples but trc has %d along axis %d' % (t.size, trc.shape[axis], axis))
 
     dt = t[1] - t[0]
     if math.isclose(dt, dt_new):
         return t, trc
-    
-    _, trc_pad = resample_prep(t, trc, dt_new)
-    tmax = trc_pad.size*dt
-
-    nfft = trc_pad.size
-    spec = np.fft.rfft(trc_pad, nfft)
-    freq = np.fft.rfftfreq(nfft, dt*0.001)
-
-    nfft_new = int(round(tmax/dt_new))
-    freq_new = np.fft.rfftfreq(nfft_new, dt_new*0.001)
 
-    re = np.interp(freq_new, freq, spec.real, left = 0, right =0)
-    im = np.interp(freq_new, freq, spec.img, left =0, right = 0)
-
-    spec_intp = re + 1j*im
-
-    norm_factor = nfft_new/nfft
-    trc_resamp = np.fft.irfft(spec_intp, nfft_new)*norm_factor
-    t_resamp = np.arange(0, trc_resamp.size)*dt_new+t[0]
+    up, down = resample_ratio(dt, dt_new)
+    trc_resamp = scipy.signal.resample_poly(trc, up, down, axis = axis, window = _polyphase_filter(up, down))
+    t_resamp = np.arange(trc_resamp.shape[axis])*dt_new + t[0]
 
     return t_resamp, trc_resamp
 
 
-def get_fraction(vals, i):
+def get_fraction(vals):
     PERCENT = 10
     EPS = 1e-8
 
@@ -109,7 +187,7 @@ def get_fraction(vals, i):
     vals_min = np.percentile(vals, PERCENT)
     vals_max = np.percentile(vals, 100-PERCENT)
 
-    frac = (vals[i] - vals_min)/(vals_max-vals_min+EPS)
+    frac = (vals - vals_min)/(vals_max-vals_min+EPS)
     frac = np.clip(frac, 0, 1)
 
     frac = frac**3
@@ -117,183 +195,325 @@ def get_fraction(vals, i):
     return frac
 
 
-def get_red_rgb(data, i):
+def get_red_rgb(data):
     MAX_RED_RGB = np.array([1., 0.4, 0.4])
     MIN_RED_RGB = np.array([1., 0.8, 0.8])
 
     minvals = data.min(axis =1)
-    fract = get_fraction(minvals, 1)
+    fract = get_fraction(minvals)[:, None]
 
-    return tuple(MIN_RED_RGB + fract*(MAX_RED_RGB-MIN_RED_RGB))
+    return MIN_RED_RGB + fract*(MAX_RED_RGB-MIN_RED_RGB)
 
 
-def get_blue_rgb(data, i):
+def get_blue_rgb(data):
     MAX_BLUE_RGB = np.array([0.4, 0.4, 1.])
     MIN_BLUE_RGB = np.array([0.8, 0.8, 1.])
 
-    minvals = data.min(axis =1)
-    fract = get_fraction(minvals, 1)
+    maxvals = data.max(axis =1)
+    fract = get_fraction(maxvals)[:, None]
 
-    return tuple(MIN_BLUE_RGB + fract*(MAX_BLUE_RGB-MIN_BLUE_RGB))
+    return MIN_BLUE_RGB + fract*(MAX_BLUE_RGB-MIN_BLUE_RGB)
 
 
-def plot_vawig(ax, data, t, z_min, dz, excursion):
+def trace_stride(ax, ntrc, dz, excursion, min_px = 2.):
+    """Trace step that keeps neighbouring wiggles at least min_px pixels apart on ax."""
+    width_px = ax.get_window_extent().width
+    span = (ntrc - 1)*dz + 2*excursion
+    if ntrc < 2 or span <= 0:
+        return 1
+    spacing_px = dz*width_px/span
+    return max(1, int(math.ceil(min_px/spacing_px)))
+
+
+def plot_vawig(ax, data, t, z_min, dz, excursion, fill = True, decimate = False):
+    """
+    Draw wiggle traces (one per row of data) as a single LineCollection, with
+    optional variable-area fill of positive (blue) and negative (red) lobes as
+    a single PolyCollection. With decimate, traces that would overlap at the
+    output resolution of ax are skipped.
+    """
+    from matplotlib.collections import LineCollection, PolyCollection
     EPS = 1e-8
 
     [ntrc, nsamp] = data.shape
 
     data = data/(np.max(np.abs(data))+EPS)
 
-    for i in range(ntrc):
-        trace_base = z_min + i*dz
-        trace = excursion *data[i] + trace_base
-
-        ax.plot(trace, t, color = 'black', linewidth = 1)
-
-def choose_pick_mode(data, interface_t, halfwin, t0, dt):
-    ntraces = data.shape[1]
+    itrc = np.arange(ntrc)
+    if decimate:
+        itrc = itrc[::trace_stride(ax, ntrc, dz, excursion)]
+    data = data[itrc]
+
+    trace_base = (z_min + itrc*dz)[:, None]
+    tt = np.broadcast_to(t, data.shape)
+    traces = excursion*data + trace_base
+
+    if fill:
+        base = np.broadcast_to(trace_base, data.shape)
+        pos = np.maximum(traces, base)
+        neg = np.minimum(traces, base)
+        polys = np.concatenate((
+            np.stack((np.hstack((pos, base[:, ::-1])), np.hstack((tt, tt[:, ::-1]))), axis = -1),
+            np.stack((np.hstack((neg, base[:, ::-1])), np.hstack((tt, tt[:, ::-1]))), axis = -1),
+        ))
+        colors = np.vstack((get_blue_rgb(data), get_red_rgb(data)))
+        ax.add_collection(PolyCollection(polys, facecolors = colors, edgecolors = 'none'))
+
+    ax.add_collection(LineCollection(np.stack((traces, tt), axis = -1), colors = 'black', linewidths = 1))
+    ax.autoscale_view()
+
+def _sample_index(t, t0, dt):
+    return np.round((np.asarray(t) - t0)/dt).astype('int')
+
+def _window_mask(nt, it_top, it_base):
+    rows = np.arange(nt)[:, None]
+    return (rows >= it_top[None, :]) & (rows < it_base[None, :])
+
+def parabolic_refine(data, idx):
+    """
+    Refine integer sample picks idx (one per column of data) by fitting a
+    parabola through each pick and its two neighbours. Returns the fractional
+    sample positions and the interpolated amplitudes.
+    """
+    nt = data.shape[0]
+    cols = np.arange(data.shape[1])
+    idx = np.clip(idx, 1, nt - 2)
+    ym1 = data[idx - 1, cols]
+    y0 = data[idx, cols]
+    yp1 = data[idx + 1, cols]
+
+    denom = ym1 - 2.*y0 + yp1
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        offset = np.where(denom != 0, 0.5*(ym1 - yp1)/denom, 0.)
+    offset = np.clip(offset, -0.5, 0.5)
+    amp = y0 - 0.25*(ym1 - yp1)*offset
+
+    return idx + offset, amp
+
+def choose_pick_modes(data, interface_t, halfwin, t0, dt):
+    """
+    Pick mode of every panel of data (nt, npanels, ntraces) at once, from
+    the normalised amplitude at interface_t (npanels, ntraces) on its last
+    traces: 'peaks', 'troughs' or 'zero-crossings'. halfwin (npanels,) is
+    the normalisation window below the interface.
+    """
+    nt, npanels, ntraces = data.shape
 
     last_n = 5
-    avg_amp = 0.0
-
     AMP_THRESHOLD = 0.5
 
-    for i in range(ntraces-last_n, ntraces):
-        iwin_end = int(round((interface_t[i] + halfwin-t0)/dt))
-        data_ = data[:i]/np.max(np.abs(data[:iwin_end,i]))
-        idx = int(round((interface_t[i]-t0)/dt))
-
-        avg_amp += data_[idx]
-
-    avg_amp /= last_n
-
-    if abs(avg_amp) < AMP_THRESHOLD:
-        return 'zero-crossing';
-    elif avg_amp >= AMP_THRESHOLD:
-        return 'peaks';
-    else:
-        return 'troughs';
-
-def pick_zero_crossings(data, ref_interface, top_limit, base_limit, t0, dt):
-    
-    ntraces = data.shape[1] 
-    tpicks = ref_interface.copy() 
-
-    it= np.round((ref_interface - t0)/dt).astype('int')
-
-    it_top = np.round((top_limit - t0)/dt).astype('int')
-    it_base = np.round((base_limit - t0)/dt).astype('int')
+    cols = np.arange(ntraces-last_n, ntraces)
+    iwin_end = _sample_index(interface_t[:, cols] + halfwin[:, None], t0, dt)
+    win = np.arange(nt)[:, None, None] < iwin_end[None, :, :]
+    norm = np.max(np.where(win, np.abs(data[:, :, cols]), 0.), axis = 0)
+    idx = _sample_index(interface_t[:, cols], t0, dt)
 
-    for itr in range(ntraces): 
-        it0 = it[itr] 
-        it1 = it[itr] 
-        pick = None 
+    avg_amp = np.mean(data[idx, np.arange(npanels)[:, None], cols]/norm, axis = 1)
 
-        while pick is None and (it0 > it_top[itr] or it1 < it_base[itr]): 
-            for i in [it0, it1]: 
-                ii = min(max(i, it_top[itr]), it_base[itr]) 
-                product = data[ii - 1, itr] * data[ii, itr] 
-                if product == 0.0 or product < 0: 
-                    pick = t0+ii*dt
-                    break
-            it0 -= 1
-            it1 += 1
-        if pick:
-            tpicks[itr] = pick
+    return np.where(np.abs(avg_amp) < AMP_THRESHOLD, 'zero-crossings',
+        np.where(avg_amp >= AMP_THRESHOLD, 'peaks', 'troughs'))
 
+def choose_pick_mode(data, interface_t, halfwin, t0, dt):
+    return str(choose_pick_modes(data[:, None], np.asarray(interface_t)[None], np.atleast_1d(halfwin), t0, dt)[0])
 
-def peak_peaks_or_troughs(data, top_limit, base_limit, t0, dt, pickmode):
-    it_top = np.round((top_limit - t0)/dt).astype('int')  
-    it_base = np.round((base_limit - t0)/dt).astype('int') 
-
-    tpicks = np.empty_like(top_limit)
-    amp_picks = np.empty_like(top_limit)
-
-    ntraces = data.shape[1]
-    t_op = np.argmax if pickmode == 'peaks' else np.argmin
-    amp_op = np.max if pickmode == 'peaks' else np.min
-
-    for itr in range(ntraces):
-        tpicks[itr] = t_op(data[it_top[itr]:it_base[itr], itr]) + it_top[itr]
-        amp_picks[itr] = amp_op(data[it_top[itr]:it_base[itr], itr])
+def pick_zero_crossings(data, ref_interface, top_limit, base_limit, t0, dt, refine = True):
+    """
+    Pick, on every trace at once, the zero crossing closest to ref_interface
+    within [top_limit, base_limit]. Traces without a crossing keep their
+    reference time. With refine, the crossing time is linearly interpolated
+    between the two samples that bracket it.
+    """
+    nt = data.shape[0]
+    tpicks = np.array(ref_interface, dtype = float)
+
+    it = _sample_index(ref_interface, t0, dt)
+    it_top = np.maximum(_sample_index(top_limit, t0, dt), 1)
+    it_base = np.minimum(_sample_index(base_limit, t0, dt), nt - 1)
+
+    # Only the rows some window reaches; crossing[ii] flags a sign change
+    # between samples r0+ii-1 and r0+ii
+    r0, r1 = it_top.min(), (it_base + 1).max()
+    crossing = data[r0-1:r1-1]*data[r0:r1] <= 0.
+    crossing &= _window_mask(r1 - r0, it_top - r0, it_base + 1 - r0)
+
+    dist = np.where(crossing, np.abs(np.arange(r0, r1)[:, None] - it[None, :]), nt)
+    ii = np.argmin(dist, axis = 0)
+    found = crossing[ii, np.arange(data.shape[1])]
+    ii += r0
+
+    picks = ii.astype(float)
+    if refine:
+        cols = np.arange(data.shape[1])
+        y0 = data[ii - 1, cols]
+        y1 = data[ii, cols]
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            frac = np.where(y0 != y1, y0/(y0 - y1), 1.)
+        picks = ii - 1 + np.clip(frac, 0., 1.)
+
+    tpicks[found] = t0 + picks[found]*dt
+    return tpicks
+
+def peak_peaks_or_troughs(data, top_limit, base_limit, t0, dt, pickmode, refine = True):
+    """
+    Pick the largest peak (or deepest trough) inside [top_limit, base_limit)
+    on every trace at once. pickmode is 'peaks' or 'troughs', for all traces
+    or one per trace. Returns the pick times and amplitudes, refined to
+    sub-sample accuracy by parabolic interpolation when refine is set.
+    """
+    nt, ntraces = data.shape
+    it_top = np.clip(_sample_index(top_limit, t0, dt), 0, nt - 1)
+    it_base = np.clip(_sample_index(base_limit, t0, dt), it_top + 1, nt)
+
+    # Troughs are the peaks of the sign-flipped traces; only the rows some
+    # window reaches are searched
+    sign = np.where(np.asarray(pickmode) == 'peaks', 1., -1.)
+    r0, r1 = it_top.min(), it_base.max()
+    masked = data[r0:r1]*sign
+    np.copyto(masked, -np.inf, where = ~_window_mask(r1 - r0, it_top - r0, it_base - r0))
+
+    idx = r0 + np.argmax(masked, axis = 0)
+    if refine:
+        tpicks, amp_picks = parabolic_refine(data, idx)
+    else:
+        amp_picks = data[idx, np.arange(ntraces)]
+        tpicks = idx
 
     tpicks = t0 + tpicks*dt
     return tpicks, amp_picks
 
 
-def pick_interface_and_amp(data, interface1_t, interface2_t, t0, nt, dt):
+# Working set of one block of panels in pick_panels. The picks are memory
+# bound, so blocks that stay in cache beat one pass over a large cube.
+PICK_BLOCK_BYTES = 16*2**20
 
-    halfwin = (interface2_t[-1] - interface1_t[-1]) / 2 
-    pickmode = choose_pick_mode(data, interface1_t, halfwin, t0, dt) #debug("pickmode = %s" % pickmode), 
-
-    hor1_tpicks = interface1_t.copy() 
-    hor2_tpicks = interface2_t.copy() 
-    amp_picks = np.empty_like(interface1_t) 
-    tmax = t0 + (nt - 1) * dt 
-    ntraces = data.shape[1]
-    
-    if pickmode == 'zero-crossings':
-        top_limit = np.full_like(interface1_t, t0) 
-        base_limit = (interface1_t + interface2_t) / 2.0
-        hor1_tpicks = pick_zero_crossings(data, interface1_t, top_limit, base_limit, t0, dt)
+def pick_panels(data, interface1_t, interface2_t, t0, nt, dt, refine = True):
+    """
+    Pick the horizons and amplitudes of a stack of wedge panels
+    (nt, npanels, ntraces), e.g. one per phase rotation or incidence angle,
+    in one pass. Interface times are (ntraces,) or (npanels, ntraces).
+    Every panel gets its own pick mode (choose_pick_modes) as a single
+    section would; the traces of all panels are then picked side by side,
+    one call per kind of pick, in blocks of about PICK_BLOCK_BYTES. Returns
+    hor1, hor2, hor3 and amp picks, each (npanels, ntraces); hor3 is NaN on
+    panels picked on peaks or troughs.
+    """
+    _, npanels, ntraces = data.shape
+    interface1_t = np.broadcast_to(interface1_t, (npanels, ntraces))
+    interface2_t = np.broadcast_to(interface2_t, (npanels, ntraces))
+    block = max(1, PICK_BLOCK_BYTES//(nt*ntraces*data.itemsize))
+    picks = [_pick_panels(data[:, i:i+block], interface1_t[i:i+block], interface2_t[i:i+block], t0, nt, dt, refine)
+        for i in range(0, npanels, block)]
+    return tuple(np.concatenate(p) for p in zip(*picks))
+
+def _pick_panels(data, interface1_t, interface2_t, t0, nt, dt, refine):
+    _, npanels, ntraces = data.shape
+
+    halfwin = (interface2_t[:, -1] - interface1_t[:, -1]) / 2
+    modes = choose_pick_modes(data, interface1_t, halfwin, t0, dt)
+    debug("pickmode = %s" % modes)
+
+    tmax = t0 + (nt - 1) * dt
+
+    hor1_tpicks = np.empty((npanels, ntraces))
+    hor2_tpicks = np.empty((npanels, ntraces))
+    hor3_tpicks = np.full((npanels, ntraces), np.nan)
+    amp_picks = np.empty((npanels, ntraces))
+
+    def side_by_side(sel):
+        # The selected panels as one (nt, n*ntraces) section: column
+        # k*ntraces + i is trace i of the k-th selected panel. Without a
+        # selection this is a view
+        panels = data if sel.all() else data[:, sel]
+        return (panels.reshape(nt, -1), interface1_t[sel].ravel(), interface2_t[sel].ravel(),
+            np.repeat(modes[sel], ntraces))
+
+    zc = modes == 'zero-crossings'
+    if zc.any():
+        d, i1, i2, _ = side_by_side(zc)
+        top_limit = np.full_like(i1, t0)
+        base_limit = (i1 + i2) / 2.0
+        h1 = pick_zero_crossings(d, i1, top_limit, base_limit, t0, dt, refine)
         top_limit = base_limit
-        base_limit = np.full_like(interface1_t, tmax) 
-        hor2_tpicks = pick_zero_crossings(data, interface2_t, top_limit, base_limit, t0, dt) 
+        base_limit = np.full_like(i1, tmax)
+        h2 = pick_zero_crossings(d, i2, top_limit, base_limit, t0, dt, refine)
         fract = 0.67
 
-        top_limit = hor1_tpicks
-        base_limit = hor1_tpicks+(hor2_tpicks-hor1_tpicks)*fract
+        top_limit = h1
+        base_limit = h1+(h2-h1)*fract
 
-        it_top = np.round((top_limit - t0)/dt).astype('int')
-        it_base = np.round((hor1_tpicks + (hor2_tpicks - hor1_tpicks)*fract - t0)/dt).astype('int')
-        
+        # Polarity below the top pick on the last traces of each panel
+        it_top = _sample_index(top_limit, t0, dt)
         last_n = 5
-        sum_amp = 0.0
-        for itr in range(1, last_n+1): 
-            sum_amp += data[it_top[-itr]+2, -itr]
-
-        amp_op = np.max if sum_amp > 0.0 else np.min
-        t_op = np.argmax if sum_amp> 0.0 else np.argmin
-
-        hor3_tpicks = np.empty_like(interface1_t)
-        for itr in range(ntraces):
-            hor3_tpicks[itr] = t_op(data[it_top[itr]:it_base[itr], itr]) + it_top[itr]
-            amp_picks = amp_op(data[it_top[itr]:it_base[itr], itr])
-        hor3_tpicks = t0 + hor3_tpicks*dt
-    else:
-        top_limit = np.full_like(interface1_t, t0)
-        base_limit = (interface1_t + interface2_t)/2.0
-        hor1_tpicks, amp_picks = peak_peaks_or_troughs(data, top_limit, base_limit, t0, dt, pickmode)
+        amp = d[it_top+2, np.arange(d.shape[1])].reshape(-1, ntraces)
+        sum_amp = amp[:, -last_n:].sum(axis = 1)
+
+        hor3_pickmode = np.repeat(np.where(sum_amp > 0.0, 'peaks', 'troughs'), ntraces)
+        h3, amp = peak_peaks_or_troughs(d, top_limit, base_limit, t0, dt, hor3_pickmode, refine)
+        hor1_tpicks[zc], hor2_tpicks[zc] = h1.reshape(-1, ntraces), h2.reshape(-1, ntraces)
+        hor3_tpicks[zc], amp_picks[zc] = h3.reshape(-1, ntraces), amp.reshape(-1, ntraces)
+
+    pk = ~zc
+    if pk.any():
+        d, i1, i2, pickmode = side_by_side(pk)
+        top_limit = np.full_like(i1, t0)
+        base_limit = (i1 + i2)/2.0
+        h1, amp = peak_peaks_or_troughs(d, top_limit, base_limit, t0, dt, pickmode, refine)
         top_limit = base_limit
-        base_limit = np.full_like(interface1_t, tmax)
-        reverse_pickmode = 'troughs' if pickmode == 'peaks' else 'peaks'
-        hor2_tpicks, _ = peak_peaks_or_troughs(data, top_limit, base_limit, t0, dt, reverse_pickmode)
-        hor3_tpicks = None
+        base_limit = np.full_like(i1, tmax)
+        reverse_pickmode = np.where(pickmode == 'peaks', 'troughs', 'peaks')
+        h2, _ = peak_peaks_or_troughs(d, top_limit, base_limit, t0, dt, reverse_pickmode, refine)
+        hor1_tpicks[pk], hor2_tpicks[pk], amp_picks[pk] = h1.reshape(-1, ntraces), h2.reshape(-1, ntraces), amp.reshape(-1, ntraces)
 
     return hor1_tpicks, hor2_tpicks, hor3_tpicks, amp_picks
 
-def create_figure():
-    params = {
-        'legend.fontsize': 'x-large',
-        'axes.labelsize': 16,
-        'axes.titlesize': 'x-large',
-        'xtick.labelsize': 'x-large',
-        'ytick.labelsize': 'x-large',
-    }
-    plt.rcParams.update(params)
 
-    fig, axes = plt.subplots(3, 1, figsize=(12, 14))
+def pick_interface_and_amp(data, interface1_t, interface2_t, t0, nt, dt, refine = True):
+    """pick_panels for a single section (nt, ntraces); hor3 is None when it was picked on peaks or troughs."""
+    hor1_tpicks, hor2_tpicks, hor3_tpicks, amp_picks = pick_panels(data[:, None], interface1_t, interface2_t, t0, nt, dt, refine)
+    hor3_tpicks = None if np.isnan(hor3_tpicks).all() else hor3_tpicks[0]
+    return hor1_tpicks[0], hor2_tpicks[0], hor3_tpicks, amp_picks[0]
 
-    return fig, axes
+def analyze_model(model):
+    """
+    Pick the horizons on a synthetic wedge from build_wedge and derive the
+    amplitude and thickness curves. Returns the model dict extended with
+    the time axis 't', the horizon picks, the amplitude curve, apparent
+    thicknesses and the tuning thickness. Never touches matplotlib.
+    """
+    data, dt = model['data'], model['dt']
+    t0, nt = model['t0'], model['nt']
+    vp_layers = model['vp_layers']
 
-def make_plot(zunit, data, wavelet_label, vp_layers, rho_layers, thickness, \
-    interface1_t, interface2_t, t0, nt, dt, z_min, z_max, dz, gain, plotpadtime, thickness_domain,\
-        fig_fname, csv_fname=''):
-    
-    hor1_tpicks, hor2_tpicks, hor3_tpicks, amp_picks = pick_interface_and_amp(data, interface1_t, interface2_t, t0, nt, dt)
+    hor1_tpicks, hor2_tpicks, hor3_tpicks, amp_picks = pick_interface_and_amp(data, model['interface1_t'], model['interface2_t'], t0, nt, dt)
     thickness_apparent_t = hor2_tpicks - hor1_tpicks
     thickness_apparent_z = thickness_apparent_t*vp_layers[1]/2000
 
+    itrc_tuning = int(np.argmax(np.abs(amp_picks)))
+    tuning_thickness = model['z_min']+itrc_tuning*model['dz']
+
+    return dict(model,
+        t = t0+np.arange(nt)*dt,
+        hor1_tpicks = hor1_tpicks,
+        hor2_tpicks = hor2_tpicks,
+        hor3_tpicks = hor3_tpicks,
+        amp_picks = amp_picks,
+        thickness_apparent_t = thickness_apparent_t,
+        thickness_apparent_z = thickness_apparent_z,
+        itrc_tuning = itrc_tuning,
+        tuning_thickness = tuning_thickness,
+        tuning_thickness_t = tuning_thickness*2000/vp_layers[1],
+        tuning_amplitude = amp_picks[itrc_tuning],
+        min_apparent_thickness_t = thickness_apparent_t.min(),
+        min_apparent_thickness_z = thickness_apparent_z.min(),
+    )
+
+def make_plot(zunit, result, gain, plotpadtime, thickness_domain, fig_fname, csv_fname='', image_opts=None):
+    """Render the wedge figure (and optional CSV curves) for a result from analyze_wedge."""
+    from figures import figure_template
+    r = result
+    vp_layers = r['vp_layers']
+    thickness = r['thickness']
+
     if thickness_domain == 'time':
         thickness_true = 2000. *thickness/vp_layers[1]
         thickness_unit = 'ms'
@@ -302,121 +522,23 @@ def make_plot(zunit, data, wavelet_label, vp_layers, rho_layers, thickness, \
         thickness_true = thickness
         thickness_unit = zunit
     
-    excursion = gain*dz
-    fig, axes = create_figure()
-
-    ax0, ax1, ax2 = axes
-    layer_labels = []
-
-    for i in range(3):
-        layer_labels.append('Layer %d\n%V_P$=%.2f %s/s\n$\\rho$=%.2f $g/cc$' % (i+1, vp_layers[i], zunit, rho_layers[i]))
-
-    ax0.plot(thickness, interface1_t, color = 'blue', lw=1.5)
-    ax0.plot(thickness, interface2_t, color = 'red', lw=1.5)
-    min_plot_time = interface1_t[0] - plotpadtime
-    max_plot_time = interface2_t[-1] + plotpadtime
-    ax0.set_ylim(min_plot_time, max_plot_time)
-    ax0.set_xlim(z_min-excursion, z_max+excursion)
-    ax0.invert_yaxis()
-
-    xlabel = 'True Thickness (%s)' % zunit
-    ax0.set_xlabel(xlabel)
-    ax0.set_ylabel('Time (ms)')
-    ax0.tick_params(top=True, right = True, labelright = True)
-    ax0.grid(linestyle= ':')
-
-    ax0.text(2,
-        min_plot_time+(interface1_t[0]-min_plot_time)*0.5,
-        layer_labels[0],
-        verticalalignment = 'center',
-        fontsize = 16)
-    ax0.text((z_min+z_max)*0.8,
-        interface1_t[-1] + (interface2_t[-1]-interface1_t[-1])*0.5,
-        layer_labels[1],
-        verticalalignment = 'center',
-        fontsize = 16
-    )
-    ax0.text(2,
-        interface2_t[0] + (max_plot_time-interface1_t[0])*0.5,
-        layer_labels[2],
-        verticalalignment = 'center',
-        fontsize = 16
-    )
+    thickness_apparent = r['thickness_apparent_t'] if thickness_domain == 'time' else r['thickness_apparent_z']
+    excursion = gain*r['dz']
 
-    t= t0+np.arange(nt)*dt
-    plot_vawig(ax1, data.T, t, z_min, dz, excursion)
-    ax1.plot(thickness, interface1_t, color = 'blue', lw = 1)
-    ax1.plot(thickness, interface2_t, color = 'red', lw = 1)
-
-    if hor3_tpicks is None:
-        ax1.plot(thickness, hor1_tpicks, 'o', color = 'blue', lw  =2, linestyle = '--')
-    else:
-        ax1.plot(thickness, hor1_tpicks, 'o', color = 'black', lw = 2, linestyle = '--')
-        ax1.plot(thickness, hor3_tpicks, 'o', color = 'blue', lw = 2, linestyle = ':')
-    ax1.plot(thickness, hor2_tpicks, 'o', color = 'red', lw = 2, linestyle = '--')
-    ax1.set_xlim(z_min-excursion, z_max+excursion)
-    ax1.set_ylim(min_plot_time, max_plot_time)
-    ax1.invert_yaxis()
-    ax1.set_xlabel(xlabel)
-    ax1.set_ylabel('Time (ms)')
-    ax1.tick_params(top = True, right = True, labelright = True)
-    ax1.text(0,
-        min_plot_time + (max_plot_time - min_plot_time)*0.9,
-        wavelet_label,
-        verticalalignment='center',
-        fontsize=16,
-        bbox = dict(facecolor = 'white')
-        )
-
-    itrc_tuning = np.argmax(np.abs(amp_picks))
-    tuning_thickness = z_min+itrc_tuning*dz
-
-    ax2.plot(thickness, amp_picks, color = 'blue')
-    ax2.tick_params(top = True)
-
-    ax2.tick_params(axis='y', labelcolor = 'blue')
-    ax2.set_xlim(z_min- excursion, z_max + excursion)
-    ax2.axvline(tuning_thickness, color = 'k', lw=2, linestyle = '--')
-    ax2.plot(tuning_thickness, amp_picks[itrc_tuning], marker = 'o', markersize =8, color = 'k', linestyle = ':')
-    ax2.set_xlabel('Upper Interface Amplitude', color = 'blue')
-    ax2.grid(True, axis = 'x', linestyle = ':')
-
-    if amp_picks[itrc_tuning] > 0:
-        y = ax2.get_ylim()[0] + (ax2.get_ylim()[1] - ax2.get_ylim()[0])*0.1
-    else:
-        y = ax2.get_ylim()[1] + (ax2.get_ylim()[1] - ax2.get_ylim()[0])*0.17
-    
-    dx = (ax2.get_xlim()[1] - ax2.get_xlim()[0]) / 60
-    ax2.text(tuning_thickness + dx, y, 
-            'peak tuning thickness:\n%.1f %s (%.1f ms)' % (tuning_thickness, zunit, tuning_thickness*2000/vp_layers[1]), 
-             fontsize = 16)
-
-    ax3 = ax2.twinx()
-    ax3_color = 'magenta'
-    ax3.plot(thickness, thickness_true, color = ax3_color, lw = 0.5, linestyle = '--')
-    ax3.plot(thickness, thickness_apparent_t if thickness_domain == 'time' else
-                thickness_apprent_z, color = ax3_color)
-    ax3.tick_params(top = True)
-    ax3.tick_params(axis = 'y', labelcolor = ax3_color)
-    min_thickness_txt = 'minimum apparent thickness:\n%.1f %s (%.1f ms)' % (thickness_apparent_z.min(), zunit, thickness_apparent_t.min())
-
-
-    # Fix variable name: xalbel -> xlabel
-    ax2.set_xlabel(xlabel + '\n\n%s' % min_thickness_txt)
-    ax3.set_ylabel('Apparent Thickness (%s)' % thickness_unit, color = ax3_color)
-    ax3.grid(True, axis = 'y', linestyle = ':')
-
-    plt.tight_layout()
-    plt.savefig(fig_fname)
-    plt.close()
+    with figure_template('wedge') as tpl:
+        fig = tpl.update(zunit, r['t'], r['data'], r['wavelet_label'], vp_layers, r['rho_layers'], thickness,
+            r['interface1_t'], r['interface2_t'], r['hor1_tpicks'], r['hor2_tpicks'], r['hor3_tpicks'], r['amp_picks'],
+            thickness_true, thickness_apparent, r['thickness_apparent_t'], r['thickness_apparent_z'], thickness_unit,
+            r['tuning_thickness'], r['itrc_tuning'], r['z_min'], r['z_max'], r['dz'], excursion, plotpadtime)
+        fig.savefig(fig_fname, **savefig_kwargs(fig, image_opts or {}))
 
     if csv_fname:
-        curves = np.vstack((thickness, amp_picks, thickness_apprent_t, thickness_apprent_z)).T
+        curves = np.vstack((thickness, r['amp_picks'], r['thickness_apparent_t'], r['thickness_apparent_z'])).T
         header = ('True_Thickness_%s, Upper_Interface_Amplitude, Apparent_Thickness_ms, Apparent_Thickness_%s' % (zunit, zunit))
         np.savetxt(csv_fname, curves, fmt = '%g',delimiter = ',', header = header, comments = '')
 
 def make_symmetric_wavelet(t, wavelet):
-    if np.alltrue(t<0) or np.alltrue(t>=0):
+    if np.all(t<0) or np.all(t>=0):
         raise Exception('Input wavelet needs to be sampled at both negative and positive time values.')
     
     nt_positive = (t>0).sum()
@@ -433,9 +555,145 @@ def make_symmetric_wavelet(t, wavelet):
 
     return t, wavelet
 
+# First line of a text wavelet that starts with a number; anything above
+# it is header
+_FIRST_ROW = re.compile(r'^[ \t]*[-+]?\.?\d', re.M)
+_DELIMITERS = str.maketrans(',;\t', '   ')
+
+def parse_wavelet_text(text):
+    """
+    Numeric table (nrows, ncols) from CSV or whitespace separated text.
+    Header lines before the first numeric row are skipped; the values are
+    converted in one pass.
+    """
+    first = _FIRST_ROW.search(text)
+    if first is None:
+        raise ValueError('No numeric rows found in the wavelet file.')
+    body = text[first.start():].translate(_DELIMITERS)
+    ncols = len(body.split('\n', 1)[0].split())
+    try:
+        values = np.array(body.split(), dtype = float)
+    except ValueError:
+        raise ValueError('Wavelet file has non-numeric values after its header.')
+    if values.size % ncols:
+        raise ValueError('Wavelet file rows do not all have %d columns.' % ncols)
+    return values.reshape(-1, ncols)
+
+def _time_column(table):
+    # The time column is the one that increases in equal steps
+    for j in range(table.shape[1]):
+        step = np.diff(table[:, j])
+        if step.size and step[0] > 0 and np.allclose(step, step[0], rtol = 1e-3, atol = 0):
+            return j
+    return None
+
+def parse_wavelet(data, dt):
+    """
+    (t, wavelet) from the contents of a CSV/TXT file (str or bytes) or a
+    .npy file (bytes), or from an array. A column (or .npy row) of equally
+    spaced increasing values is taken as time, in s if the wavelet spans
+    less than 2 of its units and in ms otherwise; the first other column
+    is the amplitude. Without a time column the samples are taken to be dt
+    ms apart, centred on the middle sample.
+    """
+    if isinstance(data, bytes) and data.startswith(b'\x93NUMPY'):
+        table = np.load(io.BytesIO(data), allow_pickle = False)
+    elif isinstance(data, (str, bytes)):
+        table = parse_wavelet_text(data.decode() if isinstance(data, bytes) else data)
+    else:
+        table = np.asarray(data)
+    table = np.asarray(table, dtype = float)
+    if table.ndim == 2 and table.shape[0] == 2 and table.shape[1] > 2:
+        table = table.T
+    if table.ndim == 1:
+        table = table[:, None]
+    if table.ndim != 2 or table.shape[0] < 3:
+        raise ValueError('Need a wavelet of at least 3 samples, got shape %s.' % (table.shape,))
+
+    j = _time_column(table) if table.shape[1] > 1 else None
+    if j is None:
+        wavelet = table[:, 0]
+        t = (np.arange(wavelet.size) - wavelet.size//2)*dt
+    else:
+        t = table[:, j]
+        wavelet = table[:, 1 if j == 0 else 0]
+        if t[-1] - t[0] < 2:
+            t = t*1000.
+        # Rebuild the axis from its step so rounding in the file does not matter
+        t = t[0] + np.arange(t.size)*np.mean(np.diff(t))
+    return t, wavelet
+
+def prep_wavelet(t, wavelet, dt):
+    """
+    Resample (t, wavelet) to dt (polyphase, see resample), snap t = 0 onto
+    a sample, pad it symmetric about t = 0 (make_symmetric_wavelet) and
+    scale it to a peak amplitude of 1 like the Ricker and Ormsby wavelets.
+    """
+    step = t[1] - t[0]
+    if not math.isclose(step, dt):
+        t, wavelet = resample(t, wavelet, dt)
+    # Shifts the wavelet by less than half a sample when 0 is off the grid
+    t = np.round(t/dt)*dt
+    t, wavelet = make_symmetric_wavelet(t, wavelet)
+    peak = np.abs(wavelet).max()
+    return t, wavelet/peak if peak else wavelet
+
+def _wavelet_source(wavelet_str, wavelet_fname):
+    if isinstance(wavelet_str, np.ndarray):
+        return wavelet_str
+    if wavelet_str:
+        return wavelet_str.encode() if isinstance(wavelet_str, str) else bytes(wavelet_str)
+    if wavelet_fname and os.path.isfile(wavelet_fname):
+        with open(wavelet_fname, 'rb') as f:
+            return f.read()
+    raise ValueError('Custom wavelet needs the file contents in wavelet_str or an existing wavelet_fname.')
+
+def content_hash(data):
+    """Digest of wavelet file contents or of an array (its dtype, shape and bytes)."""
+    h = hashlib.blake2b(digest_size = 16)
+    if isinstance(data, np.ndarray):
+        h.update(('%s%s' % (data.dtype.str, data.shape)).encode())
+        data = np.ascontiguousarray(data)
+    h.update(data)
+    return h.hexdigest()
+
+def parse_and_prep_wavelet(wavelet_str, dt, wavelet_fname = '', phase_rot = 0):
+    """
+    Custom wavelet at the model dt from file contents (wavelet_str), an
+    array, or the file wavelet_fname: parse_wavelet, then prep_wavelet and
+    the phase rotation. Prepared wavelets are cached under the hash of
+    their contents, so a wavelet that is sent again is neither parsed nor
+    resampled. The returned arrays are read-only.
+    """
+    data = _wavelet_source(wavelet_str, wavelet_fname)
+
+    def factory():
+        t, wavelet = prep_wavelet(*parse_wavelet(data, dt), dt)
+        if phase_rot:
+            wavelet = phaserotate(wavelet, phase_rot)
+        return t, wavelet
+
+    return get_wavelet(('custom', content_hash(data), float(dt), float(phase_rot)), factory)
+
+def cached_wavelet(wv_type, freqs, dt, length, phase_rot, generate):
+    """
+    Look up a (t, wavelet) pair in the process-wide wavelet cache, calling
+    generate() and applying the phase rotation only on a miss. The returned
+    arrays are read-only.
+    """
+    def factory():
+        t, wavelet = generate()
+        if phase_rot:
+            wavelet = phaserotate(wavelet, phase_rot)
+        return t, wavelet
+
+    key = (wv_type, tuple(float(f) for f in freqs), float(dt), float(length), float(phase_rot))
+    return get_wavelet(key, factory)
+
 def gen_wavelet(dt, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, wavelet_length=500):
     if wv_type == 'ricker':
-        t, wavelet = ricker(wavelet_length, dt, ricker_freq)
+        t, wavelet = cached_wavelet('ricker', (ricker_freq,), dt, wavelet_length, phase_rot,
+            lambda: ricker(wavelet_length, dt, ricker_freq))
         wavelet_label = 'Ricker %d Hz' % ricker_freq
     elif wv_type == 'ormsby':
         freqs = ormsby_freq.strip().split(',')
@@ -452,55 +710,75 @@ def gen_wavelet(dt, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fnam
 
         if f1 < 0:
             raise Exception('Ormsby wavelet frequencies must be positive.')
-        t, wavelet = ormsby(wavelet_length, dt, f1, f2, f3, f4)
+        t, wavelet = cached_wavelet('ormsby', (f1, f2, f3, f4), dt, wavelet_length, phase_rot,
+            lambda: ormsby(wavelet_length, dt, f1, f2, f3, f4))
         wavelet_label = 'Ormsby %s Hz' % ormsby_freq.replace(' ', '')
 
     else:
-        t, wavelet = parse_and_prep_wavelet(wavelet_str, dt)
-        wavelet_label = wavelet_fname if wavelet_fname else 'Custom Wavelet'
-        if len(wavelet_label) >4 and wavelet_label[-4:].upper() in ['.TXT', '.CSV']:
+        t, wavelet = parse_and_prep_wavelet(wavelet_str, dt, wavelet_fname, phase_rot)
+        wavelet_label = os.path.basename(wavelet_fname) if wavelet_fname else 'Custom Wavelet'
+        if len(wavelet_label) >4 and wavelet_label[-4:].upper() in ['.TXT', '.CSV', '.NPY']:
             wavelet_label = wavelet_label[:-4]
 
     if phase_rot == 0:
         if wv_type in ['ricker', 'ormsby']:
             wavelet_label += ' (zero phase)'
 
-        else:
-            wavelet_label += ' with $%.0f^\circ$ phase rotation' % phase_rot
+    else:
+        wavelet_label += r' with $%.0f^\circ$ phase rotation' % phase_rot
 
     return t, wavelet, wavelet_label
 
-def spectrum_analysis(t, wavelet):
+def spectrum_analysis_batch(t, wavelets, workers = None):
+    """
+    Amplitude and normalized dB spectra for a 2D stack of wavelets or traces
+    (one per row, sampled at t) computed in one multi-threaded real FFT at a
+    fast transform length. Returns freq (nf,), amp_spec and pow_spec (nrows, nf).
+    """
+    import scipy.fft
     EPS = 1e-8
     NFFT_MIN = 8192
     PADFACTION = 4
 
+    wavelets = np.atleast_2d(wavelets)
     dt = t[1] - t[0]
-    nfft = max(wavelet.size*PADFACTION, NFFT_MIN)
-    spec = np.fft.rfft(wavelet, nfft)
-    freq = np.fft.rfftfreq(nfft, dt*0.001)
+    nfft = scipy.fft.next_fast_len(max(wavelets.shape[1]*PADFACTION, NFFT_MIN), real = True)
+    spec = scipy.fft.rfft(wavelets, nfft, axis = 1, workers = workers or FFT_WORKERS)
+    freq = scipy.fft.rfftfreq(nfft, dt*0.001)
     amp_spec = np.abs(spec)
-    pow_spec = 20* np.log10(amp_spec / amp_spec.max() + EPS)
+    pow_spec = 20* np.log10(amp_spec / amp_spec.max(axis = 1, keepdims = True) + EPS)
 
     return freq, amp_spec, pow_spec
 
+def spectrum_analysis(t, wavelet):
+    freq, amp_spec, pow_spec = spectrum_analysis_batch(t, wavelet)
+    return freq, amp_spec[0], pow_spec[0]
+
 def wavelet_trim_small_val(t, wavelet):
-    i0=0
-    i1=wavelet.size - 1
-    EPS = 2e-4*np.abs(wavelet).max()
-    while i0 < i1 and np.abs(wavelet[i0]) < EPS and np.abs(wavelet[i1]) < EPS:
-        i0 += 1
-        i1 -= 1
-    return t[i0:i1+1], wavelet[i0:i1+1]
+    """
+    Trim the same number of near-zero samples from both ends of wavelet. A 2D
+    stack (one wavelet per row) is trimmed by the amount all rows allow.
+    """
+    n = wavelet.shape[-1]
+    w2d = np.abs(np.atleast_2d(wavelet))
+    small = w2d < 2e-4*w2d.max(axis = 1, keepdims = True)
+    lead = np.where(small.all(axis = 1), n, np.argmin(small, axis = 1))
+    trail = np.where(small.all(axis = 1), n, np.argmin(small[:, ::-1], axis = 1))
+    k = min(lead.min(), trail.min(), n//2)
+    return t[k:n-k], wavelet[..., k:n-k]
 
 def spectrum_trim_small_val(freq, amp_spec, pow_spec):
-    EPS = 2e-4*amp_spec.max()
-    idx = amp_spec.size - 1
-    while idx > 0 and amp_spec[idx] < EPS:
-        idx -= 1
-    return freq[:idx+1], amp_spec[:idx+1], pow_spec[:idx+1]
+    """
+    Drop the high-frequency tail where the amplitude spectrum is negligible.
+    For 2D spectra (one per row) the longest significant band is kept.
+    """
+    amp2d = np.atleast_2d(amp_spec)
+    above = amp2d >= 2e-4*amp2d.max(axis = 1, keepdims = True)
+    last = np.where(above.any(axis = 1), amp2d.shape[1] - 1 - np.argmax(above[:, ::-1], axis = 1), 0)
+    idx = last.max()
+    return freq[:idx+1], amp_spec[..., :idx+1], pow_spec[..., :idx+1]
 
-def plot_wavelet(wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, fig_fname):
+def plot_wavelet(wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, fig_fname, image_opts=None):
     # Adjust wavelet_length based on frequency to prevent array indexing errors
     # Higher frequencies need more samples
     if wv_type == 'ricker' and ricker_freq > 20:
@@ -514,58 +792,24 @@ def plot_wavelet(wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname,
     freq, amp_spec, pow_spec = spectrum_analysis(t, wavelet)
     freq, amp_spec, pow_spec = spectrum_trim_small_val(freq, amp_spec, pow_spec)
     
-    fig, axes = create_figure()
-    ax0, ax1, ax2 = axes
-    lw = 1.5
-    ax0.plot(t, wavelet, color = 'black', lw = lw, label = 'wavelet')
-    ax0.legend()
-    ax0.fill_between(t, wavelet, 0, where = wavelet > 0, facecolor = [0.8, 0.8, 1.0], interpolate = True)
-    ax0.fill_between(t, wavelet, 0, where = wavelet < 0, facecolor = [1.0, 0.8, 0.8], interpolate = True)
-    ax0.set_xlabel('Time (ms)')
-    ax0.set_ylabel('Amplitude')
-    ax0.set_title(wavelet_label, fontsize = 18)
-    ax0.tick_params(top = True, right = True, labelright = True)
-    ax0.grid(linestyle = ':')
-
-    ax1.plot(freq, amp_spec, color = 'green', lw = lw, label = 'Amplitude spectrum')
-    ax1.legend()
-    ax1.set_xlabel('Frequency (Hz)')
-    ax1.set_ylabel('Amplitude (linear)')
-    ax1.tick_params(top = True, right = True, labelright = True)
-    ax1.grid(linestyle = ':')
-    
-    ax2.plot(freq, pow_spec, color = 'blue', lw = lw, label = 'Power spectrum (normalized)')
-    ax2.legend()
-    ax2.set_xlabel('Frequency (Hz)')
-    ax2.set_ylabel('Power (dB)')
-    ax2.set_ylim((-65, 5))
-    ax2.tick_params(top = True, right = True, labelright = True)
-    ax2.grid(linestyle = ':')
-    
-    plt.tight_layout()
-    plt.savefig(fig_fname)
-    plt.close()
+    from figures import figure_template
+    with figure_template('wavelet') as tpl:
+        fig = tpl.update(t, wavelet, freq, amp_spec, pow_spec, wavelet_label)
+        fig.savefig(fig_fname, **savefig_kwargs(fig, image_opts or {}))
+
+    return dict(t = t, wavelet = wavelet, freq = freq, amp_spec = amp_spec, pow_spec = pow_spec)
+
+def emit(progress, stage, **info):
+    """Report a pipeline stage to a progress callback, which receives dict(stage=stage, **info)."""
+    if progress is not None:
+        progress(dict(stage = stage, **info))
 
-def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, gain, plotpadtime, thickness_domain, fig_fname, csv_fname):
+def wedge_geometry(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces=61, progress=None):
     """
-    Creates a wedge model for seismic analysis.
-    
-    Parameters:
-    - zunit: Unit for depth/thickness (e.g., 'm', 'ft')
-    - max_thickness: Maximum thickness of the wedge
-    - wv_type: Wavelet type ('ricker', 'ormsby', or custom)
-    - ricker_freq: Frequency for Ricker wavelet (Hz)
-    - ormsby_freq: Comma-separated frequencies for Ormsby wavelet
-    - wavelet_str: Custom wavelet string representation
-    - wavelet_fname: Filename for custom wavelet
-    - phase_rot: Phase rotation in degrees
-    - vp1, vp2, vp3: P-wave velocities for the three layers (units/s)
-    - rho1, rho2, rho3: Densities for the three layers (g/cc)
-    - gain: Gain factor for display
-    - plotpadtime: Padding time for plots (ms)
-    - thickness_domain: Domain for thickness calculation ('time' or 'depth')
-    - fig_fname: Output figure filename
-    - csv_fname: Output CSV filename for curves
+    Set up the three-layer wedge without synthesizing it: the wavelet, the
+    time axis (t0, nt, dt), the wedge geometry and interface times, the
+    layer properties and the reflection coefficients rc1/rc2, as a dict.
+    progress gets the 'wavelet' stage (see emit).
     """
     # Create arrays for layer properties
     vp_layers = [vp1, vp2, vp3]
@@ -577,7 +821,6 @@ def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet
     # Set up model geometry
     z_min = 0
     z_max = max_thickness
-    ntraces = 61  # Number of traces in the model
     dz = (z_max - z_min)/(ntraces - 1)  # Trace spacing
 
     # Set time sampling interval
@@ -586,6 +829,10 @@ def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet
     # Generate wavelet based on specified parameters
     t, wavelet, wavelet_label = gen_wavelet(dt, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot)
     wavelet_length = t[-1] - t[0] + dt
+    if progress is not None:
+        freq, amp_spec, pow_spec = spectrum_analysis(t, wavelet)
+        emit(progress, 'wavelet', wavelet_label = wavelet_label, wavelet_length = float(wavelet_length),
+            peak_frequency = float(freq[np.argmax(amp_spec)]))
     
     # Calculate padding time to ensure model can fit the wavelet
     pad_time = plotpadtime
@@ -596,10 +843,7 @@ def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet
         pad_time += (wavelet_length - model_time)/2.0 + dt
     
     # Calculate number of time samples
-    nt = int(round(2*pad_time + 2000*(z_max - z_min)/vp_layers[1]/dt))
-
-    # Initialize reflection coefficient model
-    rc_model = np.zeros((nt, ntraces))
+    nt = int(round((2*pad_time + 2000*(z_max - z_min)/vp_layers[1])/dt))
 
     # Calculate reflection coefficients at layer interfaces
     rc1 = (imp_layers[1] - imp_layers[0])/(imp_layers[1] + imp_layers[0])  # Upper interface
@@ -616,33 +860,335 @@ def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet
     interface1_t = t_ref + thickness*0  # Upper interface (constant time)
     interface2_t = t_ref + thickness*2000/vp_layers[1]  # Lower interface (varies with thickness)
 
+    return dict(
+        wavelet_label = wavelet_label,
+        wavelet_t = t,
+        wavelet = wavelet,
+        vp_layers = vp_layers,
+        rho_layers = rho_layers,
+        thickness = thickness,
+        interface1_t = interface1_t,
+        interface2_t = interface2_t,
+        t0 = t0,
+        nt = nt,
+        dt = dt,
+        z_min = z_min,
+        z_max = z_max,
+        dz = dz,
+        rc1 = rc1,
+        rc2 = rc2,
+    )
+
+def build_wedge(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces=61, sparse=False, progress=None):
+    """
+    Synthesize the three-layer wedge without picking or plotting. Takes the
+    modelling arguments of wedge_model and returns the wedge_geometry dict
+    with the synthetic section added ('data', shape (nt, ntraces)).
+    progress gets the 'wavelet' and 'synthesis' stages (see emit).
+    """
+    model = wedge_geometry(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname,
+        phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces, progress)
+    emit(progress, 'synthesis', nt = model['nt'], ntraces = ntraces, rc1 = float(model['rc1']), rc2 = float(model['rc2']))
+    model['data'] = wedge_traces(model, model['wavelet'], model['wavelet_t'][0], sparse)
+    return model
+
+def wedge_traces(model, wavelet, wavelet_t0, sparse = False):
+    """
+    Synthetic section (nt, ntraces) of a build_wedge model for a wavelet
+    sampled at the model dt whose first sample is at wavelet_t0 (ms).
+    """
+    interface1_t, interface2_t = model['interface1_t'], model['interface2_t']
+    rc1, rc2 = model['rc1'], model['rc2']
+    t0, nt, dt = model['t0'], model['nt'], model['dt']
+
+    if sparse:
+        # Superpose the two interface responses at their exact times
+        return synthesize_spikes(np.vstack((interface1_t, interface2_t)), [rc1, rc2], wavelet, wavelet_t0, t0, nt, dt)
+
+    # Initialize reflection coefficient model
+    ntraces = interface1_t.size
+    rc_model = np.zeros((nt, ntraces))
+
     # Place reflection coefficients in the model
-    for itr in range(ntraces):
-        # Position of upper interface reflection
-        rc_model[np.round((interface1_t[itr] - t0)/dt).astype(int), itr] = rc1
-        # Position of lower interface reflection (offset by 1 sample)
-        rc_model[np.round((interface2_t[itr] - t0)/dt).astype(int) + 1, itr] = rc2
+    itraces = np.arange(ntraces)
+    # Position of upper interface reflection
+    rc_model[np.round((interface1_t - t0)/dt).astype(int), itraces] = rc1
+    # Position of lower interface reflection (offset by 1 sample)
+    rc_model[np.round((interface2_t - t0)/dt).astype(int) + 1, itraces] = rc2
 
     # Convolve reflection coefficients with wavelet to create synthetic seismic data
-    data = np.apply_along_axis(lambda _t: scipy.signal.convolve(_t, wavelet, mode = 'same'), axis = 0, arr = rc_model)
+    return convolve_traces(rc_model, wavelet)
+
+def analyze_wedge(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime=20, ntraces=61, sparse=False, progress=None):
+    """
+    Headless wedge analysis: synthesize the wedge (build_wedge) and pick it
+    (analyze_model) without rendering anything. Takes the modelling
+    arguments of wedge_model and returns a dict with the synthetic section
+    'data' (nt, ntraces) and time axis 't', the interface times, horizon
+    picks 'hor1_tpicks'/'hor2_tpicks'/'hor3_tpicks', the amplitude curve
+    'amp_picks', 'thickness_apparent_t'/'thickness_apparent_z', and the
+    tuning thickness summary. Pass it to make_plot to render it later.
+    progress gets the build_wedge stages, then 'picking' and 'analysis'
+    with the tuning summary.
+    """
+    model = build_wedge(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname,
+        phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces, sparse, progress)
+    emit(progress, 'picking')
+    result = analyze_model(model)
+    emit(progress, 'analysis', tuning_thickness = float(result['tuning_thickness']),
+        tuning_thickness_t = float(result['tuning_thickness_t']),
+        tuning_amplitude = float(result['tuning_amplitude']),
+        min_apparent_thickness_t = float(result['min_apparent_thickness_t']))
+    return result
+
+def phase_scan(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, vp1, vp2, vp3, rho1, rho2, rho3, angles=None, plotpadtime=20, ntraces=61, sparse=False, return_data=False, progress=None):
+    """
+    Wedge tuning for a whole set of wavelet phase rotations (degrees; by
+    default 0-180 in 5 degree steps) from a single wedge model. The
+    section is linear in the wavelet, so it is synthesized once for the
+    zero-phase wavelet w and once for its Hilbert transform H(w), and the
+    section for each angle is cos*D(w) - sin*D(H(w)), all at once.
+    All angles are then picked together (pick_panels).
+
+    Returns a dict with 'angles', the rotated wavelets 'wavelets'
+    (nangles, nw) and 'wavelet_t', 't', 'thickness', the amplitude curves
+    'amp_picks' and apparent thicknesses 'thickness_apparent_t'
+    (nangles, ntraces), and per angle 'tuning_thickness',
+    'tuning_thickness_t', 'tuning_amplitude' and
+    'min_apparent_thickness_t'. The sections (nangles, nt, ntraces) are
+    added as 'data' only with return_data.
+    """
+    angles = np.arange(0., 181., 5.) if angles is None else np.atleast_1d(np.asarray(angles, dtype = float))
+    model = build_wedge(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname,
+        0, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces, sparse, progress)
+    wavelet_t, wavelet = model['wavelet_t'], model['wavelet']
+    quadrature = wedge_traces(model, hilbert_transform(wavelet), wavelet_t[0], sparse)
+
+    # (nangles, 2) @ (nt, 2, ntraces) gives (nt, nangles, ntraces), the
+    # layout pick_panels works on
+    rad = np.deg2rad(angles)
+    data = np.stack((np.cos(rad), -np.sin(rad)), axis = 1) @ np.stack((model['data'], quadrature), axis = 1)
+
+    emit(progress, 'picking')
+    t0, nt, dt = model['t0'], model['nt'], model['dt']
+    hor1_tpicks, hor2_tpicks, _, amp_picks = pick_panels(data, model['interface1_t'], model['interface2_t'], t0, nt, dt)
+    thickness_apparent_t = hor2_tpicks - hor1_tpicks
+    itrc_tuning = np.argmax(np.abs(amp_picks), axis = 1)
+    tuning_thickness = model['z_min'] + itrc_tuning*model['dz']
+    emit(progress, 'phase_scan', nangles = angles.size,
+        tuning_thickness_range = [float(tuning_thickness.min()), float(tuning_thickness.max())])
+
+    # The model wavelet is the zero-phase one; label the scanned range instead
+    wavelet_label = model['wavelet_label']
+    if wavelet_label.endswith(' (zero phase)'):
+        wavelet_label = wavelet_label[:-len(' (zero phase)')]
+    if angles.min() == angles.max():
+        wavelet_label += r' with $%.0f^\circ$ phase rotation' % angles[0]
+    else:
+        wavelet_label += r' with $%.0f^\circ$ to $%.0f^\circ$ phase rotation' % (angles.min(), angles.max())
+
+    result = dict(
+        angles = angles,
+        wavelets = phaserotate_batch(wavelet, angles),
+        wavelet_t = wavelet_t,
+        wavelet_label = wavelet_label,
+        t = t0 + np.arange(nt)*dt,
+        thickness = model['thickness'],
+        amp_picks = amp_picks,
+        thickness_apparent_t = thickness_apparent_t,
+        itrc_tuning = itrc_tuning,
+        tuning_thickness = tuning_thickness,
+        tuning_thickness_t = tuning_thickness*2000/model['vp_layers'][1],
+        tuning_amplitude = amp_picks[np.arange(angles.size), itrc_tuning],
+        min_apparent_thickness_t = thickness_apparent_t.min(axis = 1),
+    )
+    if return_data:
+        result['data'] = data.transpose(1, 0, 2)
+    return result
+
+AVO_METHODS = ['zoeppritz', 'akirichards']
+
+def avo_reflectivity(vp1, vs1, rho1, vp2, vs2, rho2, angles, method = 'zoeppritz'):
+    """
+    P-P reflection coefficients of one interface for incidence angles
+    (degrees, in the upper layer) by the full Zoeppritz solution or the
+    Aki-Richards approximation (bruges.reflection), shaped like angles.
+    Raises ValueError at or beyond the critical angle.
+    """
+    from bruges.reflection import akirichards, zoeppritz_rpp
+    if method not in AVO_METHODS:
+        raise ValueError('Unknown AVO method %r, expected one of %s' % (method, ', '.join(AVO_METHODS)))
+    p = np.sin(np.deg2rad(angles))/vp1
+    if np.any(p*max(vp2, vs2) >= 1):
+        raise ValueError('Angles up to %.1f deg exceed the critical angle (%.1f deg) of the %g/%g m/s interface'
+            % (np.max(angles), np.rad2deg(np.arcsin(vp1/max(vp2, vs2))), vp1, vp2))
+    rpp = zoeppritz_rpp if method == 'zoeppritz' else akirichards
+    # bruges drops the axis of a single angle
+    return np.real(rpp(vp1, vs1, rho1, vp2, vs2, rho2, angles)).reshape(np.shape(angles))
+
+def avo_wedge(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, vs1, vs2, vs3, rho1, rho2, rho3, angles=None, method='zoeppritz', plotpadtime=20, ntraces=61, sparse=False, return_data=False, progress=None):
+    """
+    Angle-dependent wedge: tuning thickness and amplitude for every
+    incidence angle (degrees in the upper layer; by default 0-40 in 2
+    degree steps) in one pass.
+
+    Both interfaces get P-P coefficients for their own incidence angle (the
+    base one refracted into the wedge by Snell's law, see
+    avo_reflectivity). Gathers are flattened on the top of the wedge, and
+    the base arrives 2*h*cos(theta2)/vp2 later. Spikes for the whole
+    (angle, thickness) grid are placed at once and convolved as one batch,
+    giving an (nangles, nt, ntraces) cube, and all angles are picked
+    together (pick_panels).
+
+    Returns a dict with 'angles', the base incidence angles 'angles_base',
+    coefficients 'rc1'/'rc2' (nangles,), 't', 'thickness', 'interface2_t'
+    and the amplitude curves 'amp_picks' (nangles, ntraces), and per angle
+    'tuning_thickness', 'tuning_thickness_t', 'tuning_amplitude' and
+    'min_apparent_thickness_t'. The cube is added as 'data' only with
+    return_data.
+    """
+    angles = np.arange(0., 41., 2.) if angles is None else np.atleast_1d(np.asarray(angles, dtype = float))
+    rc1 = avo_reflectivity(vp1, vs1, rho1, vp2, vs2, rho2, angles, method)
+    angles_base = np.rad2deg(np.arcsin(np.sin(np.deg2rad(angles))*vp2/vp1))
+    rc2 = avo_reflectivity(vp2, vs2, rho2, vp3, vs3, rho3, angles_base, method)
+
+    # Geometry, time axis and wavelet are those of the normal-incidence wedge,
+    # whose base is the latest of all angles
+    model = wedge_geometry(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname,
+        phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces, progress)
+    wavelet_t, wavelet = model['wavelet_t'], model['wavelet']
+    t0, nt, dt = model['t0'], model['nt'], model['dt']
+    thickness, interface1_t = model['thickness'], model['interface1_t']
+    nangles = angles.size
+
+    # (angle, thickness) grids of base times and coefficients
+    interface2_t = interface1_t + 2000*thickness*np.cos(np.deg2rad(angles_base))[:, None]/vp2
+    spike_rc = np.stack((np.broadcast_to(rc1[:, None], interface2_t.shape), np.broadcast_to(rc2[:, None], interface2_t.shape)))
+    emit(progress, 'avo_synthesis', nangles = nangles, ntraces = ntraces, nt = nt)
+    if sparse:
+        spike_t = np.stack((np.broadcast_to(interface1_t, interface2_t.shape), interface2_t))
+        data = synthesize_spikes(spike_t.reshape(2, -1), spike_rc.reshape(2, -1), wavelet, wavelet_t[0], t0, nt, dt)
+    else:
+        # Same sample placement as wedge_traces, for every angle at once
+        rc_model = np.zeros((nt, nangles, ntraces))
+        ia, ix = np.ogrid[:nangles, :ntraces]
+        rc_model[np.round((interface1_t - t0)/dt).astype(int)[ix], ia, ix] = spike_rc[0]
+        rc_model[np.round((interface2_t - t0)/dt).astype(int) + 1, ia, ix] = spike_rc[1]
+        data = convolve_traces(rc_model.reshape(nt, -1), wavelet)
+    data = data.reshape(nt, nangles, ntraces)
+
+    emit(progress, 'picking')
+    hor1_tpicks, hor2_tpicks, _, amp_picks = pick_panels(data, interface1_t, interface2_t, t0, nt, dt)
+    thickness_apparent_t = hor2_tpicks - hor1_tpicks
+    itrc_tuning = np.argmax(np.abs(amp_picks), axis = 1)
+    tuning_thickness = model['z_min'] + itrc_tuning*model['dz']
+    emit(progress, 'analysis', tuning_thickness = float(tuning_thickness[0]),
+        tuning_thickness_t = float(interface2_t[0, itrc_tuning[0]] - interface1_t[0]),
+        tuning_amplitude = float(amp_picks[0, itrc_tuning[0]]), nangles = nangles)
+
+    result = dict(
+        angles = angles,
+        angles_base = angles_base,
+        method = method,
+        rc1 = rc1,
+        rc2 = rc2,
+        t = t0 + np.arange(nt)*dt,
+        t0 = t0,
+        nt = nt,
+        dt = dt,
+        thickness = thickness,
+        interface1_t = interface1_t,
+        interface2_t = interface2_t,
+        amp_picks = amp_picks,
+        thickness_apparent_t = thickness_apparent_t,
+        itrc_tuning = itrc_tuning,
+        tuning_thickness = tuning_thickness,
+        tuning_thickness_t = interface2_t[np.arange(nangles), itrc_tuning] - interface1_t[itrc_tuning],
+        tuning_amplitude = amp_picks[np.arange(nangles), itrc_tuning],
+        min_apparent_thickness_t = thickness_apparent_t.min(axis = 1),
+        wavelet_label = model['wavelet_label'],
+        vp_layers = model['vp_layers'],
+        vs_layers = [vs1, vs2, vs3],
+        rho_layers = model['rho_layers'],
+    )
+    if return_data:
+        result['data'] = data.transpose(1, 0, 2)
+    return result
+
+def shift_samples(data, shift, workers = None):
+    """
+    Traces (nt, ntraces) interpolated at sample positions k + shift,
+    k = 0..nt-1, by a phase ramp on their spectra (band-limited
+    interpolation). Positions past the last sample read zero padding.
+    """
+    import scipy.fft
+    nt = data.shape[0]
+    nfft = scipy.fft.next_fast_len(nt + int(np.ceil(abs(shift))) + 1, real = True)
+    spec = scipy.fft.rfft(data, nfft, axis = 0, workers = workers or FFT_WORKERS)
+    spec *= np.exp(2j*np.pi*np.fft.rfftfreq(nfft)*shift)[:, None]
+    return scipy.fft.irfft(spec, nfft, axis = 0, workers = workers or FFT_WORKERS)[:nt]
+
+def export_segy(segy_fname, result, zunit='m'):
+    """
+    Write the synthetic section of a wedge result to SEG-Y, with the wedge
+    thickness as CDP X. SEG-Y start times are whole ms, so a section that
+    starts in between (the wedge t0 is usually fractional) is interpolated
+    onto the grid starting at the next whole ms.
+    """
+    from segy import write_segy
+    data, t0, dt = np.asarray(result['data']), result['t0'], result['dt']
+    delrt = math.ceil(t0 - 1e-6)
+    shift = (delrt - t0)/dt
+    if abs(shift) > 1e-6:
+        nt = int(np.floor(data.shape[0] - 1 - shift + 1e-6)) + 1
+        data, t0 = shift_samples(data, shift)[:nt], delrt
+    vp, rho = result['vp_layers'], result['rho_layers']
+    text = [
+        'Synthetic wedge model: %s' % result['wavelet_label'],
+        'Layer Vp: %g, %g, %g; density: %g, %g, %g' % (tuple(vp) + tuple(rho)),
+        'CDP X: wedge thickness (%s), coordinate scalar -100' % zunit,
+        'Delay recording time (ms): %g' % t0,
+    ]
+    write_segy(segy_fname, data, dt, t0, cdp_x=result['thickness'], text=text, units=zunit)
+
+def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot, vp1, vp2, vp3, rho1, rho2, rho3, gain, plotpadtime, thickness_domain, fig_fname, csv_fname, ntraces=61, sparse=False, image_opts=None, progress=None, segy_fname='', bundle_fname=''):
+    """
+    Creates a wedge model for seismic analysis.
+    
+    Parameters:
+    - zunit: Unit for depth/thickness (e.g., 'm', 'ft')
+    - max_thickness: Maximum thickness of the wedge
+    - wv_type: Wavelet type ('ricker', 'ormsby', or custom)
+    - ricker_freq: Frequency for Ricker wavelet (Hz)
+    - ormsby_freq: Comma-separated frequencies for Ormsby wavelet
+    - wavelet_str: Custom wavelet string representation
+    - wavelet_fname: Filename for custom wavelet
+    - phase_rot: Phase rotation in degrees
+    - vp1, vp2, vp3: P-wave velocities for the three layers (units/s)
+    - rho1, rho2, rho3: Densities for the three layers (g/cc)
+    - gain: Gain factor for display
+    - plotpadtime: Padding time for plots (ms)
+    - thickness_domain: Domain for thickness calculation ('time' or 'depth')
+    - fig_fname: Output figure filename
+    - csv_fname: Output CSV filename for curves
+    - ntraces: Number of traces across the wedge (default 61)
+    - sparse: Synthesize from (time, coefficient) pairs at exact sub-sample
+      interface times instead of a sample-rounded dense reflectivity panel
+    - image_opts: Image encoding options from image_output.options (default PNG)
+    - progress: Callback receiving a dict per pipeline stage ('wavelet',
+      'synthesis', 'picking', 'analysis', 'render', 'done'; see emit)
+    - segy_fname: Optional SEG-Y file for the synthetic section (see export_segy)
+    - bundle_fname: Optional binary bundle (.npz file or directory) with the
+      section, picks, curves, wavelet and metadata (see export.export_wedge)
+    """
+    result = analyze_wedge(max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet_str, wavelet_fname, phase_rot,
+        vp1, vp2, vp3, rho1, rho2, rho3, plotpadtime, ntraces, sparse, progress)
 
     # Save intermediate results for debugging if enabled
     if _debug:
         import pickle
         input_date = dict(
-            data = data,
-            wavelet_label = wavelet_label,
-            vp_layers = vp_layers,
-            rho_layers = rho_layers,
-            thickness = thickness,
-            interface1_t = interface1_t,
-            interface2_t = interface2_t,
-            t0 = t0,
-            nt = nt,
-            dt = dt,
-            z_min = z_min,
-            z_max = z_max,
-            dz = dz,
+            result,
             gain = gain,
             plotpadtime = plotpadtime,
             thickness_domain = thickness_domain,
@@ -652,4 +1198,13 @@ def wedge_model(zunit, max_thickness, wv_type, ricker_freq, ormsby_freq, wavelet
         pickle.dump(input_date, open('save.p', 'wb'))
 
     # Generate plots and output files
-    make_plot(zunit, data, wavelet_label, vp_layers, rho_layers, thickness, interface1_t, interface2_t, t0, nt, dt, z_min, z_max, dz, gain, plotpadtime, thickness_domain, fig_fname, csv_fname)
\ No newline at end of file
+    emit(progress, 'render')
+    make_plot(zunit, result, gain, plotpadtime, thickness_domain, fig_fname, csv_fname, image_opts)
+    if segy_fname:
+        export_segy(segy_fname, result, zunit)
+    if bundle_fname:
+        from export import export_wedge
+        export_wedge(bundle_fname, result, zunit)
+    emit(progress, 'done', fig_fname = fig_fname, csv_fname = csv_fname)
+
+    return result